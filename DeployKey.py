@@ -6,73 +6,31 @@ DeployKey.py - a Github APIv4 object
 TODO: This class has not been tested for lack of real-world DeployKey data
 
 """
-from .GithubObject import GithubObject
+from node import Node
 
-class DeployKey(GithubObject):
+class DeployKey(Node):
     """This class represents a repository deploy key.  Upstream reference is at
-    https://developer.github.com/v4/object/deploykey/"""
+    https://developer.github.com/v4/object/deploykey/
+
+    Attributes:
+        owner (str) - the github login of the owner of this key
+        createdAt (str) - when the key was created (An ISO-8601 encoded UTC date string)
+        id (str) - the key's GraphQL id
+        key (str) - the deploy key
+        readOnly (Boolean) - whether or not the deploy key is read only
+        title (str) - the deploy key title
+        verified (Boolean) - whether or not the deploy key has been verified
+    """
+
+    __slots__ = ('owner', 'createdAt', 'id', 'key', 'readOnly', 'title', 'verified')
 
     def __init__(self, login, data):
         """
         Arguments:
             login (str) - the github login of the owner of this key
-            data (str) - a json-formatted public key from github's api
+            data (dict) - a deploy key edge or node from a repository.deployKeys query
         """
-        super(DeployKey, self).__init__()
-        self._owner = login
-        self.data = data
+        super(DeployKey, self).__init__(data, owner=login)
 
     def __repr__(self):
-        return 'DeployKey(id={!r}, owner={!r})'.format(self.id, self._owner)
-
-    def __eq__(self, other):
-        if other.__class__ is not self.__class__:
-            return NotImplemented
-        return self.id == other.id
-
-    def __ne__(self, other):
-        if other.__class__ is not self.__class__:
-            return NotImplemented
-        return self.id != other.id
-
-    @property
-    def createdAt(self):
-        """Identifies the date and time when the object was created.
-        :type str
-        """
-        return self.data['node']['createdAt']
-
-    @property
-    def id(self):
-        """
-        :type str
-        """
-        return self.data['node']['id']
-
-    @property
-    def key(self):
-        """The deploy key
-        :type str
-        """
-        return self.data['node']['key']
-
-    @property
-    def readOnly(self):
-        """Whether or not the deploy key is read only
-        :type Boolean
-        """
-        return self.data['node']['readOnly']
-
-    @property
-    def title(self):
-        """The deploy key title
-        :type str
-        """
-        return self.data['node']['title']
-
-    @property
-    def verified(self):
-        """Whether or not the deploy key has been verified
-        :type Boolean
-        """
-        return self.data['node']['verified']
+        return 'DeployKey(id={!r}, owner={!r})'.format(self.id, self.owner)
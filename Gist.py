@@ -7,34 +7,37 @@ TODO: This class is still a Work in Progress
 
 """
 
-import json
-import os
-
-import requests
-
-from .GithubObject import GithubObject
-from .decorators import connection
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/Gist/'])
+from GithubObject import GithubObject
+from decorators import connection
+from templates import TEMPLATES
 
 
 class Gist(GithubObject):
     """This class represents a Gist.  Upstream reference is at
     https://developer.github.com/v4/object/gist/"""
 
-    def __init__(self, name, owner):
+    _LOAD_TEMPLATES = (('Gist', 'gist'),)
+    _LOAD_DOC_TYPE = 'GithubGist'
+
+    def __init__(self, name, owner, lazy=False):
         """
         Arguments:
             name (str) - the name of the gist
             owner (str) - the owner of the gist, i.e. their login name
+
+        Keyword Arguments:
+            lazy (Boolean) - True to only record the name and owner and query the endpoint
+                    on first use or through a Loader, see loader.py
         """
         super(Gist, self).__init__()
-        self._name = None
-        self._owner = None
+        self._name = name
+        self._owner = owner
         self.response = None
-        self.update(name, owner)
+        self._defer(lazy, name, owner)
 
     def __repr__(self):
+        if self.pending:
+            return 'Gist(name={!r}, owner={!r}, pending=True)'.format(self._name, self._owner)
         return 'Gist(name={!r}, owner={!r})'.format(self.name, self.owner)
 
     def __eq__(self, other):
@@ -55,14 +58,16 @@ class Gist(GithubObject):
         """
         self._name = name
         self._owner = owner
-        query = {"query" : open(GRAPHQL_DIR+'gist.graphql', 'r').read() % (owner, name)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(resp.text)
-        if self._errors_exist(self.response):
+        query = {"query" : TEMPLATES.render('Gist', 'gist', owner, name, profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubGist', owner, self.response):
             return False
 
         return True
 
+    def _load_arguments(self):
+        return (self._owner, self._name)
+
     @connection
     def comments(self, **kwargs):
         """A list of comments associated with the gist.
@@ -79,18 +84,8 @@ class Gist(GithubObject):
         TODO: This function should return a GithubObject, GistComment instead of json eventually.
                 see https://developer.github.com/v4/object/gistcomment/
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'gist_comments.graphql', 'r').read() % (self.owner, self.name, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        comments = json.loads(resp.text)
-        if self._errors_exist('GithubGistComments', self.owner, comments):
-            return False
-
-        return comments
+        return self._query_connection('Gist', 'gist_comments',
+                                      'GithubGistComments', (self.owner, self.name), kwargs)
 
     @connection
     def stargazers(self, **kwargs):
@@ -107,18 +102,8 @@ class Gist(GithubObject):
 
         TODO: Eventually this query should return a list of GithubUser objects.
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'gist_stargazers.graphql', 'r').read() % (self.owner, self.name, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        stargazers = json.loads(resp.text)
-        if self._errors_exist('GithubGistStargazers', self.owner, stargazers):
-            return False
-
-        return stargazers
+        return self._query_connection('Gist', 'gist_stargazers',
+                                      'GithubGistStargazers', (self.owner, self.name), kwargs)
 
     @property
     def createdAt(self):
@@ -1,31 +1,229 @@
 #!/usr/bin/env python3.7
 # -*- coding: utf-8 -*-
-from configparser import ConfigParser
 from abc import ABCMeta, abstractmethod
-import os
-import logging
-import logging.config
+import threading
 
-LOCAL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__)))
+import identity
+import ratelimit
+import retry
+import settings
+import transport
+from settings import LOCAL_DIR
+from templates import TEMPLATES, TemplateError
 
+# copied out of the process-wide settings by GithubObject.__init__ and shareable between objects
+_SHARED_ATTRIBUTES = ('config', 'api_token', 'headers', 'logger', 'transport', 'token_pool',
+                      'retry_policy', 'profile')
 
-class GithubObject(object, metaclass=ABCMeta):
+
+class GithubObjectMeta(ABCMeta):
+    """Metaclass of GithubObject.  Constructing a class whose _identity_key
+    returns a key hands back the object already in the identity map under it,
+    see identity.py, instead of building and querying a second one.  Such
+    classes take lazy as a keyword-only argument."""
+
+    def __call__(cls, *args, **kwargs):
+        mapped = cls._identity_key(*args, **kwargs)
+        if mapped is None:
+            return super(GithubObjectMeta, cls).__call__(*args, **kwargs)
+        identities = identity.get_identity_map()
+        obj = identities.get(mapped)
+        if obj is None:
+            obj = super(GithubObjectMeta, cls).__call__(*args, **kwargs)
+            if not obj.pending and not obj._loaded:
+                # a failed load is not shared, so the next request queries again
+                return obj
+            obj = identities.add(obj, mapped)
+        if not kwargs.get('lazy'):
+            obj.load()
+        return obj
+
+
+class GithubObject(object, metaclass=GithubObjectMeta):
     """Base class for a Github Object"""
 
+    # the templates update() queries, as (class_name, name) pairs tried in order,
+    # and the doc_type their errors are logged under; a Loader uses them to load
+    # many lazy objects in one request, see loader.py
+    _LOAD_TEMPLATES = ()
+    _LOAD_DOC_TYPE = None
+
+    # the arguments update() will be called with while a lazy object is waiting
+    # to be loaded, see _defer
+    _pending = None
+    _loading = False
+    _loaded = True
+    _load_lock = None
+    _response = None
+
     def __init__(self):
-        self.config = ConfigParser()
-        self.config.read(''.join([LOCAL_DIR, '/collectors.cfg']))
-        self.endpoint = 'https://api.github.com/graphql'
-        self.api_token = self.config['Github']['personal_access_token']
-        self.headers = {'Authorization': 'token %s' % self.api_token, \
-                        'Accept' : 'application/vnd.github.starfire-preview+json' }
-        # Below is for logging
-        config_file = (''.join([LOCAL_DIR, '/collectors.cfg']))
-        log_file = self.config['Github']['log_file']
-        logging.config.fileConfig(config_file,
-                                  defaults={'GithubCollector': log_file}
-                                 )
-        self.logger = logging.getLogger('GithubCollector')
+        # collectors.cfg is parsed and logging configured once per process, see settings.py
+        shared = settings.get_settings()
+        self.config = shared.config
+        self.api_token = shared.api_token
+        self.headers = shared.headers
+        self.logger = shared.logger
+        self.transport = transport.get_transport(self.config)
+        self.token_pool = ratelimit.get_token_pool(self.config)
+        self.retry_policy = retry.get_retry_policy(self.config)
+        # the field profile queries are projected to, see profiles.py; None for
+        # the [Templates] profile
+        self.profile = None
+
+    @classmethod
+    def get_transport(cls):
+        """Returns the process-wide transport every GithubObject sends queries through"""
+        return transport.get_transport()
+
+    @classmethod
+    def set_transport(cls, new_transport):
+        """Installs a transport for every GithubObject, i.e. one pointing at a local
+        stand-in server during tests.
+
+        Arguments:
+            new_transport - any object with a post(query, headers) method
+
+        Returns:
+            the previously installed transport
+        """
+        return transport.set_transport(new_transport)
+
+    @classmethod
+    def get_token_pool(cls):
+        """Returns the process-wide pool of tokens every GithubObject queries with"""
+        return ratelimit.get_token_pool()
+
+    @classmethod
+    def set_token_pool(cls, pool):
+        """Installs a pool of tokens for every GithubObject.
+
+        Arguments:
+            pool (TokenPool) - the pool to install
+
+        Returns:
+            the previously installed pool
+        """
+        return ratelimit.set_token_pool(pool)
+
+    @classmethod
+    def get_retry_policy(cls):
+        """Returns the process-wide policy every GithubObject retries queries under"""
+        return retry.get_retry_policy()
+
+    @classmethod
+    def set_retry_policy(cls, policy):
+        """Installs a retry policy for every GithubObject.
+
+        Arguments:
+            policy (RetryPolicy) - the policy to install
+
+        Returns:
+            the previously installed policy
+        """
+        return retry.set_retry_policy(policy)
+
+    @classmethod
+    def _from_response(cls, response, like=None, **attributes):
+        """Internal function that builds an object around an already fetched
+        response without querying the endpoint.
+
+        Arguments:
+            response (dict) - the decoded json response the object represents
+
+        Keyword Arguments:
+            like (GithubObject) - an existing object whose configuration, logger,
+                    transport and token pool are shared instead of the
+                    process-wide ones, i.e. when building many objects at once
+            attributes - additional instance attributes to set, i.e. _login='octocat'
+
+        Returns:
+            GithubObject - an instance of cls
+        """
+        obj = cls.__new__(cls)
+        if like is None:
+            GithubObject.__init__(obj)
+        else:
+            for name in _SHARED_ATTRIBUTES:
+                setattr(obj, name, getattr(like, name))
+        obj.__dict__.update(attributes)
+        obj.response = response
+        return obj
+
+    @property
+    def response(self):
+        """The decoded json response the object represents.  A lazy object is
+        loaded the first time this is read."""
+        if self._pending is not None:
+            self.load()
+        return self._response
+
+    @response.setter
+    def response(self, value):
+        self._response = value
+
+    @property
+    def pending(self):
+        """True while a lazy object has not been loaded"""
+        return self._pending is not None
+
+    def _defer(self, lazy, *args):
+        """Internal function every constructor ends with.  It records the arguments
+        update() is called with, and loads the object now unless lazy is True.
+
+        Arguments:
+            lazy (Boolean) - True to only record the object's identity; the first
+                    property read, load() or a Loader queries the endpoint
+            args - the arguments of update()
+        """
+        self._pending = args
+        self._load_lock = threading.RLock()
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """Queries the endpoint for a lazy object that has not been loaded yet;
+        does nothing for one that has.  Use a Loader (see loader.py) to load many
+        objects in a few requests.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        if self._pending is None:
+            return self._loaded
+        with self._load_lock:
+            # another thread may have loaded it meanwhile, and update() reading
+            # the response while it loads must not start loading again
+            if self._pending is None or self._loading:
+                return self._loaded
+            self._loading = True
+            try:
+                self._loaded = self.update(*self._pending) is not False
+            finally:
+                self._loading = False
+                self._pending = None
+            if not self._loaded:
+                self._forget()
+        return self._loaded
+
+    def _forget(self):
+        """Internal function that drops an object which failed to load from the
+        identity map, so the next request for it queries again instead of being
+        handed the failed object; see identity.py"""
+        identity.get_identity_map().discard(self)
+
+    def _load_arguments(self):
+        """Internal function that returns the arguments the _LOAD_TEMPLATES are
+        rendered with, i.e. (login,).  These are the arguments update() will be
+        called with; classes whose templates take them in another order, or take
+        more, override it."""
+        return tuple(self._pending)
+
+    @classmethod
+    def _identity_key(cls, *args, **kwargs):
+        """Internal function that returns the identity map key of the object the
+        constructor arguments describe, or None if objects of the class are not
+        shared; see identity.py"""
+        return None
 
     @abstractmethod
     def __repr__(self):
@@ -66,3 +264,191 @@ class GithubObject(object, metaclass=ABCMeta):
                 self.logger.error(message)
             return True
         return False
+
+    def _post(self, query):
+        """Internal function that sends a query through the shared transport with
+        whichever pooled token has the most rate limit budget left.
+
+        Arguments:
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Returns:
+            dict - the decoded json response
+        """
+        return self.token_pool.post(self._send, query)
+
+    def _send(self, query, token=None):
+        """Internal function that posts a query without consulting the rate limiter,
+        retrying transient failures under the shared retry policy (see retry.py).
+        A rate limit refusal is returned with its headers rather than retried, so
+        the token pool can wait it out or move on to another token.
+
+        Arguments:
+            query (dict) - the json payload, i.e. {"query": "..."}
+            token (str) - the personal access token to authorize with; defaults
+                    to personal_access_token when None or empty
+
+        Returns:
+            tuple - (the decoded json response, the response headers); when the
+                    query could not be sent the response carries the failure in
+                    "errors" like any other GraphQL error
+        """
+        headers = dict(self.headers, Authorization='token %s' % token) if token else self.headers
+
+        def attempt():
+            resp = self.transport.post(query, headers=headers)
+            response_headers = getattr(resp, 'headers', None)
+            return (retry.decode(resp.text, response_headers, getattr(resp, 'status_code', 200)),
+                    response_headers)
+        try:
+            return self.retry_policy.call(attempt)
+        except (retry.RetryableError, retry.FatalError) as error_msg:
+            return {'errors': [{'type': error_msg.__class__.__name__, 'message': str(error_msg)}]}, None
+
+    @staticmethod
+    def _format_filters(kwargs):
+        """Internal function that formats keyword arguments as GraphQL connection
+        arguments, i.e. {'first': 100} -> 'first: 100,'"""
+        return ''.join(["{}: {},".format(key, value) for key, value in kwargs.items()])
+
+    def _query_connection(self, class_name, name, doc_type, root_args, kwargs):
+        """Internal function shared by connection methods that queries a single page
+        of a connection.
+
+        Arguments:
+            class_name (str) - the class the connection template belongs to, i.e. 'User'
+            name (str) - the template name, i.e. 'user_followers'
+            doc_type (str) - the type of data being queried, used when logging errors
+            root_args (tuple) - the arguments of the root field, i.e. (login,)
+            kwargs (dict) - the connection arguments, i.e. {'first': 100}
+
+        Returns:
+            dict - the decoded json response, or False if errors occurred
+        """
+        query = TEMPLATES.get(class_name, name, self.profile).query(*(root_args + (self._format_filters(kwargs),)))
+        payload = self._post(query)
+        if self._errors_exist(doc_type, str(root_args[0]), payload):
+            return False
+
+        return payload
+
+    def _batch_connections(self, class_name, root_args, connections, doc_types):
+        """Internal function that queries the first page of several connections in
+        a single request.  Each connection's template is rendered with its field
+        aliased to the connection name, the selections are merged under one root
+        field, and the response is split back into one payload per connection
+        shaped exactly like the connection method's own response.
+
+        Arguments:
+            class_name (str) - the class the connection templates belong to, i.e. 'User'
+            root_args (tuple) - the arguments of the root field, i.e. (login,)
+            connections (dict) - maps connection names to their keyword arguments
+            doc_types (dict) - maps connection names to the doc_type used when
+                    logging errors
+
+        Returns:
+            dict - maps each connection name to its payload, or False if errors
+                    occurred for that connection
+        """
+        root, query = self._compose_connections(class_name, root_args, connections)
+        return self._split_connections(root, root_args, connections, doc_types, self._post(query))
+
+    def _compose_connections(self, class_name, root_args, connections):
+        """Internal function that builds the aliased document used by _batch_connections.
+
+        Returns:
+            tuple - (the template providing the root field, the json payload)
+        """
+        root = None
+        selections = []
+        for name, kwargs in connections.items():
+            template = TEMPLATES.get(class_name, name, self.profile)
+            root = root or template
+            selections.append(template.render_selection(name, name, self._format_filters(kwargs)))
+        query = {"query" : 'query { %s { %s } }' % (root.render_root(*root_args),
+                                                   ' '.join(selections))}
+        return root, query
+
+    def _split_connections(self, root, root_args, connections, doc_types, response):
+        """Internal function that splits the response to a document built by
+        _compose_connections into one payload per connection."""
+        login = str(root_args[0])
+        data = (response.get('data') or {}).get(root.root_field) or {}
+        shared = dict((key, value) for key, value in data.items() if key not in connections)
+        errors = dict((name, []) for name in connections)
+        for error in response.get('errors', []):
+            path = error.get('path') or []
+            if len(path) > 1 and path[1] in errors:
+                errors[path[1]].append(error)
+            else:
+                for name in errors:
+                    errors[name].append(error)
+
+        payloads = {}
+        for name in connections:
+            if errors[name] or name not in data:
+                self._errors_exist(doc_types.get(name, root.root_field), login,
+                                   {"errors": errors[name] or ['{} missing from response'.format(name)]})
+                payloads[name] = False
+                continue
+            node = dict(shared)
+            node[name] = data[name]
+            payloads[name] = {"data": {root.root_field: node}}
+        return payloads
+
+    def _batch_roots(self, template, arguments):
+        """Internal function that repeats a template's root field once per set of
+        arguments, each under its own alias, and sends them in a single request.
+
+        Arguments:
+            template (Template) - the template to repeat, i.e. the one used by update()
+            arguments (list) - one tuple of template arguments per alias
+
+        Returns:
+            list - one payload per set of arguments, in order, each shaped like the
+                    template's own response; errors belonging to an alias are
+                    returned under the payload's "errors" key
+        """
+        query = self._compose_roots(template, arguments)
+        return self._split_roots(template, arguments, self._post(query))
+
+    @staticmethod
+    def _compose_roots(template, arguments):
+        """Internal function that builds the aliased document used by _batch_roots.
+        Each set of arguments fills the root field's placeholders first and the
+        selection's after them, in the order they appear in the template."""
+        for args in arguments:
+            if len(args) != template.placeholders:
+                raise TemplateError('{} takes {} argument(s), {} given'
+                                    .format(template.name, template.placeholders, len(args)))
+        split = template.root.count('%s')
+        roots = ['r%d: %s { %s }' % (index, template.render_root(*args[:split]),
+                                     template.selection % tuple(args[split:]))
+                 for index, args in enumerate(arguments)]
+        return {"query" : 'query { %s }' % ' '.join(roots)}
+
+    @staticmethod
+    def _split_roots(template, arguments, response):
+        """Internal function that splits the response to a document built by
+        _compose_roots into one payload per set of arguments."""
+        data = response.get('data') or {}
+        aliases = dict(('r%d' % index, index) for index in range(len(arguments)))
+        errors = [[] for _ in arguments]
+        for error in response.get('errors', []):
+            path = error.get('path') or []
+            if path and path[0] in aliases:
+                errors[aliases[path[0]]].append(error)
+            else:
+                for alias_errors in errors:
+                    alias_errors.append(error)
+
+        payloads = []
+        for alias, index in sorted(aliases.items(), key=lambda item: item[1]):
+            payload = {"data" : {template.root_field: data.get(alias)}}
+            if errors[index]:
+                payload["errors"] = errors[index]
+            elif data.get(alias) is None:
+                root_args = arguments[index][:template.root.count('%s')]
+                payload["errors"] = ['{} returned no data'.format(template.render_root(*root_args))]
+            payloads.append(payload)
+        return payloads
@@ -5,32 +5,42 @@ Issue.py - a Github APIv4 object
 
 """
 
-import json
-import os
-
-import requests
-
-from .GithubObject import GithubObject
-from .decorators import connection
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/'])
+from GithubObject import GithubObject
+from decorators import connection
+from templates import TEMPLATES
 
 
 class Issue(GithubObject):
     """This class represents an Issue.  Upstream reference is at
     https://developer.github.com/v4/object/issue/"""
 
-    def __init__(self, login, repository_name, issue_number):
+    _LOAD_TEMPLATES = (('Issue', 'gh_issue_by_user'), ('Issue', 'gh_issue_by_organization'))
+    _LOAD_DOC_TYPE = 'GithubIssue'
+
+    def __init__(self, login, repository_name, issue_number, profile=None, lazy=False):
         """
          Arguments:
             login (str) - the Github username
             repository_name (str) - name of the repository the Issue belongs to
             issue_number (int) - the id number of the Issue
+
+        Keyword Arguments:
+            profile (str) - the field profile of the query, see profiles.py;
+                    defaults to [Templates] profile
+            lazy (Boolean) - True to only record which issue it is and query the endpoint
+                    on first use or through a Loader, see loader.py
         """
         super(Issue, self).__init__()
-        self.update(login, repository_name, issue_number)
+        self.profile = profile
+        self._login = login
+        self._repository_name = repository_name
+        self._issue_number = issue_number
+        self._defer(lazy, login, repository_name, issue_number)
 
     def __repr__(self):
+        if self.pending:
+            return 'Issue(login={!r}, repository={!r}, number={!r}, pending=True)'.format(
+                self._login, self._repository_name, self._issue_number)
         return 'Issue(number={!r}, title={!r}, author={!r})'.format(self.number, self.title, self.author)
 
     def __eq__(self, other):
@@ -51,14 +61,16 @@ class Issue(GithubObject):
             issue_number (int) - the id number of the Issue
         """
         self._login = login
-        query = {"query" : open(GRAPHQL_DIR+'gh_issue_by_user.graphql', 'r').read() % (login, repository_name, issue_number)}
-        r = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(r.text)
-        if self._errors_exist(self.response):
-            query = {"query" : open(GRAPHQL_DIR+'gh_issue_by_organization.graphql', 'r').read() % (login, repository_name, issue_number)}
-            r = requests.post(url=self.endpoint, json=query, headers=self.headers)
-            self.response = json.loads(r.text)
-            if self._errors_exist(self.response):
+        self._repository_name = repository_name
+        self._issue_number = issue_number
+        query = {"query" : TEMPLATES.render('Issue', 'gh_issue_by_user', login, repository_name, issue_number,
+                                           profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubIssue', login, self.response):
+            query = {"query" : TEMPLATES.render('Issue', 'gh_issue_by_organization', login, repository_name,
+                                               issue_number, profile=self.profile)}
+            self.response = self._post(query)
+            if self._errors_exist('GithubIssue', login, self.response):
                 return False
 
         return True
@@ -144,33 +156,33 @@ class Issue(GithubObject):
 
     @property
     def body(self):
-        """
+        """None when the field profile leaves it out, see profiles.py
         :type str
         """
         try:
-            return self.response['data']['user']['repository']['issue']['body']
+            return self.response['data']['user']['repository']['issue'].get('body')
         except KeyError:
-            return self.response['data']['organization']['repository']['issue']['body']
+            return self.response['data']['organization']['repository']['issue'].get('body')
 
     @property
     def bodyHTML(self):
-        """
+        """None when the field profile leaves it out, see profiles.py
         :type str
         """
         try:
-            return self.response['data']['user']['repository']['issue']['bodyHTML']
+            return self.response['data']['user']['repository']['issue'].get('bodyHTML')
         except KeyError:
-            return self.response['data']['organization']['repository']['issue']['bodyHTML']
+            return self.response['data']['organization']['repository']['issue'].get('bodyHTML')
 
     @property
     def bodyText(self):
-        """
+        """None when the field profile leaves it out, see profiles.py
         :type str
         """
         try:
-            return self.response['data']['user']['repository']['issue']['bodyText']
+            return self.response['data']['user']['repository']['issue'].get('bodyText')
         except KeyError:
-            return self.response['data']['organization']['repository']['issue']['bodyText']
+            return self.response['data']['organization']['repository']['issue'].get('bodyText')
 
     @property
     def closed(self):
@@ -304,13 +316,13 @@ class Issue(GithubObject):
 
     @property
     def reactionGroups(self):
-        """
+        """None when the field profile leaves it out, see profiles.py
         :type dict
         """
         try:
-            return self.response['data']['user']['repository']['issue']['reactionGroups']
+            return self.response['data']['user']['repository']['issue'].get('reactionGroups')
         except KeyError:
-            return self.response['data']['organization']['repository']['issue']['reactionGroups']
+            return self.response['data']['organization']['repository']['issue'].get('reactionGroups')
 
     @property
     def repository(self):
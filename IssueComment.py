@@ -7,42 +7,63 @@ TODO: This class is still a Work in Progress
 
 """
 
-import json
-import os
+from node import Node
+from decorators import connection
 
-import requests
 
-from .GithubObject import GithubObject
-from .decorators import connection
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/'])
-
-
-class IssueComment(GithubObject):
+class IssueComment(Node):
     """This class represents a comment on an Issue.  Upstream reference is at
-    https://developer.github.com/v4/object/issuecomment/"""
+    https://developer.github.com/v4/object/issuecomment/
+
+    Attributes:
+        author (dict) - the actor who authored the comment
+        authorAssociation (str) - author's association with the subject of the comment
+        body (str) - identifies the comment body
+        bodyHTML (str) - the comment body rendered to HTML
+        bodyText (str) - the body rendered to text
+        createdAt (str) - when the comment was created (An ISO-8601 encoded UTC date string)
+        createdViaEmail (Boolean) - whether the comment was created via an email reply
+        databaseId (int) - identifies the primary key from the database
+        editor (dict) - the actor who edited the comment
+        id (str) - the comment's GraphQL id
+        includesCreatedEdit (Boolean) - whether the comment was edited and includes an
+                edit with the creation data
+        isMinimized (Boolean) - whether or not the comment has been minimized
+        issue (dict) - the issue the comment belongs to
+        lastEditedAt (str) - the moment the editor made the last edit
+        minimizedReason (str) - why the comment was minimized
+        publishedAt (str) - when the comment was published
+        pullRequest (dict) - the pull request the comment was made on, if any
+        reactionGroups (list) - reactions grouped by content left on the subject
+        repository (dict) - the repository associated with the comment
+        resourcePath (str) - the HTTP path for the comment
+        updatedAt (str) - when the comment was last updated
+        url (str) - the HTTP URL for the comment
+        viewerCanDelete (Boolean) - whether the current viewer can delete the comment
+        viewerCanMinimize (Boolean) - whether the current viewer can minimize the comment
+        viewerCanReact (Boolean) - whether the current viewer can react to the comment
+        viewerCanUpdate (Boolean) - whether the current viewer can update the comment
+        viewerCannotUpdateReasons (list) - why the current viewer can not update the comment
+        viewerDidAuthor (Boolean) - whether the viewer authored the comment
+    """
+
+    __slots__ = ('author', 'authorAssociation', 'body', 'bodyHTML', 'bodyText', 'createdAt',
+                 'createdViaEmail', 'databaseId', 'editor', 'id', 'includesCreatedEdit',
+                 'isMinimized', 'issue', 'lastEditedAt', 'minimizedReason', 'publishedAt',
+                 'pullRequest', 'reactionGroups', 'repository', 'resourcePath', 'updatedAt',
+                 'url', 'viewerCanDelete', 'viewerCanMinimize', 'viewerCanReact',
+                 'viewerCanUpdate', 'viewerCannotUpdateReasons', 'viewerDidAuthor')
 
     def __init__(self, data):
         """
         Arguments:
-            data (str) - a json-formatted gist comment node from a user.issueComments query
+            data (dict) - an issue comment edge or node from a user.issueComments query
         """
-        super(Gist, self).__init__()
-        self.data = data
+        super(IssueComment, self).__init__(data)
 
     def __repr__(self):
         return 'IssueComment(id={!r}, createdAt={!r})'.format(self.id, self.createdAt)
 
-    def __eq__(self, other):
-        if other.__class__ is not self.__class__:
-            return NotImplemented
-        return self.id == other.id
-
-    def __ne__(self, other):
-        if other.__class__ is not self.__class__:
-            return NotImplemented
-        return self.id != other.id
-
     @connection
     def reactions(self, **kwargs):
         """A list of reactions left on the Issue.
@@ -57,11 +78,8 @@ class IssueComment(GithubObject):
 
         WIP: This function is a work in progress.
         """
-        query = {"query" : open('resources/gh_issue_comment_reactions.graphql', 'r').read() % (self.owner, self.name)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        if self._errors_exist(resp):
-            return False
-        return resp
+        return self._query_connection('IssueComment', 'issuecomment_reactions',
+                                      'GithubIssueCommentReactions', (self.id,), kwargs)
 
     @connection
     def userContentEdits(self, **kwargs):
@@ -77,213 +95,5 @@ class IssueComment(GithubObject):
         TODO: This function should return a GithubObject, GistComment instead of json eventually.
                 see https://developer.github.com/v4/object/gistcomment/
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open('resources/gh_gist_comment_user_content_edits.graphql', 'r').read() % (self.owner,
-                                                                                     self.name)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        if self._errors_exist(resp):
-            return False
-        return resp
-
-    @property
-    def author(self):
-        """The actor who authored the comment.
-        :type dict
-        """
-        return self.data['node']['author']
-
-    @property
-    def authorAssociation(self):
-        """Author's association with the gist.
-        :type str
-        """
-        return self.data['node']['authorAssocation']
-
-    @property
-    def body(self):
-        """Identifies the comment body.
-        :type str
-        """
-        return self.data['node']['body']
-
-    @property
-    def bodyHTML(self):
-        """The comment body rendered to HTML.
-        :type str
-        """
-        return self.data['node']['bodyHTML']
-
-    @property
-    def bodyText(self):
-        """The body rendered to text.
-        :type str
-        """
-        return self.data['node']['bodyText']
-
-    @property
-    def createdAt(self):
-        """Identifies the date and time when the object was created.
-        :type: string  (An ISO-8601 encoded UTC date string)
-        """
-        return self.data['node']['createdAt']
-
-    @property
-    def createdViaEmail(self):
-        """Check if this comment was created via an email reply.
-        :type: Boolean
-        """
-        return self.data['node']['createdViaEmail']
-
-    @property
-    def databaseId(self):
-        """Identifies the primary key from the database.
-        :type str
-        """
-        return self.data['node']['databaseId']
-
-    @property
-    def editor(self):
-        """The actor who edited the comment.
-        :type dict
-        """
-        return self.data['node']['editor']
-
-    @property
-    def id(self):
-        """
-        :type str
-        """
-        return self.data['node']['id']
-
-    @property
-    def includesCreatedEdit(self):
-        """
-        Check if this comment was edited and includes an edit with the creation data
-        :type: Boolean
-        """
-        return self.data['node']['includesCreatedEdit']
-
-    @property
-    def isMinimized(self):
-        """Returns whether or not a comment has been minimized.
-        :type: Boolean
-        """
-        return self.data['node']['isMinimized']
-
-    @property
-    def issue(self):
-        """Identifies the issue associated with the comment.
-        :type dict
-        """
-        return self.data['node']['issue']
-
-    @property
-    def lastEditedAt(self):
-        """The moment the editor made the last edit
-        :type: string  (An ISO-8601 encoded UTC date string)
-        """
-        return self.data['node']['lastEditedAt']
-
-    @property
-    def minimizedReason(self):
-        """Returns why the comment was minimized.
-        :type: str
-        """
-        return self.data['node']['minimizedReason']
-
-    @property
-    def publishedAt(self):
-        """Identifies when the comment was published at.
-        :type: str  (An ISO-8601 encoded UTC date string)
-        """
-        return self.data['node']['publishedAt']
-
-    @property
-    def pullRequest(self):
-        """
-        Returns the pull request associated with the comment, if this comment was made on a pull
-        request.
-        :type: dict
-        """
-        return self.data['node']['pullRequest']
-
-    @property
-    def reactionGroups(self):
-        """A list of reactions grouped by content left on the subject.
-        :type: dict
-        """
-        return self.data['node']['reactionGroups']
-
-    @property
-    def repository(self):
-        """The repository associated with this node.
-        :type: dict
-        """
-        return self.data['node']['repository']
-
-    @property
-    def resourcePath(self):
-        """The HTTP path for this issue comment
-        :type: str
-        """
-        return self.data['node']['resourcePath']
-
-    @property
-    def updatedAt(self):
-        """Identifies the date and time when the object was last updated
-        :type: str  (An ISO-8601 encoded UTC date string)
-        """
-        return self.data['node']['updatedAt']
-
-    @property
-    def url(self):
-        """The HTTP URL for this issue comment
-        :type: str
-        """
-        return self.data['node']['url']
-
-    @property
-    def viewerCanDelete(self):
-        """Check if the current viewer can delete this object.
-        :type: boolean
-        """
-        return self.data['node']['viewerCanDelete']
-
-    @property
-    def viewerCanMinimize(self):
-        """Check if the current viewer can minimize this object.
-        :type: boolean
-        """
-        return self.data['node']['viewerCanDelete']
-
-    @property
-    def viewerCanReact(self):
-        """Can user react to this subject
-        :type: boolean
-        """
-        return self.data['node']['viewerCanReact']
-
-    @property
-    def viewerCanUpdate(self):
-        """Check if the current viewer can update this object.
-        :type: boolean
-        """
-        return self.data['node']['viewerCanUpdate']
-
-    @property
-    def viewerCannotUpdateReasons(self):
-        """Reasons why the current viewer can not update this comment.
-        :type: str
-        """
-        return self.data['node']['viewerCannotUpdateReasons']
-
-    @property
-    def viewerDidAuthor(self):
-        """Did the viewer author this comment.
-        :type: Boolean
-        """
-        return self.data['node']['viewerDidAuthor']
+        return self._query_connection('IssueComment', 'issuecomment_user_content_edits',
+                                      'GithubIssueCommentUserContentEdits', (self.id,), kwargs)
@@ -5,31 +5,34 @@ Issues.py - a Github APIv4 object
 
 """
 
-import json
-import os
-
-import requests
-
-from .GithubObject import GithubObject
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/'])
+from GithubObject import GithubObject
+from templates import TEMPLATES
 
 
 class Issues(GithubObject):
     """An iterable object that represents all issues associated with a user. Upstream
     reference is at https://developer.github.com/v4/object/issues/"""
 
-    def __init__(self, login, limit=100):
+    _LOAD_TEMPLATES = (('Issues', 'gh_issues_by_user'), ('Issues', 'gh_issues_by_organization'))
+    _LOAD_DOC_TYPE = 'GithubIssues'
+
+    def __init__(self, login, limit=100, profile=None, lazy=False):
         """Queries the remote endpoint using the update function by passing
         the provided GitHub login name. This will populate the object with
-        data for that persona."""
+        data for that persona.  Pages hold limit issues, with the fields of
+        the given profile (see profiles.py).  A lazy object queries on first
+        use or through a Loader instead, see loader.py."""
         super(Issues, self).__init__()
+        self.profile = profile
         self.response = ''
         self.limit = int(limit)
-        self.update(login)
+        self._login = login
+        self._defer(lazy, login)
         self.initialPage = True
 
     def __repr__(self):
+        if self.pending:
+            return 'Issues(login={!r}, pending=True)'.format(self._login)
         return 'Issues(totalCount={!r}, startCursor={!r}, endCursor={!r})'.format(self.totalCount, self.startCursor, self.endCursor)
 
     def __eq__(self, other):
@@ -52,16 +55,14 @@ class Issues(GithubObject):
         elif not self.hasNextPage:
             self.reset()
             raise StopIteration
-        query = {"query" : open(GRAPHQL_DIR+'gh_issues_by_user_next.graphql', 'r').read() \
-                 % (self._login, self.endCursor)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(resp.text)
-        if self._errors_exist(self.response):
-            query = {"query" : open(GRAPHQL_DIR+'gh_issues_by_organization_next.graphql', 'r').read() \
-                    % (self._login, self.endCursor)}
-            resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-            self.response = json.loads(resp.text)
-            if self._errors_exist(self.response):
+        query = {"query" : TEMPLATES.render('Issues', 'gh_issues_by_user_next', \
+                                           self._login, self.limit, self.endCursor, profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubIssues', self._login, self.response):
+            query = {"query" : TEMPLATES.render('Issues', 'gh_issues_by_organization_next', \
+                                               self._login, self.limit, self.endCursor, profile=self.profile)}
+            self.response = self._post(query)
+            if self._errors_exist('GithubIssues', self._login, self.response):
                 return False
 
         return self
@@ -80,18 +81,21 @@ class Issues(GithubObject):
         Github endpoint.
         """
         self._login = login
-        query = {"query" : open(GRAPHQL_DIR+'gh_issues_by_user.graphql', 'r').read() % (login)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(resp.text)
-        if self._errors_exist(self.response):
-            query = {"query" : open(GRAPHQL_DIR+'gh_issues_by_organization.graphql', 'r').read() % (login)}
-            r = requests.post(url=self.endpoint, json=query, headers=self.headers)
-            self.response = json.loads(r.text)
-            if self._errors_exist(self.response):
+        query = {"query" : TEMPLATES.render('Issues', 'gh_issues_by_user', login, self.limit,
+                                           profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubIssues', self._login, self.response):
+            query = {"query" : TEMPLATES.render('Issues', 'gh_issues_by_organization', login, self.limit,
+                                               profile=self.profile)}
+            self.response = self._post(query)
+            if self._errors_exist('GithubIssues', self._login, self.response):
                 return False
 
         return True
 
+    def _load_arguments(self):
+        return (self._login, self.limit)
+
     @property
     def startCursor(self):
         """
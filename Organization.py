@@ -10,35 +10,48 @@ TODO: This class is still a Work in Progress
 
 """
 
-import json
-import os
-
-import requests
-
 from GithubObject import GithubObject
 from Repositories import Repositories
 from decorators import connection
+from templates import TEMPLATES
 
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/Organization/'])
+# doc_type used when logging errors for each connection
+CONNECTION_DOC_TYPES = {
+    'membersWithRole': 'GithubOrgMembersWithRole',
+    'pendingMembers': 'GithubOrgPendingMembers',
+    'pinnedRepositories': 'GithubOrgPinnedRepositories',
+    'projects': 'GithubOrgProjects',
+    'repositories': 'GithubOrgRepositories',
+    'teams': 'GithubOrgTeams',
+}
 
 
 class Organization(GithubObject):
     """This class represents Organizations.  Upstream reference is at
     https://developer.github.com/v4/object/organization/"""
 
-    def __init__(self, login):
+    _LOAD_TEMPLATES = (('Organization', 'organization'),)
+    _LOAD_DOC_TYPE = 'GithubOrganization'
+
+    def __init__(self, login, lazy=False):
         """Initialize an instance or the Organization object. This will
         query the remote endpoint using the provided login name and populate
         the object with data.
 
         Arguments:
             login (str) - the organization's login name
+
+        Keyword Arguments:
+            lazy (Boolean) - True to only record the login and query the endpoint
+                    on first use or through a Loader, see loader.py
         """
         super(Organization, self).__init__()
-        self._login = None
-        self.update(login)
+        self._login = login
+        self._defer(lazy, login)
 
     def __repr__(self):
+        if self.pending:
+            return 'Organization(login={!r}, pending=True)'.format(self._login)
         return 'Organization(name={!r}, url={!r})'.format(self.login, self.url)
 
     def __eq__(self, other):
@@ -62,14 +75,29 @@ class Organization(GithubObject):
             boolean - False if errors exist, True otherwise
         """
         self._login = login
-        query = {"query" : open(GRAPHQL_DIR+'organization.graphql', 'r').read() % (login)}
-        r = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(r.text)
-        if self._errors_exist(self.response):
+        query = {"query" : TEMPLATES.render('Organization', 'organization', login, profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubOrganization', login, self.response):
             return False
 
         return True
 
+    def batch(self, connections):
+        """Queries the first page of several connections in a single request
+        instead of one request per connection.
+
+        Arguments:
+            connections (dict) - maps connection names to the keyword arguments the
+                    connection method would be called with, i.e.
+                    {'membersWithRole': {'first': 100}, 'teams': {'first': 100}}
+
+        Returns:
+            dict - maps each connection name to the payload its connection method
+                    would have returned, or False if errors occurred for it
+        """
+        return self._batch_connections('Organization', (self.login,), connections,
+                                       CONNECTION_DOC_TYPES)
+
     @connection
     def membersWithRole(self, **kwargs):
         """A list of users who are members of this organization.
@@ -83,18 +111,8 @@ class Organization(GithubObject):
         Returns:
             json object where each node contains a login of a member
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'organization_membersWithRole.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        members_with_role = json.loads(resp.text)
-        if self._errors_exist('GithubOrgMembersWithRole', self.login, members_with_role):
-            return False
-
-        return members_with_role
+        return self._query_connection('Organization', 'organization_membersWithRole',
+                                      'GithubOrgMembersWithRole', (self.login,), kwargs)
 
     @connection
     def pendingMembers(self, **kwargs):
@@ -109,18 +127,8 @@ class Organization(GithubObject):
         Returns:
             json object where each node contains a login of a pending member
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'organization_pendingMembers.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        pending_members = json.loads(resp.text)
-        if self._errors_exist('GithubOrgPendingMembers', self.login, pending_members):
-            return False
-
-        return pending_members
+        return self._query_connection('Organization', 'organization_pendingMembers',
+                                      'GithubOrgPendingMembers', (self.login,), kwargs)
 
     @connection
     def pinnedRepositories(self, **kwargs):
@@ -152,18 +160,8 @@ class Organization(GithubObject):
         Returns:
             json object where each node contains a nameWithOwner of a pinned respository
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'organization_pinnedRepositories.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        pinned_repositories = json.loads(resp.text)
-        if self._errors_exist('GithubOrgPinnedRepositories', self.login, pinned_repositories):
-            return False
-
-        return pinned_repositories
+        return self._query_connection('Organization', 'organization_pinnedRepositories',
+                                      'GithubOrgPinnedRepositories', (self.login,), kwargs)
 
     @connection
     def projects(self, **kwargs):
@@ -181,18 +179,8 @@ class Organization(GithubObject):
         Returns:
             json object where each node contains a project under this organization
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'organization_projects.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        projects = json.loads(resp.text)
-        if self._errors_exist('GithubOrgProjects', self.login, projects):
-            return False
-
-        return projects
+        return self._query_connection('Organization', 'organization_projects',
+                                      'GithubOrgProjects', (self.login,), kwargs)
 
     @connection
     def repositories(self, **kwargs):
@@ -225,18 +213,8 @@ class Organization(GithubObject):
         Returns:
             json object where each node contains a repository under this organization
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'organization_repositories.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        repositories = json.loads(resp.text)
-        if self._errors_exist('GithubOrgRepositories', self.login, repositories):
-            return False
-
-        return repositories
+        return self._query_connection('Organization', 'organization_repositories',
+                                      'GithubOrgRepositories', (self.login,), kwargs)
 
     @connection
     def teams(self, **kwargs):
@@ -262,18 +240,8 @@ class Organization(GithubObject):
         Returns:
             json object where each node contains a team under this organization
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'organization_teams.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        teams = json.loads(resp.text)
-        if self._errors_exist('GithubOrgTeams', self.login, teams):
-            return False
-
-        return teams
+        return self._query_connection('Organization', 'organization_teams',
+                                      'GithubOrgTeams', (self.login,), kwargs)
 
     @property
     def avatarUrl(self, size=None):
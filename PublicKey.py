@@ -6,46 +6,28 @@ PublicKey.py - a Github APIv4 object
 TODO: This class is still a Work in Progress
 
 """
-from .GithubObject import GithubObject
+from node import Node
 
 
-class PublicKey(GithubObject):
+class PublicKey(Node):
     """This class represents a user's public key.  Upstream reference is at
-    https://developer.github.com/v4/object/publickey/"""
+    https://developer.github.com/v4/object/publickey/
+
+    Attributes:
+        owner (str) - the github login of the owner of this key
+        id (str) - the key's GraphQL id
+        key (str) - the public key string
+    """
+
+    __slots__ = ('owner', 'id', 'key')
 
     def __init__(self, login, data):
         """
         Arguments:
             login (str) - the github login of the owner of this key
-            data (str) - a json-formatted public key from github's api
+            data (dict) - a public key edge or node from a user.publicKeys query
         """
-        super(PublicKey, self).__init__()
-        self._owner = login
-        self.data = data
+        super(PublicKey, self).__init__(data, owner=login)
 
     def __repr__(self):
-        return 'PublicKey(id={!r}, owner={!r})'.format(self.id, self._owner)
-
-    def __eq__(self, other):
-        if other.__class__ is not self.__class__:
-            return NotImplemented
-        return self.id == other.id
-
-    def __ne__(self, other):
-        if other.__class__ is not self.__class__:
-            return NotImplemented
-        return self.id != other.id
-
-    @property
-    def id(self):
-        """
-        :type str
-        """
-        return self.data['node']['id']
-
-    @property
-    def key(self):
-        """The public key string
-        :type str
-        """
-        return self.data['node']['key']
+        return 'PublicKey(id={!r}, owner={!r})'.format(self.id, self.owner)
@@ -5,26 +5,26 @@ Repositories.py - a Github APIv4 object
 
 """
 
-import json
-import os
-
-import requests
-
 from GithubObject import GithubObject
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/'])
+from templates import TEMPLATES
 
 
 class Repositories(GithubObject):
     """An iterable dataset of repositories
     Upstream reference is at https://developer.github.com/v4/object/repository/"""
 
-    def __init__(self, login, **kwargs):
+    _LOAD_TEMPLATES = (('Repositories', 'gh_repositories_by_user'),
+                       ('Repositories', 'gh_repositories_by_organization'))
+    _LOAD_DOC_TYPE = 'GithubRepositories'
+
+    def __init__(self, login, lazy=False, **kwargs):
         """
         Arguments:
             login (str) - the owner of the repositories
 
         Keyword Arguments:
+            lazy (Boolean) - True to only record the login and query the endpoint
+                    on first use or through a Loader, see loader.py
             affiliations ([RepositoryAffiliation]) - List of viewer's affiliation options for
                     repositories returned from the connection.  For example, OWNER will include only
                     repositories that the current viewer owns.
@@ -47,17 +47,21 @@ class Repositories(GithubObject):
                     The default value is
                     ["OWNER", "COLLABORATOR"].
             privacy (RepositoryPrivacy) - If non-null, filters repositories according to privacy.
+
+            Pages hold 100 repositories unless first or last is given.
         """
         super(Repositories, self).__init__()
         self.response = None
-        self.update(login)
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        self.filters = ''.join(filters)
+        if 'last' not in kwargs:
+            kwargs.setdefault('first', 100)
+        self.filters = self._format_filters(kwargs)
+        self._login = login
+        self._defer(lazy, login)
         self.initialPage = True
 
     def __repr__(self):
+        if self.pending:
+            return 'Repositories(login={!r}, pending=True)'.format(self._login)
         return 'Repositories(login={!r}, startCursor={!r}, endCursor={!r})'.format(self._login, self.startCursor, self.endCursor)
 
     def __eq__(self, other):
@@ -80,15 +84,14 @@ class Repositories(GithubObject):
         elif not self.hasNextPage:
             self.reset()
             raise StopIteration
-        query = {"query" : open(GRAPHQL_DIR+'gh_repositories_by_user_next.graphql', 'r').read() \
-                 % (self._login, self.endCursor)}
-        r = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(r.text)
-        if self._errors_exist(self.response):
-            query = {"query" : open(GRAPHQL_DIR+'gh_repositories_by_organization_next.graphql', 'r').read() \
-                    % (self._login, self.endCursor)}
-            r = requests.post(url=self.endpoint, json=query, headers=self.headers)
-            self.response = json.loads(r.text)
+        query = {"query" : TEMPLATES.render('Repositories', 'gh_repositories_by_user_next', \
+                                           self._login, self.filters, self.endCursor, profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubRepositories', self._login, self.response):
+            query = {"query" : TEMPLATES.render('Repositories', 'gh_repositories_by_organization_next', \
+                                               self._login, self.filters, self.endCursor,
+                                               profile=self.profile)}
+            self.response = self._post(query)
             return False
 
         return self
@@ -110,20 +113,21 @@ class Repositories(GithubObject):
             login (str)
         """
         self._login = login
-        query = { "query" : open(GRAPHQL_DIR+'gh_repositories_by_user.graphql','r').read() \
-                 % (login, self.filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(resp.text)
-        if self._errors_exist(self.response):
-            query = { "query" : open(GRAPHQL_DIR+'gh_repositories_by_organization.graphql','r').read() \
-                    % (login, self.filters)}
-            resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-            self.response = json.loads(resp.text)
-            if self._errors_exist(self.response):
+        query = { "query" : TEMPLATES.render('Repositories', 'gh_repositories_by_user', login, self.filters,
+                                            profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubRepositories', self._login, self.response):
+            query = { "query" : TEMPLATES.render('Repositories', 'gh_repositories_by_organization', login,
+                                                self.filters, profile=self.profile)}
+            self.response = self._post(query)
+            if self._errors_exist('GithubRepositories', self._login, self.response):
                 return False
 
         return True
 
+    def _load_arguments(self):
+        return (self._login, self.filters)
+
     @property
     def startCursor(self):
         """
@@ -5,31 +5,36 @@ Repository.py - a Github APIv4 object
 
 """
 
-import json
-import os
-
-import requests
-
-from .GithubObject import GithubObject
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/Repository/'])
+import identity
+from GithubObject import GithubObject
+from templates import TEMPLATES
 
 
 class Repository(GithubObject):
     """This class represents a Repository.  Upstream reference is at
     https://developer.github.com/v4/object/repository/"""
 
-    def __init__(self, name, owner):
+    _LOAD_TEMPLATES = (('Repository', 'repository'),)
+    _LOAD_DOC_TYPE = 'GithubRepository'
+
+    def __init__(self, name, owner, profile=None, *, lazy=False):
         """
         Arguments:
             name (str) - the name of the repository
             owner (str) - the owner of the repository, i.e. their login name
+
+        Keyword Arguments:
+            profile (str) - the field profile of the query, see profiles.py;
+                    defaults to [Templates] profile
+            lazy (Boolean) - True to only record the name and owner and query the endpoint
+                    on first use or through a Loader, see loader.py
         """
         super(Repository, self).__init__()
-        self._name = None
-        self._owner = None
+        self.profile = profile
+        self._name = name
+        self._owner = owner
         self.response = None
-        self.update(name, owner)
+        self._defer(lazy, name, owner)
 
     def __len__(self):
         """Returns the size of the repository in kilobytes
@@ -39,6 +44,8 @@ class Repository(GithubObject):
         return self.response['data']['repository']['diskUsage']
 
     def __repr__(self):
+        if self.pending:
+            return 'Repository(name={!r}, owner={!r}, pending=True)'.format(self._name, self._owner)
         return 'Repository(name={!r}, owner={!r})'.format(self.name, self.owner)
 
     def __eq__(self, other):
@@ -124,14 +131,51 @@ class Repository(GithubObject):
         """
         self._name = name
         self._owner = owner
-        query = {"query" : open(GRAPHQL_DIR+'repository.graphql', 'r').read() % (owner, name)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(resp.text)
-        if self._errors_exist(self.response):
+        query = {"query" : TEMPLATES.render('Repository', 'repository', owner, name, profile=self.profile)}
+        self.response = self._post(query)
+        if self._errors_exist('GithubRepository', owner, self.response):
             return False
 
         return True
 
+    def _load_arguments(self):
+        return (self._owner, self._name)
+
+    @classmethod
+    def _identity_key(cls, name, owner, profile=None, *, lazy=False):
+        return identity.key(cls, profile, 'nameWithOwner', '{}/{}'.format(owner, name))
+
+    @classmethod
+    def from_node(cls, node, profile=None):
+        """Returns the shared Repository for a node of a connection, i.e. a starred
+        repository, building a lazy one if it is not in the identity map yet (see
+        identity.py).
+
+        Arguments:
+            node (dict) - a node selecting nameWithOwner, or name and owner { login },
+                    or an edge holding one
+
+        Keyword Arguments:
+            profile (str) - the field profile of the repository's query
+
+        Returns:
+            Repository - the shared repository; it is queried on first use
+        """
+        node = node['node'] if 'node' in node else node
+        if node.get('nameWithOwner'):
+            owner, name = node['nameWithOwner'].split('/', 1)
+        else:
+            owner, name = node['owner']['login'], node['name']
+        keys = [cls._identity_key(name, owner, profile)]
+        if node.get('id'):
+            keys.insert(0, identity.key(cls, profile, 'id', node['id']))
+        identities = identity.get_identity_map()
+        shared = identities.get(*keys)
+        if shared is None:
+            shared = cls(name, owner, profile=profile, lazy=True)
+        # also maps the keys it was not found under, i.e. its id
+        return identities.add(shared, *keys)
+
     @property
     def codeOfConduct(self):
         """
@@ -5,32 +5,59 @@ User.py - a Github APIv4 object
 
 """
 
-import json
-import os
-
-import requests
-
+import identity
 from GithubObject import GithubObject
 from Repositories import Repositories
 from decorators import connection
-
-GRAPHQL_DIR = ''.join([os.path.dirname(os.path.realpath(__file__)), '/graphql/User/'])
+from loader import Loader
+from templates import TEMPLATES
+
+# doc_type used when logging errors for each connection
+CONNECTION_DOC_TYPES = {
+    'commitComments': 'GithubCommitComments',
+    'followers': 'GithubFollowers',
+    'following': 'GithubFollowing',
+    'gistComments': 'GithubGistComment',
+    'gists': 'GithubGist',
+    'issueComments': 'GithubIssueComment',
+    'issues': 'GithubIssues',
+    'organizations': 'GithubOrganization',
+    'pinnedRepositories': 'GithubPinnedRepositories',
+    'publicKeys': 'GithubPublicKeys',
+    'pullRequests': 'GithubPullRequests',
+    'repositories': 'GithubRepositories',
+    'repositoriesContributedTo': 'GithubRepositoriesContributedTo',
+    'starredRepositories': 'GithubStarredRepositories',
+    'watching': 'GithubWatching',
+}
 
 
 class User(GithubObject):
     """This class represents Users.  Upstream reference is at
     https://developer.github.com/v4/object/user/"""
 
-    def __init__(self, login):
+    _LOAD_TEMPLATES = (('User', 'user'),)
+    _LOAD_DOC_TYPE = 'GithubUser'
+
+    def __init__(self, login, profile=None, *, lazy=False):
         """
         Arguments:
             login (str) - the Github user's username
+
+        Keyword Arguments:
+            profile (str) - the field profile of this user's queries and those of
+                    its connections, see profiles.py; defaults to [Templates] profile
+            lazy (Boolean) - True to only record the login and query the endpoint
+                    on first use or through a Loader, see loader.py
         """
         super(User, self).__init__()
-        self._login = None
-        self.update(login)
+        self._login = login
+        self.profile = profile
+        self._defer(lazy, login)
 
     def __repr__(self):
+        if self.pending:
+            return 'User(login={!r}, pending=True)'.format(self._login)
         return 'User(login={!r}, url={!r})'.format(self.login, self.url)
 
     def __eq__(self, other):
@@ -91,14 +118,83 @@ class User(GithubObject):
             boolean - False if errors exist, True otherwise
         """
         self._login = login
-        query = {"query" : open(GRAPHQL_DIR+'user.graphql', 'r').read() % (login)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        self.response = json.loads(resp.text)
+        query = {"query" : TEMPLATES.render('User', 'user', login, profile=self.profile)}
+        self.response = self._post(query)
         if self._errors_exist('GithubUser', login, self.response):
             return False
 
         return True
 
+    @classmethod
+    def _identity_key(cls, login, profile=None, *, lazy=False):
+        return identity.key(cls, profile, 'login', login)
+
+    @classmethod
+    def from_node(cls, node, profile=None):
+        """Returns the shared User for a node of a connection, i.e. a follower,
+        building a lazy one if it is not in the identity map yet (see identity.py).
+
+        Arguments:
+            node (dict) - a node selecting at least login, or an edge holding one
+
+        Keyword Arguments:
+            profile (str) - the field profile of the user's queries
+
+        Returns:
+            User - the shared user; it is queried on first use
+        """
+        node = node['node'] if 'node' in node else node
+        keys = [cls._identity_key(node['login'], profile)]
+        if node.get('id'):
+            keys.insert(0, identity.key(cls, profile, 'id', node['id']))
+        identities = identity.get_identity_map()
+        shared = identities.get(*keys)
+        if shared is None:
+            shared = cls(node['login'], profile=profile, lazy=True)
+        # also maps the keys it was not found under, i.e. its id
+        return identities.add(shared, *keys)
+
+    @classmethod
+    def fetch_many(cls, logins, batch_size=50, profile=None):
+        """Builds a User for each login, querying up to batch_size profiles per
+        request instead of one request per login.  See loader.py.
+
+        Arguments:
+            logins (iterable) - the Github usernames to fetch
+
+        Keyword Arguments:
+            batch_size (int) - the number of logins queried in each request
+            profile (str) - the field profile of the users' queries, see profiles.py
+
+        Returns:
+            list - the User objects that were fetched, in the order of logins;
+                    logins with errors are logged and left out
+
+        Raises:
+            None
+        """
+        users = [cls(login, profile=profile, lazy=True) for login in logins]
+        return Loader(batch_size).add(*users).load()
+
+    def batch(self, connections):
+        """Queries the first page of several connections in a single request
+        instead of one request per connection.
+
+        Arguments:
+            connections (dict) - maps connection names to the keyword arguments the
+                    connection method would be called with, i.e.
+                    {'followers': {'first': 100},
+                     'gists': {'first': 100, 'privacy': 'ALL'}}
+
+        Returns:
+            dict - maps each connection name to the payload its connection method
+                    would have returned, or False if errors occurred for it
+
+        Raises:
+            None
+        """
+        return self._batch_connections('User', (self.login,), connections, CONNECTION_DOC_TYPES)
+
     @connection
     def commitComments(self, **kwargs):
         """A list of commit comments made by this user. This is a connection (edge/relationships).
@@ -115,18 +211,8 @@ class User(GithubObject):
         Raises:
             None
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {}, ".format(key, value))
-        filters = ''.join(filters)
-        filters = filters.rstrip(', ')
-        query = {"query" : open(GRAPHQL_DIR+'user_commit_comments.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        commit_comments = json.loads(resp.text)
-        if self._errors_exist('GithubCommitComments', self.login, commit_comments):
-            return False
-
-        return commit_comments
+        return self._query_connection('User', 'user_commit_comments',
+                                      'GithubCommitComments', (self.login,), kwargs)
 
     @connection
     def followers(self, **kwargs):
@@ -144,17 +230,8 @@ class User(GithubObject):
         Raises:
             None
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_followers.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        followers = json.loads(resp.text)
-        if self._errors_exist('GithubFollowers', self.login, followers):
-            return False
-
-        return followers
+        return self._query_connection('User', 'user_followers',
+                                      'GithubFollowers', (self.login,), kwargs)
 
     @connection
     def following(self, **kwargs):
@@ -172,17 +249,8 @@ class User(GithubObject):
         Raises:
             None
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_following.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        following = json.loads(resp.text)
-        if self._errors_exist('GithubFollowing', self.login, following):
-            return False
-
-        return following
+        return self._query_connection('User', 'user_following',
+                                      'GithubFollowing', (self.login,), kwargs)
 
     @connection
     def gistComments(self, **kwargs):
@@ -200,17 +268,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_gist_comments.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        gist_comments = json.loads(resp.text)
-        if self._errors_exist('GithubGistComment', self.login, gist_comments):
-            return False
-
-        return gist_comments
+        return self._query_connection('User', 'user_gist_comments',
+                                      'GithubGistComment', (self.login,), kwargs)
 
     @connection
     def gists(self, **kwargs):
@@ -230,17 +289,7 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_gists.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        gists = json.loads(resp.text)
-        if self._errors_exist('GithubGist', self.login, gists):
-            return False
-
-        return gists
+        return self._query_connection('User', 'user_gists', 'GithubGist', (self.login,), kwargs)
 
     @connection
     def issueComments(self, **kwargs):
@@ -258,18 +307,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        # kwargs contains the Optional Arguments: after, before, first, last
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_issue_comments.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        issue_comments = json.loads(resp.text)
-        if self._errors_exist('GithubIssueComment', self.login, issue_comments):
-            return False
-
-        return issue_comments
+        return self._query_connection('User', 'user_issue_comments',
+                                      'GithubIssueComment', (self.login,), kwargs)
 
     @connection
     def issues(self, **kwargs):
@@ -291,17 +330,7 @@ class User(GithubObject):
         Raises:
             None
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_issues.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        issues = json.loads(resp.text)
-        if self._errors_exist('GithubIssues', self.login, issues):
-            return False
-
-        return issues
+        return self._query_connection('User', 'user_issues', 'GithubIssues', (self.login,), kwargs)
 
     @connection
     def organizations(self, **kwargs):
@@ -319,17 +348,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_organizations.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        organizations = json.loads(resp.text)
-        if self._errors_exist('GithubOrganization', self.login, organizations):
-            return False
-
-        return organizations
+        return self._query_connection('User', 'user_organizations',
+                                      'GithubOrganization', (self.login,), kwargs)
 
     @connection
     def pinnedRepositories(self, **kwargs):
@@ -365,17 +385,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_pinned_repositories.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        pinned_repositories = json.loads(resp.text)
-        if self._errors_exist('GithubPinnedRepositories', self.login, pinned_repositories):
-            return False
-
-        return pinned_repositories
+        return self._query_connection('User', 'user_pinned_repositories',
+                                      'GithubPinnedRepositories', (self.login,), kwargs)
 
     @connection
     def publicKeys(self, **kwargs):
@@ -394,17 +405,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_public_keys.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        public_keys = json.loads(resp.text)
-        if self._errors_exist('GithubPublicKeys', self.login, public_keys):
-            return False
-
-        return public_keys
+        return self._query_connection('User', 'user_public_keys',
+                                      'GithubPublicKeys', (self.login,), kwargs)
 
     @connection
     def pullRequests(self, **kwargs):
@@ -428,17 +430,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_pull_requests.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        pull_requests = json.loads(resp.text)
-        if self._errors_exist('GithubPullRequests', self.login, pull_requests):
-            return False
-
-        return pull_requests
+        return self._query_connection('User', 'user_pull_requests',
+                                      'GithubPullRequests', (self.login,), kwargs)
 
     @connection
     def repositories(self, **kwargs):
@@ -474,17 +467,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_repositories.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        repositories = json.loads(resp.text)
-        if self._errors_exist('GithubRepositories', self.login, repositories):
-            return False
-
-        return repositories
+        return self._query_connection('User', 'user_repositories',
+                                      'GithubRepositories', (self.login,), kwargs)
 
     @connection
     def repositoriesContributedTo(self, **kwargs):
@@ -512,17 +496,8 @@ class User(GithubObject):
         Raises:
             None
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_repositories_contributed_to.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        repositories_contributed_to = json.loads(resp.text)
-        if self._errors_exist('GithubRepositoriesContributedTo', self.login, repositories_contributed_to):
-            return False
-
-        return repositories_contributed_to
+        return self._query_connection('User', 'user_repositories_contributed_to',
+                                      'GithubRepositoriesContributedTo', (self.login,), kwargs)
 
     @connection
     def starredRepositories(self, **kwargs):
@@ -543,17 +518,8 @@ class User(GithubObject):
         Raises:
             None
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_starred_repositories.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        starred_repositories = json.loads(resp.text)
-        if self._errors_exist('GithubStarredRepositories', self.login, starred_repositories):
-            return False
-
-        return starred_repositories
+        return self._query_connection('User', 'user_starred_repositories',
+                                      'GithubStarredRepositories', (self.login,), kwargs)
 
     @connection
     def watching(self, **kwargs):
@@ -587,17 +553,8 @@ class User(GithubObject):
         Raises:
             NotImplementedError
         """
-        filters = []
-        for key, value in kwargs.items():
-            filters.append("{}: {},".format(key, value))
-        filters = ''.join(filters)
-        query = {"query" : open(GRAPHQL_DIR+'user_watching.graphql', 'r').read() % (self.login, filters)}
-        resp = requests.post(url=self.endpoint, json=query, headers=self.headers)
-        watching = json.loads(resp.text)
-        if self._errors_exist('GithubWatching', self.login, watching):
-            return False
-
-        return watching
+        return self._query_connection('User', 'user_watching',
+                                      'GithubWatching', (self.login,), kwargs)
 
     @property
     def avatarUrl(self, size=None):
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+aio.py - asyncio variants of the GithubObjects
+
+Every class here mirrors its blocking counterpart, and keeps all of its
+properties, but performs network I/O as coroutines over a shared aiohttp
+connection pool:
+
+    user = await AsyncUser.fetch('octocat')
+    followers = await user.followers(first=100)
+    async for page in AsyncRepositories('octocat'):
+        print(page.nodes)
+
+Constructors never touch the network; call and await update() (or use the
+fetch() class method) to populate an object.  gather_bounded() runs many
+coroutines concurrently with at most a fixed number in flight, i.e.
+
+    users = await gather_bounded([AsyncUser.fetch(login) for login in logins], 50)
+
+This module requires the optional aiohttp dependency (pip install githubv4[async]).
+"""
+import asyncio
+import json
+import threading
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import retry
+import settings
+from GithubObject import GithubObject
+from Gist import Gist
+from Issue import Issue
+from Issues import Issues
+from Organization import Organization
+from Repositories import Repositories
+from Repository import Repository
+from User import User
+from templates import TEMPLATES
+from transport import CONNECT_TIMEOUT, ENDPOINT, READ_TIMEOUT
+
+_lock = threading.Lock()
+_transport = None
+
+
+class AsyncTransport(object):
+    """A pooled, keep-alive aiohttp transport for the Github GraphQL endpoint."""
+
+    def __init__(self, endpoint=ENDPOINT, pool_maxsize=100, session=None,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        """
+        Arguments:
+            endpoint (str) - the url GraphQL queries are posted to
+
+        Keyword Arguments:
+            pool_maxsize (int) - the maximum number of connections open at once
+            session (aiohttp.ClientSession) - an existing session to post with
+            connect_timeout (float) - seconds to wait for a connection to open
+            read_timeout (float) - seconds to wait between reads of the response
+
+        Raises:
+            ImportError - if aiohttp is not installed
+        """
+        if aiohttp is None:
+            raise ImportError('The asyncio client requires aiohttp: pip install githubv4[async]')
+        self.endpoint = endpoint
+        self.pool_maxsize = int(pool_maxsize)
+        self.session = session
+        self.timeout = aiohttp.ClientTimeout(sock_connect=float(connect_timeout),
+                                             sock_read=float(read_timeout))
+
+    def __repr__(self):
+        return 'AsyncTransport(endpoint={!r})'.format(self.endpoint)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds an AsyncTransport from the [Transport] section of collectors.cfg"""
+        if not config.has_section('Transport'):
+            return cls()
+        section = config['Transport']
+        return cls(endpoint=section.get('endpoint', ENDPOINT),
+                   pool_maxsize=section.getint('pool_maxsize', 100),
+                   connect_timeout=section.getfloat('connect_timeout', CONNECT_TIMEOUT),
+                   read_timeout=section.getfloat('read_timeout', READ_TIMEOUT))
+
+    async def post(self, query, headers=None):
+        """Posts a GraphQL query to the endpoint over a pooled connection.
+
+        Arguments:
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Keyword Arguments:
+            headers (dict) - request headers such as the Authorization token
+
+        Returns:
+            tuple - (the body of the response, the response headers); the body of a
+                    rate limit refusal is replaced by the json of retry.refusal()
+                    so the token's RateLimiter acts on it
+
+        Raises:
+            retry.RetryableError - if the response is a transient failure, i.e. a 502
+            retry.FatalError - if it is any other failure status
+        """
+        if self.session is None:
+            # the session has to be created from within the running event loop
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        async with self.session.post(self.endpoint, json=query, headers=headers,
+                                     timeout=self.timeout) as resp:
+            text, response_headers = await resp.text(), dict(resp.headers)
+        if retry.rate_limited(resp.status, text, response_headers):
+            return json.dumps(retry.refusal(resp.status, text)), response_headers
+        retry.classify(resp.status, text, response_headers)
+        return text, response_headers
+
+    async def close(self):
+        """Closes every pooled connection held by this transport"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def get_async_transport(config=None):
+    """Returns the process-wide async transport, creating it on first use.
+
+    Arguments:
+        config (ConfigParser) - optional parsed collectors.cfg used to build the
+                transport the first time it is requested
+
+    Returns:
+        AsyncTransport - the shared transport
+    """
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = AsyncTransport.from_config(config) if config is not None else AsyncTransport()
+    return _transport
+
+
+def set_async_transport(transport):
+    """Replaces the process-wide async transport, i.e. with a stand-in for tests.
+
+    Arguments:
+        transport - any object with a coroutine post(query, headers) method that
+                returns (body, headers); None resets the shared transport
+
+    Returns:
+        the previously installed transport (or None)
+    """
+    global _transport
+    with _lock:
+        previous = _transport
+        _transport = transport
+    return previous
+
+
+# rebuilt from the new settings on next use, see settings.reload_settings
+settings.on_reload(lambda new_settings: set_async_transport(None))
+
+
+async def gather_bounded(coroutines, limit):
+    """Runs coroutines concurrently with at most limit of them in flight.
+
+    Arguments:
+        coroutines (iterable) - the coroutines to run
+        limit (int) - the maximum number of coroutines running at once
+
+    Returns:
+        list - the result of each coroutine, in order; a coroutine that raised
+                contributes its exception instead of a result
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*[run(coroutine) for coroutine in coroutines],
+                                return_exceptions=True)
+
+
+class AsyncGithubObject(object):
+    """Mixin that turns a GithubObject's network I/O into coroutines.  It must come
+    before the GithubObject subclass it is mixed into."""
+
+    @classmethod
+    def _identity_key(cls, *args, **kwargs):
+        """Internal function; async objects are loaded with await, so they are not
+        shared through the identity map"""
+        return None
+
+    async def _post(self, query):
+        """Internal function that sends a query through the shared async transport
+        with the pooled token that has the most budget left, pausing without
+        blocking the event loop whenever every token is exhausted.  Transient
+        failures are retried under the shared retry policy (see retry.py).
+
+        Arguments:
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Returns:
+            dict - the decoded json response; when the query could not be sent it
+                    carries the failure in "errors" like any other GraphQL error
+        """
+        while True:
+            token, limiter = self.token_pool.checkout()
+            delay = limiter.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            headers = dict(self.headers, Authorization='token %s' % token) if token else self.headers
+            injected = limiter.inject(query)
+
+            async def attempt():
+                text, response_headers = await get_async_transport(self.config).post(
+                    injected, headers=headers)
+                return retry.decode(text, response_headers), response_headers
+            try:
+                payload, response_headers = await self.retry_policy.call_async(
+                    attempt, retryable=(aiohttp.ClientConnectionError,) if aiohttp else ())
+            except (retry.RetryableError, retry.FatalError) as error_msg:
+                return {'errors': [{'type': error_msg.__class__.__name__, 'message': str(error_msg)}]}
+            if not limiter.observe(payload, response_headers):
+                return payload
+
+    async def _post_first(self, doc_type, login, queries):
+        """Internal function that posts each query in turn until one succeeds, i.e.
+        a user query followed by its organization fallback.
+
+        Returns:
+            boolean - False if every query returned errors, True otherwise
+        """
+        for query in queries:
+            self.response = await self._post(query)
+            if not self._errors_exist(doc_type, login, self.response):
+                return True
+        return False
+
+    async def _query_connection(self, class_name, name, doc_type, root_args, kwargs):
+        """Internal function shared by connection methods that queries a single page
+        of a connection.  See GithubObject._query_connection."""
+        query = TEMPLATES.get(class_name, name, self.profile).query(*(root_args + (self._format_filters(kwargs),)))
+        payload = await self._post(query)
+        if self._errors_exist(doc_type, str(root_args[0]), payload):
+            return False
+
+        return payload
+
+    async def _batch_connections(self, class_name, root_args, connections, doc_types):
+        """Internal function that queries the first page of several connections in
+        a single request.  See GithubObject._batch_connections."""
+        root, query = self._compose_connections(class_name, root_args, connections)
+        return self._split_connections(root, root_args, connections, doc_types,
+                                       await self._post(query))
+
+    async def _batch_roots(self, template, arguments):
+        """Internal function that repeats a template's root field once per set of
+        arguments in a single request.  See GithubObject._batch_roots."""
+        query = self._compose_roots(template, arguments)
+        return self._split_roots(template, arguments, await self._post(query))
+
+
+class AsyncUser(AsyncGithubObject, User):
+    """An asyncio variant of User.  Connection methods, i.e. followers(), return
+    awaitables."""
+
+    def __init__(self, login, profile=None):
+        """
+        Arguments:
+            login (str) - the Github user's username
+
+        Keyword Arguments:
+            profile (str) - the field profile of its queries, see profiles.py
+        """
+        GithubObject.__init__(self)
+        self.profile = profile
+        self._login = login
+        self.response = None
+
+    @classmethod
+    async def fetch(cls, login, profile=None):
+        """Builds an AsyncUser and populates it from the endpoint"""
+        user = cls(login, profile)
+        await user.update()
+        return user
+
+    @classmethod
+    async def fetch_many(cls, logins, batch_size=50, profile=None):
+        """Builds an AsyncUser for each login, querying up to batch_size profiles
+        per request.  See User.fetch_many."""
+        template = TEMPLATES.get('User', 'user', profile)
+        logins = list(logins)
+        fetched = []
+        for start in range(0, len(logins), batch_size):
+            batch = [cls(login, profile) for login in logins[start:start + batch_size]]
+            payloads = await batch[0]._batch_roots(template, [(user._login,) for user in batch])
+            for user, payload in zip(batch, payloads):
+                user.response = payload
+                if not user._errors_exist('GithubUser', user._login, payload):
+                    fetched.append(user)
+        return fetched
+
+    async def update(self, login=None):
+        """Updates the AsyncUser with new data by querying the Github endpoint.
+
+        Arguments:
+            login (str) - the Github user's username; defaults to the current one
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        self._login = login or self._login
+        return await self._post_first('GithubUser', self._login,
+                                      [TEMPLATES.get('User', 'user', self.profile).query(self._login)])
+
+
+class AsyncOrganization(AsyncGithubObject, Organization):
+    """An asyncio variant of Organization."""
+
+    def __init__(self, login):
+        """
+        Arguments:
+            login (str) - the organization's login name
+        """
+        GithubObject.__init__(self)
+        self._login = login
+        self.response = None
+
+    @classmethod
+    async def fetch(cls, login):
+        """Builds an AsyncOrganization and populates it from the endpoint"""
+        organization = cls(login)
+        await organization.update()
+        return organization
+
+    async def update(self, login=None):
+        """Updates the AsyncOrganization with new data by querying the Github endpoint.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        self._login = login or self._login
+        return await self._post_first('GithubOrganization', self._login,
+                                      [TEMPLATES.get('Organization', 'organization',
+                                                     self.profile).query(self._login)])
+
+
+class AsyncRepository(AsyncGithubObject, Repository):
+    """An asyncio variant of Repository."""
+
+    def __init__(self, name, owner, profile=None):
+        """
+        Arguments:
+            name (str) - the name of the repository
+            owner (str) - the owner of the repository, i.e. their login name
+
+        Keyword Arguments:
+            profile (str) - the field profile of its queries, see profiles.py
+        """
+        GithubObject.__init__(self)
+        self.profile = profile
+        self._name = name
+        self._owner = owner
+        self.response = None
+
+    @classmethod
+    async def fetch(cls, name, owner, profile=None):
+        """Builds an AsyncRepository and populates it from the endpoint"""
+        repository = cls(name, owner, profile)
+        await repository.update()
+        return repository
+
+    async def update(self, name=None, owner=None):
+        """Updates the AsyncRepository with new data by querying the Github endpoint.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        self._name = name or self._name
+        self._owner = owner or self._owner
+        query = TEMPLATES.get('Repository', 'repository', self.profile).query(self._owner, self._name)
+        return await self._post_first('GithubRepository', self._owner, [query])
+
+
+class AsyncGist(AsyncGithubObject, Gist):
+    """An asyncio variant of Gist."""
+
+    def __init__(self, name, owner):
+        """
+        Arguments:
+            name (str) - the name of the gist
+            owner (str) - the owner of the gist, i.e. their login name
+        """
+        GithubObject.__init__(self)
+        self._name = name
+        self._owner = owner
+        self.response = None
+
+    @classmethod
+    async def fetch(cls, name, owner):
+        """Builds an AsyncGist and populates it from the endpoint"""
+        gist = cls(name, owner)
+        await gist.update()
+        return gist
+
+    async def update(self, name=None, owner=None):
+        """Updates the AsyncGist with new data by querying the Github endpoint.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        self._name = name or self._name
+        self._owner = owner or self._owner
+        query = TEMPLATES.get('Gist', 'gist', self.profile).query(self._owner, self._name)
+        return await self._post_first('GithubGist', self._owner, [query])
+
+
+class AsyncIssue(AsyncGithubObject, Issue):
+    """An asyncio variant of Issue."""
+
+    def __init__(self, login, repository_name, issue_number, profile=None):
+        """
+        Arguments:
+            login (str) - the Github username
+            repository_name (str) - name of the repository the Issue belongs to
+            issue_number (int) - the id number of the Issue
+
+        Keyword Arguments:
+            profile (str) - the field profile of its queries, see profiles.py
+        """
+        GithubObject.__init__(self)
+        self.profile = profile
+        self._login = login
+        self._repository_name = repository_name
+        self._issue_number = issue_number
+        self.response = None
+
+    @classmethod
+    async def fetch(cls, login, repository_name, issue_number, profile=None):
+        """Builds an AsyncIssue and populates it from the endpoint"""
+        issue = cls(login, repository_name, issue_number, profile)
+        await issue.update()
+        return issue
+
+    async def update(self):
+        """Updates the AsyncIssue with new data by querying the Github endpoint,
+        trying the login as a user first and as an organization second.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        args = (self._login, self._repository_name, self._issue_number)
+        queries = [TEMPLATES.get('Issue', 'gh_issue_by_user', self.profile).query(*args),
+                   TEMPLATES.get('Issue', 'gh_issue_by_organization', self.profile).query(*args)]
+        return await self._post_first('GithubIssue', self._login, queries)
+
+
+class AsyncRepositories(AsyncGithubObject, Repositories):
+    """An asyncio variant of Repositories that pages with async for:
+
+        async for page in AsyncRepositories('octocat'):
+            print(page.nodes)
+    """
+
+    def __init__(self, login, **kwargs):
+        """
+        Arguments:
+            login (str) - the owner of the repositories
+
+        Keyword Arguments:
+            see Repositories
+        """
+        GithubObject.__init__(self)
+        self._login = login
+        self.response = None
+        if 'last' not in kwargs:
+            kwargs.setdefault('first', 100)
+        self.filters = self._format_filters(kwargs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.response is None:
+            if not await self.update():
+                raise StopAsyncIteration
+            return self
+        if not self.hasNextPage:
+            raise StopAsyncIteration
+        args = (self._login, self.filters, self.endCursor)
+        queries = [TEMPLATES.get('Repositories', 'gh_repositories_by_user_next', self.profile).query(*args),
+                   TEMPLATES.get('Repositories', 'gh_repositories_by_organization_next',
+                                 self.profile).query(*args)]
+        if not await self._post_first('GithubRepositories', self._login, queries):
+            raise StopAsyncIteration
+        return self
+
+    async def update(self, login=None):
+        """Fetches the first page of repositories, trying the login as a user first
+        and as an organization second.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        self._login = login or self._login
+        args = (self._login, self.filters)
+        queries = [TEMPLATES.get('Repositories', 'gh_repositories_by_user', self.profile).query(*args),
+                   TEMPLATES.get('Repositories', 'gh_repositories_by_organization', self.profile).query(*args)]
+        return await self._post_first('GithubRepositories', self._login, queries)
+
+
+class AsyncIssues(AsyncGithubObject, Issues):
+    """An asyncio variant of Issues that pages with async for:
+
+        async for page in AsyncIssues('octocat'):
+            print(page.nodes)
+    """
+
+    def __init__(self, login, limit=100, profile=None):
+        """
+        Arguments:
+            login (str) - the Github login the issues are associated with
+
+        Keyword Arguments:
+            limit (int) - the number of issues per page
+            profile (str) - the field profile of its queries, see profiles.py
+        """
+        GithubObject.__init__(self)
+        self.profile = profile
+        self._login = login
+        self.limit = int(limit)
+        self.response = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.response is None:
+            if not await self.update():
+                raise StopAsyncIteration
+            return self
+        if not self.hasNextPage:
+            raise StopAsyncIteration
+        args = (self._login, self.limit, self.endCursor)
+        queries = [TEMPLATES.get('Issues', 'gh_issues_by_user_next', self.profile).query(*args),
+                   TEMPLATES.get('Issues', 'gh_issues_by_organization_next', self.profile).query(*args)]
+        if not await self._post_first('GithubIssues', self._login, queries):
+            raise StopAsyncIteration
+        return self
+
+    async def update(self, login=None):
+        """Fetches the first page of issues, trying the login as a user first and
+        as an organization second.
+
+        Returns:
+            boolean - False if errors exist, True otherwise
+        """
+        self._login = login or self._login
+        args = (self._login, self.limit)
+        queries = [TEMPLATES.get('Issues', 'gh_issues_by_user', self.profile).query(*args),
+                   TEMPLATES.get('Issues', 'gh_issues_by_organization', self.profile).query(*args)]
+        return await self._post_first('GithubIssues', self._login, queries)
@@ -5,44 +5,154 @@ github.py - Collect Github data using the GraphQL API v4
 
 Dependencies
 ============
-This script requires access to Elasticsearch and a redis cache.  The configurations for these
-are written in the __init__ function of the GithubCollector class.
+This script requires access to Elasticsearch, configured in the [Elasticsearch] section of
+collectors.cfg, and a store for crawl cursors, configured in the [State] section: redis,
+a local SQLite file, or memory.
 """
 import json
 import os
 #from pathlib import Path
-import logging
-import logging.config
 
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import datetime
-import redis
+import threading
+import time
 
 from elasticsearch import Elasticsearch
 from elasticsearch.exceptions import TransportError
 
 from abscollector import Collector
+import mappings
+import profiles
+from journal import Journal
+from pagesize import PageSizeController
+from pagination import CONNECTIONS, Checkpoint, ConnectionDescriptor, Paginator
+from state import CursorStore
+from settings import get_settings
+from sink import BulkSink
 from User import User
 
 
+class ConnectionStats(namedtuple('ConnectionStats',
+                                 ['connection', 'succeeded', 'pages', 'seconds', 'error'])):
+    """The outcome of crawling one connection of one user.
+
+    Attributes:
+        connection (str) - the connection crawled, i.e. 'followers'
+        succeeded (Boolean) - True if every page was fetched and handed to the datastore
+        pages (int) - the pages fetched
+        seconds (float) - the wall-clock time the crawl took
+        error (str) - why the crawl stopped early, None if it succeeded
+    """
+    __slots__ = ()
+
+
 class GithubCollector(Collector):
     """Creates a Github collection object."""
 
-    def __init__(self):
-        """Configure logger & establish connections to cache and datastore"""
+    def __init__(self, profile=None):
+        """Configure logger & establish connections to cache and datastore
+
+        Keyword Arguments:
+            profile (str) - the field profile every user crawled is queried with,
+                    see profiles.py; None leaves each user's own profile
+        """
         super(GithubCollector, self).__init__()
-        config_file = ('collectors.cfg')
-        log_file = self.config['Github']['log_file']
-        logging.config.fileConfig(config_file,
-                                  defaults={'GithubCollector': log_file}
-                                 )
-        self.logger = logging.getLogger('GithubCollector')
-        self.elasticsearch = Elasticsearch(['localhost:9200'])
-        self.redis = redis.Redis(host='127.0.0.1', port=6379, password='')
+        # logging is configured once per process from collectors.cfg, see settings.py
+        self.logger = get_settings().logger
+        hosts = self.config.get('Elasticsearch', 'hosts', fallback='localhost:9200')
+        self.elasticsearch = Elasticsearch([host.strip() for host in hosts.split(',')])
+        # documents from every save_* method are indexed in bulk, see sink.py
+        self.sink = BulkSink.from_config(self.elasticsearch, self.config, self.logger)
+        # indices known to exist, so each is checked at most once per process
+        self._known_indices = set()
+        self._install_templates = self.config.getboolean('Elasticsearch', 'index_templates',
+                                                         fallback=True)
+        self._index_lock = threading.Lock()
+        # pages fetched but not yet flushed to elasticsearch, see journal.py
+        self.journal = Journal.from_config(self.config)
+        self._journal_lock = threading.RLock()
+        # pages journaled but not yet handed to the sink
+        self._journaling = 0
+        self._resume = {}
+        self._recovered = False
+        # where cursors are kept between runs, see state.py; the checkpoints of a
+        # bulk flush are written together
+        self.state = CursorStore.from_config(self.config, connections=CONNECTIONS)
+        self.sink.callback_context = self.state.pipeline
+        # page sizes learned per connection, see pagesize.py
+        self.page_sizes = PageSizeController.from_config(self.config, logger=self.logger)
+        self.profile = profiles.check(profile) if profile is not None else None
         self.timestamp = datetime.date.today().isoformat()
 
     def __repr__(self):
         """Defines the representation of the object when repr() is called"""
-        return 'GithubCollector()'
+        return 'GithubCollector(profile={!r})'.format(self.profile)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def flush(self):
+        """Sends every document still buffered for elasticsearch.
+
+        Returns:
+            boolean - True if every document was indexed, False otherwise
+        """
+        return self.sink.flush()
+
+    def close(self):
+        """Flushes buffered documents, applies the end-of-crawl refresh policy and
+        closes the journal.  Call this (or use the collector as a context manager)
+        when a crawl is done.
+
+        Returns:
+            boolean - True if every document was indexed, False otherwise
+        """
+        succeeded = self.sink.close()
+        with self._journal_lock:
+            self._trim_journal()
+            if self.journal is not None:
+                self.journal.close()
+        self.state.close()
+        return succeeded
+
+    def recover(self):
+        """Replays pages left in the journal by a previous run into the bulk sink,
+        checkpointing their cursors once they are flushed, so the connections they
+        belong to resume after them instead of fetching them again.  Runs
+        automatically before the first connection is saved.
+
+        Returns:
+            int - the number of pages replayed
+        """
+        with self._journal_lock:
+            if self._recovered or self.journal is None:
+                self._recovered = True
+                return 0
+            self._recovered = True
+            records = self.journal.replay()
+            checkpoints = {}
+            for record in records:
+                key = (record['login'], record['connection'])
+                if key not in checkpoints:
+                    checkpoints[key] = self._checkpoint(*key)
+                self._save_elasticsearch(record['document'], record['index'], record['doc_type'],
+                                         on_flush=checkpoints[key].page(record['cursor']))
+                self._resume[key] = (record['cursor'], checkpoints[key])
+            if records:
+                self.logger.info('Replayed %d journaled pages', len(records))
+            self._trim_journal()
+            return len(records)
+
+    def _trim_journal(self):
+        """Internal function that empties the journal once nothing is left to flush.
+        Called with _journal_lock held."""
+        if self.journal is not None and self._journaling == 0 and self.sink.outstanding == 0:
+            self.journal.truncate()
 
     def __str__(self):
         """Defines a less formal string representation for when str() is called on the object"""
@@ -92,55 +202,76 @@ class GithubCollector(Collector):
                 with open(filepath+'.json', 'w') as output_file:
                     output_file.write(json_response.text)
 
-    def _save_elasticsearch(self, json_response, index, doc_type):
-        """Used internally by all save queries to save the json responses
-        directly to an elasticsearch node.
+    def _save_elasticsearch(self, json_response, index, doc_type, on_flush=None):
+        """Used internally by all save queries to queue the json responses for
+        bulk indexing into elasticsearch.  Documents are sent once the sink's
+        buffer fills up, and at the latest when close() is called.
 
         Arguments:
             json_response (dict) - a json object returned from the graphql query
             index (str) - the name of the elasticsearch index you want the
                         json document to get added into
-            nodes (optional, list) - a list of nodes with the following format
-                                    ['localhost:443', 'other_host:443']
-                                    the default is ['localhost:443']
+            doc_type (str) - the elasticsearch doc_type, i.e. GithubFollowers
+            on_flush (callable) - called with True once the document is indexed,
+                        or False if indexing it failed
 
         Returns:
             boolean - True on success, False on failure
         """
-        try:
-            _ = self._ensure_es_index(index)
-            data = self.elasticsearch.index(index=index,
-                                            doc_type=doc_type,
-                                            body=json.dumps(json_response))
-            self.elasticsearch.indices.refresh(index=index)
-        except TransportError as error_msg:
-            self.logger.error('%s triggered while trying to index type %s with body: %s',
-                              error_msg.error, doc_type, json.dumps(json_response))
+        if not self._ensure_es_index(index):
+            if on_flush is not None:
+                on_flush(False)
             return False
-        self.logger.debug("Document added to index '%s' with type '%s'. Document: %s which " \
-                          "returned data: %s", index, doc_type, json.dumps(json_response), data)
+        self.sink.add(index, doc_type, json_response, on_flush=on_flush)
         return True
 
+    def install_index_templates(self):
+        """Puts the index template of every doc_type, see mappings.py, so each
+        daily index is created with an explicit mapping instead of a dynamic one.
+
+        Returns:
+            boolean - True if every template was installed, False otherwise
+        """
+        installed = True
+        for doc_type in mappings.DOC_TYPES:
+            name, body = mappings.index_template(doc_type)
+            try:
+                self.elasticsearch.indices.put_template(name=name, body=body)
+            except TransportError as error_msg:
+                self.logger.error('%s triggered while installing index template %s',
+                                  error_msg.error, name)
+                installed = False
+        return installed
+
     def _ensure_es_index(self, index):
         """Used internally when writing to elasticsearch to ensure a given
-        index exists.
+        index exists.  Elasticsearch is only asked about indices this collector
+        has not seen yet, and the index templates are installed before the first
+        index is checked.
 
         Arguments:
             index (str) - the name of the elasticsearch index
         Returns:
             boolean - True if the index exists, False if something went wrong
         """
-        if not self.elasticsearch.indices.exists(index):
-            try:
-                self.elasticsearch.indices.create(index=index)
-            except TransportError as error_msg:
-                self.logger.error(str(error_msg.error))
-                return False
-            self.logger.info('Created Index: %s', index)
+        if index in self._known_indices:
+            return True
+        with self._index_lock:
+            if index in self._known_indices:
+                return True
+            if self._install_templates:
+                self._install_templates = not self.install_index_templates()
+            if not self.elasticsearch.indices.exists(index):
+                try:
+                    self.elasticsearch.indices.create(index=index)
+                except TransportError as error_msg:
+                    self.logger.error(str(error_msg.error))
+                    return False
+                self.logger.info('Created Index: %s', index)
+            self._known_indices.add(index)
 
         return True
 
-
     def _errors_exist(self, doc_type, login, response_payload):
         """Internal function that checks for errors in the response payload
         of a query.
@@ -160,7 +291,7 @@ class GithubCollector(Collector):
             return True
         return False
 
-    def _write_to_datastore(self, index, doc_type, document, login, path):
+    def _write_to_datastore(self, index, doc_type, document, login, path, on_stored=None):
         """Writes to either the filesystem or elasticsearch depending on the
         configuration settings.
 
@@ -170,16 +301,20 @@ class GithubCollector(Collector):
             document (str) - a json payload to write to Elasticsearch or the filesystem
             login (str) - the login name of the Github user
             path (str) - the path to the file you want to write the document to
+            on_stored (callable) - called with True once the document is durably
+                        stored, which for elasticsearch is after its bulk flush
         """
         if self.config['Github']['datastore'] == 'filesystem':
             filename = self._generate_filename(doc_type, login)
             self._save_file(json.dumps(document), path, filename)
+            if on_stored is not None:
+                on_stored(True)
         elif self.config['Github']['datastore'] == 'elasticsearch':
-            self._save_elasticsearch(document, index, doc_type)
+            self._save_elasticsearch(document, index, doc_type, on_flush=on_stored)
         elif self.config['Github']['datastore'] == 'both':
             filename = self._generate_filename(doc_type, login)
             self._save_file(json.dumps(document), path, filename)
-            self._save_elasticsearch(document, index, doc_type)
+            self._save_elasticsearch(document, index, doc_type, on_flush=on_stored)
         else:
             error_msg = "Unable to save result data for {}.  Check " \
                     " configuration file setting: {}" \
@@ -220,160 +355,218 @@ class GithubCollector(Collector):
 
         return True
 
-    def save_commit_comments(self, user, path=None):
-        """Saves a list of commit comments made by this user.
+    def save_connection(self, user, connection, path=None, deadline=None):
+        """Saves every page of one of a user's connections, resuming after the
+        cursor stored by the previous crawl.  The stored cursor is advanced after
+        each page is durably written, so a crawl that dies part way resumes at
+        the page it stopped on.  All save_* connection methods are shortcuts for
+        this one.
 
-        Required Arguments:
+        Arguments:
             user (GithubUser) - a GithubUser instance
+            connection (str or ConnectionDescriptor) - a key of pagination.CONNECTIONS,
+                    i.e. 'followers', or a descriptor of the connection
 
         Optional Arguments:
             path (str) - the filesystem path to where the query result should be saved
+            deadline (Deadline) - stop fetching pages once it passes; the pages
+                    fetched so far are still stored and checkpointed
 
         Returns:
-            boolean - True if query succeeds, False otherwise
+            boolean - True if query succeeds, False otherwise, including when the
+                    deadline cut the crawl short
 
         Raises:
-            None
+            KeyError - if connection is not a known connection name
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':commitComments:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            commit_comments = u.commitComments(first=100, after=end_cursor)
-        else:
-            commit_comments = u.commitComments(first=100)
-        if not commit_comments: # False when errors occured (check log file)
+        descriptor = connection if isinstance(connection, ConnectionDescriptor) \
+                else CONNECTIONS[connection]
+        user = self._with_profile(user)
+        paginator = self._paginate(user, descriptor, path, deadline)
+        if paginator.error is not None:
+            self.logger.error('%s:%s:%s', descriptor.doc_type, user.login, paginator.error)
             return False
-        while True:
-            if commit_comments['data']['user']['commitComments']['edges']:
-                index = ''.join(['gh_commit_comments-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubCommitComments',
-                                         document=commit_comments,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = commit_comments['data']['user']['commitComments']['pageInfo']['hasNextPage']
-                end_cursor = commit_comments['data']['user']['commitComments']['pageInfo']['endCursor']
-                if has_next_page:
-                    commit_comments = u.commitComments(first=100, after=end_cursor)
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':commitComments:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
         return True
 
-    def save_followers(self, user, path=None):
-        """Saves a list of users the given user is following.
+    def save_all(self, user, connections=None, max_workers=None, path=None, deadline=None):
+        """Saves several of a user's connections concurrently.  Each connection is
+        crawled on its own worker thread, so the time taken is that of the slowest
+        connection rather than the sum of all of them, and a connection that fails
+        or raises does not stop the others.
 
-        Required Arguments:
+        Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the full file path to where you want the json
-                        response saved. Examples: 'c:/your/full/path' or
-                        '/home/username/your/full/path'
-
-                        If this option is ommitted, files will be saved
-                        to the local directory where the script is run.
+            connections (iterable) - keys of pagination.CONNECTIONS or descriptors;
+                    defaults to every connection
+            max_workers (int) - the number of connections crawled at once; defaults
+                    to [Crawl] connection_workers
+            path (str) - the filesystem path to where the query results should be saved
+            deadline (Deadline) - shared by every connection; each stops fetching
+                    pages once it passes
 
         Returns:
-            boolean - True if query succeeds, False otherwise
+            OrderedDict - maps each connection name to its ConnectionStats, in the
+                    order the connections were given
 
         Raises:
-            None
+            KeyError - if a connection is not a known connection name
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':followers:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            followers = u.followers(first=100, after=end_cursor)
+        descriptors = [connection if isinstance(connection, ConnectionDescriptor)
+                       else CONNECTIONS[connection]
+                       for connection in (connections or CONNECTIONS)]
+        if max_workers is None:
+            max_workers = self.config.getint('Crawl', 'connection_workers', fallback=4)
+        self.recover()
+        user = self._with_profile(user)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(descriptors) or 1)),
+                                thread_name_prefix='save_all') as executor:
+            futures = [(descriptor, executor.submit(self._crawl_connection, user, descriptor,
+                                                    path, deadline))
+                       for descriptor in descriptors]
+        return OrderedDict((descriptor.name, future.result()) for descriptor, future in futures)
+
+    def _with_profile(self, user):
+        """Internal function that returns the User whose connections are queried
+        with the collector's field profile, if it has one.  Users are shared
+        through the identity map (see identity.py), so the one mapped under that
+        profile is looked up or built rather than changing the profile of one
+        other holders query with."""
+        if self.profile is None or user.profile == self.profile:
+            return user
+        return User(user._login, profile=self.profile, lazy=True)
+
+    def _crawl_connection(self, user, descriptor, path, deadline=None):
+        """Internal function that saves every page of a connection and reports how
+        it went.  Exceptions are logged and reported rather than raised.
+
+        Returns:
+            ConnectionStats - the outcome of the crawl
+        """
+        started = time.monotonic()
+        paginator = None
+        try:
+            paginator = self._paginate(user, descriptor, path, deadline)
+            error = paginator.error
+        except Exception as error_msg:
+            self.logger.exception('%s:%s:crawl raised', descriptor.doc_type, user.login)
+            error = '{}: {}'.format(error_msg.__class__.__name__, error_msg)
         else:
-            followers = u.followers(first=100)
+            if error is not None:
+                self.logger.error('%s:%s:%s', descriptor.doc_type, user.login, error)
+        return ConnectionStats(descriptor.name, error is None,
+                               paginator.pages if paginator is not None else 0,
+                               time.monotonic() - started, error)
 
-        if not followers:
-            return False
+    def _paginate(self, user, descriptor, path, deadline=None):
+        """Internal function that walks a connection, storing each page and
+        checkpointing its cursor.
 
-        while True:
+        Returns:
+            Paginator - the exhausted paginator
+        """
+        self.recover()
+        after, replayed = self._resume.pop((user.login, descriptor.name), (None, None))
+        if replayed is None or replayed.failed:
+            after = self._load_cursor(user.login, descriptor.name)
+        paginator = Paginator(descriptor, getattr(user, descriptor.name), after=after,
+                              deadline=deadline, sizer=self.page_sizes)
+        checkpoint = self._checkpoint(user.login, descriptor.name)
+        index = descriptor.index(self.timestamp)
+        for page in paginator:
+            if self.journal is not None:
+                with self._journal_lock:
+                    self.journal.append(user.login, descriptor.name, page.end_cursor,
+                                        index, descriptor.doc_type, page.payload)
+                    self._journaling += 1
             try:
-                if followers['data']['user']['followers']['edges']:
-                    index = ''.join(['gh_followers-', self.timestamp])
-                    self._write_to_datastore(index=index,
-                                            doc_type='GithubFollowers',
-                                            document=followers,
-                                            login=user.login,
-                                            path=path)
-                    has_next_page = followers['data']['user']['followers']['pageInfo']['hasNextPage']
-                    end_cursor = followers['data']['user']['followers']['pageInfo']['endCursor']
-                    if has_next_page:
-                        end_cursor = ''.join(['"', end_cursor, '"'])
-                        followers = u.followers(first=100, after=end_cursor)
-                    else:
-                        # Cache the end_cursor where we last collected data
-                        self.redis.set(''.join(['gh:', u.login, ':followers:endCursor']), end_cursor)
-                        break
-                else:
-                    break
-            except TypeError as e:
-                self.logger.error('GithubFollowers', u.login, e)
-                break
+                self._write_to_datastore(index=index,
+                                         doc_type=descriptor.doc_type,
+                                         document=page.payload,
+                                         login=user.login,
+                                         path=path,
+                                         on_stored=checkpoint.page(page.end_cursor))
+            finally:
+                if self.journal is not None:
+                    with self._journal_lock:
+                        self._journaling -= 1
+                        self._trim_journal()
+        return paginator
+
+    def _checkpoint(self, login, connection):
+        """Internal function that returns a Checkpoint storing a connection's cursor"""
+        return Checkpoint(lambda cursor: self._store_cursor(login, connection, cursor))
+
+    def preload(self, logins):
+        """Reads the stored cursors of a batch of logins in one round trip, i.e.
+        before crawling them.
 
-        return True
+        Arguments:
+            logins (iterable) - the logins about to be crawled
+        """
+        self.state.preload(logins)
 
-    def save_following(self, user, path=None):
-        """Saves a list of users the given user is followed by.
+    def forget(self, login):
+        """Drops the cursors cached for a login, so its next crawl reads the ones
+        stored since, i.e. by collectors on other machines.
+
+        Arguments:
+            login (str) - the login whose cursors are dropped
+        """
+        self.state.forget(login)
+
+    def _load_cursor(self, login, connection):
+        """Internal function that returns the cursor a connection's previous crawl
+        ended at, or None"""
+        return self.state.get(login, connection)
+
+    def _store_cursor(self, login, connection, end_cursor):
+        """Internal function that remembers the cursor a connection's crawl ended at"""
+        if end_cursor:
+            self.state.set(login, connection, end_cursor)
+
+    def save_commit_comments(self, user, path=None):
+        """Saves a list of commit comments made by this user.
 
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the full file path to where you want the json
-                         response saved. Examples: 'c:/your/full/path' or
-                         '/home/username/your/full/path'
-
-                        If this option is ommitted, files will be saved
-                        to the local directory where the script is run.
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
             boolean - True if query succeeds, False otherwise
+        """
+        return self.save_connection(user, 'commitComments', path)
 
-        Raises:
-            None
+    def save_followers(self, user, path=None):
+        """Saves a list of users following the given user.
+
+        Required Arguments:
+            user (GithubUser) - a GithubUser instance
+
+        Optional Arguments:
+            path (str) - the filesystem path to where the query result should be saved
+
+        Returns:
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':following:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            following = u.following(first=100, after=end_cursor)
-        else:
-            following = u.following(first=100)
-        if not following:
-            return False
-        while True:
-            if following['data']['user']['following']['edges']:
-                index = ''.join(['gh_following-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubFollowing',
-                                         document=following,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = following['data']['user']['following']['pageInfo']['hasNextPage']
-                end_cursor = following['data']['user']['following']['pageInfo']['endCursor']
-                if has_next_page:
-                    following = u.following(first=100, after=end_cursor)
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':following:endCursor']), end_cursor)
-                    break
-            else:
-                break
+        return self.save_connection(user, 'followers', path)
 
-        return True
+    def save_following(self, user, path=None):
+        """Saves a list of users the given user is following.
+
+        Required Arguments:
+            user (GithubUser) - a GithubUser instance
+
+        Optional Arguments:
+            path (str) - the filesystem path to where the query result should be saved
+
+        Returns:
+            boolean - True if query succeeds, False otherwise
+        """
+        return self.save_connection(user, 'following', path)
 
     def save_gist_comments(self, user, path=None):
         """Saves a list of gist comments made by this user.
@@ -381,106 +574,27 @@ class GithubCollector(Collector):
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
-        Optional:
+        Optional Arguments:
             path (str) - the filesystem path to where the query result should be saved
 
         Returns:
             boolean - True if query succeeds, False otherwise
-
-        Raises:
-            None
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':gistComments:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            gist_comments = u.gistComments(first=100, after=end_cursor)
-        else:
-            gist_comments = u.gistComments(first=100)
-        if not gist_comments:
-            return False
-        while True:
-            if gist_comments['data']['user']['gistComments']['edges']:
-                index = ''.join(['gh_gist_comments-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubGistComments',
-                                         document=gist_comments,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = gist_comments['data']['user']['gistComments']['pageInfo']['hasNextPage']
-                end_cursor = gist_comments['data']['user']['gistComments']['pageInfo']['endCursor']
-                if has_next_page:
-                    gist_comments = u.gistComments(first=100, after=end_cursor)
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':gistComments:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'gistComments', path)
 
     def save_gists(self, user, path=None):
         """Saves a list of Gists the user has created.
 
-        Arguments:
+        Required Arguments:
             user (GithubUser) - a GithubUser instance
 
-        Optional:
-            path (str) - the full file path to where you want the json
-                        response saved. Examples: 'c:/your/full/path' or
-                        '/home/username/your/full/path'
-
-                        If this option is ommitted, files will be saved
-                        to the local directory where the script is run.
+        Optional Arguments:
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
             boolean - True if query succeeds, False otherwise
-
-        Raises:
-            None
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':gists:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            gists = u.gists(first=100,
-                            after=end_cursor,
-                            orderBy='{direction: DESC, field: CREATED_AT}',
-                            privacy='ALL')
-        else:
-            gists = u.gists(first=100,
-                            orderBy='{direction: DESC, field: CREATED_AT}',
-                            privacy='ALL')
-
-        if not gists:
-            return False
-
-        while True:
-            if gists['data']['user']['gists']['edges']:
-                index = ''.join(['gh_gists-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubGists',
-                                         document=gists,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = gists['data']['user']['gists']['pageInfo']['hasNextPage']
-                end_cursor = gists['data']['user']['gists']['pageInfo']['endCursor']
-                if has_next_page:
-                    gists = u.gists(first=100,
-                                    after=end_cursor,
-                                    orderBy='{direction: DESC, field: CREATED_AT}',
-                                    privacy='ALL')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':gists:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'gists', path)
 
     def save_issue_comments(self, user, path=None):
         """Saves a list of issue comments made by this user.
@@ -493,200 +607,50 @@ class GithubCollector(Collector):
 
         Returns:
             boolean - True if query succeeds, False otherwise
-
-        Raises:
-            None
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':issueComments:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            issue_comments = u.issueComments(first=100, after=end_cursor)
-        else:
-            issue_comments = u.issueComments(first=100)
-
-        if not issue_comments:
-            return False
-
-        while True:
-            if issue_comments['data']['user']['issueComments']['edges']:
-                index = ''.join(['gh_issue_comments-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubIssueComments',
-                                         document=issue_comments,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = issue_comments['data']['user']['issueComments']['pageInfo']['hasNextPage']
-                end_cursor = issue_comments['data']['user']['issueComments']['pageInfo']['endCursor']
-                if has_next_page:
-                    issue_comments = u.issueComments(first=100, after=end_cursor)
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':issueComments:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'issueComments', path)
 
     def save_issues(self, user, path=None):
         """Saves a list of issues associated with this user.
 
         Required Arguments:
-            login (str) - the username used to login to GitHub
+            user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
             path (str) - the filesystem path to where the query result should be saved
 
         Returns:
             boolean - True if query succeeds, False otherwise
-
-        Raises:
-            None
         """
-        # Redis has an end_cursor if we've collected this data before
-        last_run = self.redis.get('ghc_last_run').decode('utf-8')
-        if last_run is None:
-            last_run = '2004-01-01' # pull everything
-
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':issues:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            issues = u.issues(first=100,
-                              after=end_cursor,
-                              orderBy='{direction: DESC, field: CREATED_AT}')
-        else:
-            issues = u.issues(first=100,
-                              orderBy='{direction: DESC, field: CREATED_AT}')
-
-        if not issues:
-            return False
-
-        while True:
-            if issues['data']['user']['issues']['edges']:
-                index = ''.join(['gh_issues-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubIssues',
-                                         document=issues,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = issues['data']['user']['issues']['pageInfo']['hasNextPage']
-                end_cursor = issues['data']['user']['issues']['pageInfo']['endCursor']
-                if has_next_page:
-                    issues = u.issues(first=100,
-                                      after=end_cursor,
-                                      orderBy='{direction: DESC, field: CREATED_AT}',
-                                      filterBy='{ since: "'+last_run+'" }')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':issues:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'issues', path)
 
     def save_organizations(self, user, path=None):
         """Saves a list of organizations the user belongs to.
 
-        Arguments:
+        Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the filesystem path where the result should be
-                            saved (defaults to the local directory the script is running from)
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
-            True if query succeeds, False otherwise
-
-        Raises:
-            None
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':organizations:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            organizations = u.organizations(first=100, after=end_cursor)
-        else:
-            organizations = u.organizations(first=100)
-        if not organizations:
-            return False
-        while True:
-            if organizations['data']['user']['organizations']['edges']:
-                index = ''.join(['gh_organizations-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubOrganizations',
-                                         document=organizations,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = organizations['data']['user']['organizations']['pageInfo']['hasNextPage']
-                end_cursor = organizations['data']['user']['organizations']['pageInfo']['endCursor']
-                if has_next_page:
-                    organizations = u.organizations(first=100, after=end_cursor)
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':organizations:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'organizations', path)
 
     def save_pinned_repositories(self, user, path=None):
-        """Saves a list of repositories this user has pinned to their profile.
+        """Saves a list of repositories the user has pinned.
 
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - filesystem path where result should be saved
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
-            True if query succeeds, False otherwise
-
-        Raises:
-            None
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':pinnedRepositories:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            pinned_repositories = u.pinnedRepositories(first=100, # usually more like 6, but we want all possible
-                                                       after=end_cursor,
-                                                       orderBy='{direction: DESC, field: CREATED_AT}')
-        else:
-            pinned_repositories = u.pinnedRepositories(first=100,
-                                                       orderBy='{direction: DESC, field: CREATED_AT}')
-
-        if not pinned_repositories:
-            return False
-
-        while True:
-            if pinned_repositories['data']['user']['pinnedRepositories']['edges']:
-                index = ''.join(['gh_pinned_repositories-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubPinnedRepositories',
-                                         document=pinned_repositories,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = pinned_repositories['data']['user']['pinnedRepositories']['pageInfo']['hasNextPage']
-                end_cursor = pinned_repositories['data']['user']['pinnedRepositories']['pageInfo']['endCursor']
-                if has_next_page:
-                    pinned_repositories = u.pinnedRepositories(first=100,
-                                                               after=end_cursor,
-                                                               orderBy='{direction: DESC, field: CREATED_AT}')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':pinnedRepositories:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'pinnedRepositories', path)
 
     def save_public_keys(self, user, path=None):
         """Saves a list of public keys associated with this user.
@@ -695,47 +659,12 @@ class GithubCollector(Collector):
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the filesystem path to where the query result should be
-            saved; defaults to the current working directory
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
             boolean - True if query succeeds, False otherwise
-
-        Raises:
-            None
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':publicKeys:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            public_keys = u.publicKeys(first=100, after=end_cursor)
-        else:
-            public_keys = u.publicKeys(first=100)
-
-        if not public_keys:
-            return False
-
-        while True:
-            if public_keys['data']['user']['publicKeys']['edges']:
-                index = ''.join(['gh_public_keys-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubPublicKeys',
-                                         document=public_keys,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = public_keys['data']['user']['publicKeys']['pageInfo']['hasNextPage']
-                end_cursor = public_keys['data']['user']['publicKeys']['pageInfo']['endCursor']
-                if has_next_page:
-                    public_keys = u.publicKeys(first=100, after=end_cursor)
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':publicKeys:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'publicKeys', path)
 
     def save_pull_requests(self, user, path=None):
         """Saves a list of pull requests associated with this user.
@@ -744,270 +673,68 @@ class GithubCollector(Collector):
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the filesystem path to where the query result should be
-                         saved; defaults to the current working directory
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
             boolean - True if query succeeds, False otherwise
-
-        Raises:
-            None
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':pullRequests:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            pull_requests = u.pullRequests(first=100,
-                                           after=end_cursor,
-                                           orderBy='{direction: DESC, field: CREATED_AT}')
-        else:
-            pull_requests = u.pullRequests(first=100,
-                                           orderBy='{direction: DESC, field: CREATED_AT}')
-
-        if not pull_requests:
-            return False
-
-        while True:
-            if pull_requests['data']['user']['pullRequests']['edges']:
-                index = ''.join(['gh_pull_requests-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubPullRequests',
-                                         document=pull_requests,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = pull_requests['data']['user']['pullRequests']['pageInfo']['hasNextPage']
-                end_cursor = pull_requests['data']['user']['pullRequests']['pageInfo']['endCursor']
-                if has_next_page:
-                    pull_requests = u.pullRequests(first=100,
-                                                   after=end_cursor,
-                                                   orderBy='{direction: DESC, field: CREATED_AT}')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':pullRequests:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'pullRequests', path)
 
     def save_repositories(self, user, path=None):
-        """Saves a list of repositories that the user owns.
+        """Saves a list of repositories the user owns.
 
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - filesystem path where result should be saved
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
-            True if query succeeds, False otherwise
-
-        Raises:
-            None
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':repositories:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            repositories = u.repositories(first=100,
-                                          after=end_cursor,
-                                          orderBy='{direction: DESC, field: CREATED_AT}')
-        else:
-            repositories = u.repositories(first=100,
-                                          orderBy='{direction: DESC, field: CREATED_AT}')
-
-        if not repositories:
-            return False
-
-        while True:
-            if repositories['data']['user']['repositories']['edges']:
-                index = ''.join(['gh_repositories-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubRepositories',
-                                         document=repositories,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = repositories['data']['user']['repositories']['pageInfo']['hasNextPage']
-                end_cursor = repositories['data']['user']['repositories']['pageInfo']['endCursor']
-                if has_next_page:
-                    repositories = u.repositories(first=100,
-                                                  after=end_cursor,
-                                                  orderBy='{direction: DESC, field: CREATED_AT}')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':repositories:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'repositories', path)
 
     def save_repositories_contributed_to(self, user, path=None):
-        """Saves a list of repositories that the user recently contributed
-        to other than their own.
+        """Saves a list of repositories the user recently contributed to.
 
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - filesystem path where result should be saved
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
-            True if query succeeds, False otherwise
-
-        Raises:
-            None
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':repositoriesContributedTo:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            repositories_contributed_to = u.repositoriesContributedTo(first=100,
-                                                                      after=end_cursor,
-                                                                      orderBy='{direction: DESC, field: CREATED_AT}')
-        else:
-            repositories_contributed_to = u.repositoriesContributedTo(first=100,
-                                                                      orderBy='{direction: DESC, field: CREATED_AT}')
-
-        if not repositories_contributed_to:
-            return False
-
-        while True:
-            if repositories_contributed_to['data']['user']['repositoriesContributedTo']['edges']:
-                index = ''.join(['gh_repositories_contributed_to-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubRepositoriesContributedTo',
-                                         document=repositories_contributed_to,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = repositories_contributed_to['data']['user']['repositoriesContributedTo']['pageInfo']['hasNextPage']
-                end_cursor = repositories_contributed_to['data']['user']['repositoriesContributedTo']['pageInfo']['endCursor']
-                if has_next_page:
-                    repositories_contributed_to = u.repositoriesContributedTo(first=100,
-                                                                              after=end_cursor,
-                                                                              orderBy='{direction: DESC, field: CREATED_AT}')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':repositoriesContributedTo:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'repositoriesContributedTo', path)
 
     def save_starred_repositories(self, user, path=None):
-        """Saves a list of repositories that the user has starred.
+        """Saves a list of repositories the user has starred.
 
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the path to the file where the result should be
-                        saved; defaults to the local directory
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
-            True if query was successful, False otherwise
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':starredRepositories:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            starred_repositories = u.starredRepositories(first=100,
-                                                         after=end_cursor,
-                                                         orderBy='{direction: DESC, field: STARRED_AT}')
-        else:
-            starred_repositories = u.starredRepositories(first=100,
-                                                         orderBy='{direction: DESC, field: STARRED_AT}')
-
-        if not starred_repositories:
-            return False
-
-        while True:
-            try:
-                if starred_repositories['data']['user']['starredRepositories']['edges']:
-                    index = ''.join(['gh_starred_repositories-', self.timestamp])
-                    self._write_to_datastore(index=index,
-                                            doc_type='GithubStarredRepositories',
-                                            document=starred_repositories,
-                                            login=user.login,
-                                            path=path)
-                    has_next_page = starred_repositories['data']['user']['starredRepositories']['pageInfo']['hasNextPage']
-                    end_cursor = starred_repositories['data']['user']['starredRepositories']['pageInfo']['endCursor']
-                    if has_next_page:
-                        end_cursor = ''.join(['"', end_cursor, '"'])
-                        starred_repositories = u.starredRepositories(first=100,
-                                                                    after=end_cursor,
-                                                                    orderBy='{direction: DESC, field: STARRED_AT}')
-                    else:
-                        # Cache the end_cursor where we last collected data
-                        self.redis.set(''.join(['gh:', u.login, ':starredRepositories:endCursor']), end_cursor)
-                        break
-                else:
-                    break
-            except TypeError as e:
-                self.logger.error('GithubStarredRepositories', u.login, e)
-                break
-
-        return True
+        return self.save_connection(user, 'starredRepositories', path)
 
     def save_watching(self, user, path=None):
-        """Saves a list of repositories that the given user is watching.
+        """Saves a list of repositories the user is watching.
 
         Required Arguments:
             user (GithubUser) - a GithubUser instance
 
         Optional Arguments:
-            path (str) - the path to the file where the result should be
-                            saved; defaults to the local directory
-
+            path (str) - the filesystem path to where the query result should be saved
 
         Returns:
-            True if the query succeeds, False otherwise
-
-        Raises:
-            None
+            boolean - True if query succeeds, False otherwise
         """
-        # Redis has an end_cursor if we've collected this data before
-        end_cursor = self.redis.get(''.join(['gh:', user.login, ':watching:endCursor']))
-        if end_cursor:
-            end_cursor = end_cursor.decode('utf-8')
-            end_cursor = ''.join(['"', end_cursor, '"'])
-            watching = u.watching(first=100,
-                                  after=end_cursor,
-                                  orderBy='{direction: DESC, field: CREATED_AT}')
-        else:
-            watching = u.watching(first=100,
-                                  orderBy='{direction: DESC, field: CREATED_AT}')
-
-        if not watching:
-            return False
-
-        while True:
-            if watching['data']['user']['watching']['edges']:
-                index = ''.join(['gh_watching-', self.timestamp])
-                self._write_to_datastore(index=index,
-                                         doc_type='GithubWatching',
-                                         document=watching,
-                                         login=user.login,
-                                         path=path)
-                has_next_page = watching['data']['user']['watching']['pageInfo']['hasNextPage']
-                end_cursor = watching['data']['user']['watching']['pageInfo']['endCursor']
-                if has_next_page:
-                    watching = u.watching(first=100,
-                                          after=end_cursor,
-                                          orderBy='{direction: DESC, field: CREATED_AT}')
-                else:
-                    # Cache the end_cursor where we last collected data
-                    self.redis.set(''.join(['gh:', u.login, ':watching:endCursor']), end_cursor)
-                    break
-            else:
-                break
-
-        return True
+        return self.save_connection(user, 'watching', path)
 
     def verify(self):
         """Verify the api credentials are valid"""
@@ -1015,36 +742,9 @@ class GithubCollector(Collector):
 
 
 if __name__ == "__main__":
-    GC = GithubCollector()
-    with open('/path/to/github_users', 'r') as login_list:
-        for name in login_list:
-            name = name.replace('\n', '').strip()
-            try:
-                u = User(name)
-            except TypeError as e:
-                print("Error: Type error on {}. Message: {}".format(name, e))
-                continue
+    from crawler import CrawlDriver
 
-            try:
-                GC.save_user(u)
-            except TypeError as e:
-                print('TypeError occurred as save_user({}), message: {}'.format(name, e))
-                continue
-
-            # All collector functions return True on success - we don't need that value here
-            # because all errors are logged in /var/log/pipeline/github.log
-            _ = GC.save_commit_comments(u)
-            _ = GC.save_followers(u)
-            _ = GC.save_following(u)
-            _ = GC.save_gist_comments(u)
-            _ = GC.save_gists(u)
-            _ = GC.save_issue_comments(u)
-            _ = GC.save_issues(u)
-            _ = GC.save_organizations(u)
-            _ = GC.save_pinned_repositories(u)
-            _ = GC.save_public_keys(u)
-            _ = GC.save_pull_requests(u)
-            _ = GC.save_repositories(u)
-            _ = GC.save_repositories_contributed_to(u)
-            _ = GC.save_starred_repositories(u)
-            _ = GC.save_watching(u)
+    # All errors are logged in /var/log/pipeline/github.log; the driver keeps
+    # going after a login fails and reports the totals at the end
+    with GithubCollector() as GC:
+        CrawlDriver.from_config(GC).crawl(CrawlDriver.read_logins('/path/to/github_users'))
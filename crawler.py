@@ -0,0 +1,272 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+crawler.py - crawl a stream of logins on a pool of worker threads
+
+A CrawlDriver reads logins lazily from a file or any iterable, skips blank
+lines, comments and logins it has already seen (case-insensitively), and
+crawls each one with a GithubCollector on a fixed pool of worker threads:
+
+    with GithubCollector() as collector:
+        stats = CrawlDriver.from_config(collector).crawl(CrawlDriver.read_logins('logins.txt'))
+        print(stats.summary())
+
+Logins are read in batches.  Each batch's profiles are loaded with
+User.fetch_many, one request per batch, and its stored cursors are preloaded
+before the batch is handed to the workers.  At most queue_size logins are
+waiting for a worker at any time, so memory stays bounded however long the
+input is.  Every worker shares the process-wide transport and token pool.  A
+login that fails is logged and counted, and the crawl moves on.
+
+A crawl can be given a time budget, and so can each login within it (see
+deadline.py).  Once the crawl's budget is spent no further logins are started.
+A login that overruns its budget has its connections cut off after their
+current page, checkpointed, and counted as failed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+import time
+
+from deadline import Deadline
+from User import User
+
+
+class CrawlStats(object):
+    """Aggregate counts for a crawl.
+
+    Attributes:
+        logins (int) - the distinct logins read
+        duplicates (int) - the logins skipped because they were already read
+        succeeded (int) - the logins crawled without errors
+        failed (int) - the logins that could not be loaded or had a connection fail
+        pages (int) - the connection pages fetched
+        seconds (float) - the wall-clock time the crawl took
+    """
+
+    def __init__(self):
+        self.logins = 0
+        self.duplicates = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.pages = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return ('CrawlStats(logins={}, succeeded={}, failed={}, pages={}, seconds={:.1f})'
+                .format(self.logins, self.succeeded, self.failed, self.pages, self.seconds))
+
+    def record(self, succeeded, pages=0):
+        """Counts the outcome of one login"""
+        with self._lock:
+            if succeeded:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.pages += pages
+
+    @property
+    def logins_per_second(self):
+        return (self.succeeded + self.failed) / self.seconds if self.seconds else 0.0
+
+    @property
+    def pages_per_second(self):
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        """Returns a one line report of the crawl's throughput"""
+        return ('{} logins ({} duplicates skipped): {} succeeded, {} failed; {} pages in {:.1f}s '
+                '({:.2f} logins/s, {:.2f} pages/s)').format(
+                    self.logins, self.duplicates, self.succeeded, self.failed, self.pages,
+                    self.seconds, self.logins_per_second, self.pages_per_second)
+
+
+class CrawlDriver(object):
+    """Crawls a stream of logins with a GithubCollector on a pool of worker threads."""
+
+    def __init__(self, collector, workers=8, batch_size=50, queue_size=None, connections=None,
+                 connection_workers=None, output_dir=None, crawl_deadline=None,
+                 login_deadline=None, logger=None):
+        """
+        Arguments:
+            collector (GithubCollector) - the collector every login is saved with
+
+        Keyword Arguments:
+            workers (int) - the number of logins crawled at once
+            batch_size (int) - the number of logins loaded per User.fetch_many request
+            queue_size (int) - the most logins waiting for a worker at once; defaults
+                    to twice the number of workers plus one batch
+            connections (iterable) - the connections saved for each login; defaults
+                    to every connection
+            connection_workers (int) - the connections of one login crawled at once;
+                    defaults to [Crawl] connection_workers
+            output_dir (str) - where filesystem documents are written, one directory
+                    per login
+            crawl_deadline (float) - seconds after which no further logins are
+                    started and running ones are cut off; None for no limit
+            login_deadline (float) - seconds each login may take before its
+                    connections are cut off; None for no limit
+            logger (logging.Logger) - where failures and the summary are reported
+        """
+        self.collector = collector
+        self.workers = int(workers)
+        self.batch_size = int(batch_size)
+        self.queue_size = int(queue_size) if queue_size else 2 * self.workers + self.batch_size
+        self.connections = list(connections) if connections else None
+        self.connection_workers = int(connection_workers) if connection_workers else None
+        self.output_dir = output_dir
+        self.crawl_deadline = float(crawl_deadline) if crawl_deadline else None
+        self.login_deadline = float(login_deadline) if login_deadline else None
+        self.logger = logger or getattr(collector, 'logger', None) or logging.getLogger('GithubCollector')
+
+    def __repr__(self):
+        return 'CrawlDriver(workers={}, batch_size={}, queue_size={})'.format(
+            self.workers, self.batch_size, self.queue_size)
+
+    @classmethod
+    def from_config(cls, collector, **kwargs):
+        """Builds a CrawlDriver from the [Crawl] section of the collector's collectors.cfg.
+
+        Arguments:
+            collector (GithubCollector) - the collector every login is saved with
+
+        Keyword Arguments:
+            kwargs - overrides for any of the constructor's keyword arguments
+
+        Returns:
+            CrawlDriver
+        """
+        config = collector.config
+        settings = {'workers': config.getint('Crawl', 'workers', fallback=8),
+                    'batch_size': config.getint('Crawl', 'batch_size', fallback=50),
+                    'queue_size': config.getint('Crawl', 'queue_size', fallback=0) or None,
+                    'crawl_deadline': config.getfloat('Crawl', 'crawl_deadline', fallback=0) or None,
+                    'login_deadline': config.getfloat('Crawl', 'login_deadline', fallback=0) or None}
+        settings.update(kwargs)
+        return cls(collector, **settings)
+
+    @staticmethod
+    def read_logins(path):
+        """Yields the logins in a file, one per line, skipping blank lines and
+        lines starting with #.  The file is read lazily.
+
+        Arguments:
+            path (str) - the login list
+        """
+        with open(path, 'r') as login_list:
+            for line in login_list:
+                login = line.strip()
+                if login and not login.startswith('#'):
+                    yield login
+
+    def crawl(self, logins):
+        """Crawls every distinct login.
+
+        Arguments:
+            logins (iterable) - the logins to crawl, i.e. from read_logins()
+
+        Returns:
+            CrawlStats - the aggregate outcome of the crawl
+        """
+        stats = CrawlStats()
+        started = time.monotonic()
+        deadline = Deadline(self.crawl_deadline)
+        slots = threading.BoundedSemaphore(self.queue_size)
+        self._warn_if_pool_is_small()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl') as executor:
+            for batch in self._batches(logins, stats):
+                if deadline.expired:
+                    self.logger.warning('Crawl deadline passed, no further logins are started')
+                    break
+                for user in self._load(batch, stats):
+                    # blocks while queue_size logins are already waiting
+                    slots.acquire()
+                    future = executor.submit(self.crawl_user, user, stats, deadline)
+                    future.add_done_callback(lambda _: slots.release())
+        stats.seconds = time.monotonic() - started
+        self.logger.info('Crawl finished: %s', stats.summary())
+        return stats
+
+    def crawl_user(self, user, stats=None, deadline=None):
+        """Saves a loaded user's profile and connections.  Never raises.
+
+        Arguments:
+            user (User) - the user to save
+
+        Keyword Arguments:
+            stats (CrawlStats) - where the outcome is counted
+            deadline (Deadline) - the crawl's deadline; the login's own budget is
+                    carved out of it
+
+        Returns:
+            boolean - True if the profile and every connection were saved
+        """
+        results = {}
+        try:
+            path = os.path.join(self.output_dir, user.login) if self.output_dir else None
+            budget = (deadline or Deadline()).child(self.login_deadline)
+            succeeded = self.collector.save_user(user, path) is not False
+            results = self.collector.save_all(user, connections=self.connections,
+                                              max_workers=self.connection_workers, path=path,
+                                              deadline=budget)
+        except Exception:
+            self.logger.exception('GithubUser:%s:crawl raised', user.login)
+            succeeded = False
+        finally:
+            forget = getattr(getattr(self.collector, 'state', None), 'forget', None)
+            if forget is not None:
+                forget(user.login)
+        succeeded = succeeded and all(result.succeeded for result in results.values())
+        if stats is not None:
+            stats.record(succeeded, sum(result.pages for result in results.values()))
+        return succeeded
+
+    def _batches(self, logins, stats):
+        """Internal function that yields lists of distinct logins, batch_size at a time"""
+        seen = set()
+        batch = []
+        for login in logins:
+            login = login.strip()
+            if not login:
+                continue
+            if login.lower() in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(login.lower())
+            stats.logins += 1
+            batch.append(login)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _load(self, batch, stats):
+        """Internal function that loads a batch of profiles in one request and
+        preloads their cursors; logins that cannot be loaded are counted as failed"""
+        try:
+            self.collector.preload(batch)
+            users = User.fetch_many(batch, batch_size=self.batch_size,
+                                    profile=getattr(self.collector, 'profile', None))
+        except Exception:
+            self.logger.exception('GithubUser:%s:loading batch raised', ','.join(batch))
+            users = []
+        loaded = set(user.login.lower() for user in users)
+        for login in batch:
+            if login.lower() not in loaded:
+                stats.record(False)
+        return users
+
+    def _warn_if_pool_is_small(self):
+        """Internal function that logs when there are more threads querying than
+        pooled connections, which makes threads open throwaway connections"""
+        config = self.collector.config
+        connection_workers = (self.connection_workers or
+                              config.getint('Crawl', 'connection_workers', fallback=4))
+        threads = self.workers * max(1, connection_workers)
+        pool = config.getint('Transport', 'pool_maxsize', fallback=10)
+        if pool < threads:
+            self.logger.warning('[Transport] pool_maxsize is %d but up to %d threads query at '
+                                'once; raise it to reuse connections', pool, threads)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+deadline.py - time budgets for a crawl, a login and a connection
+
+A Deadline is a point in time after which work should stop.  Deadlines nest: a
+login's budget is carved out of the crawl's, so neither outlives the other:
+
+    crawl = Deadline(8 * 3600)
+    login = crawl.child(600)        # ten minutes, or less if the crawl ends first
+    collector.save_all(user, deadline=login)
+
+A Paginator checks its deadline before fetching each page.  Once the deadline
+passes it stops without fetching more, so a long starredRepositories is cut off
+cleanly.  The pages it already fetched are stored and checkpointed as usual, and
+the next crawl resumes after the last of them.  Budgets are set in the [Crawl]
+section of collectors.cfg.
+"""
+import time
+
+
+class Deadline(object):
+    """A point in time after which work should stop; unbounded if seconds is None.
+
+    Attributes:
+        expires_at (float) - when the deadline passes on the deadline's clock, or
+                None if it never does
+    """
+
+    def __init__(self, seconds=None, clock=time.monotonic, parent=None):
+        """
+        Keyword Arguments:
+            seconds (float) - the budget from now; None or 0 for no limit
+            clock (callable) - returns the current time in seconds; replaceable in tests
+            parent (Deadline) - a deadline this one may not outlive
+        """
+        self.clock = parent.clock if parent is not None else clock
+        expires = [self.clock() + float(seconds)] if seconds else []
+        if parent is not None and parent.expires_at is not None:
+            expires.append(parent.expires_at)
+        self.expires_at = min(expires) if expires else None
+
+    def __repr__(self):
+        return 'Deadline(remaining={!r})'.format(self.remaining())
+
+    def child(self, seconds=None):
+        """Returns a deadline seconds from now that passes no later than this one.
+
+        Keyword Arguments:
+            seconds (float) - the child's budget; None or 0 for the rest of this one
+
+        Returns:
+            Deadline
+        """
+        return Deadline(seconds, parent=self)
+
+    def remaining(self):
+        """Returns the seconds left, never less than 0, or None if unbounded"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self):
+        """True once the deadline has passed"""
+        return self.expires_at is not None and self.clock() >= self.expires_at
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+identity.py - one shared User or Repository per login or nameWithOwner
+
+Within a crawl the same repository turns up in many users' starredRepositories,
+watching and repositoriesContributedTo, and the same user in many follower
+lists.  The identity map makes every User(login) or Repository(name, owner) for
+the same login or nameWithOwner return one shared object, so it is queried at
+most once:
+
+    User('octocat') is User('Octocat')             # True, and one request
+
+Objects are keyed on their class, field profile (see profiles.py) and login or
+nameWithOwner, compared case-insensitively as Github does.  User.from_node and
+Repository.from_node also key them on their GraphQL id.  The map is bounded: an
+object is forgotten ttl seconds after it was first mapped, so a long crawl
+queries it again, and the least recently used objects are dropped beyond
+max_size.  Both are set in the [Identity] section of collectors.cfg; max_size = 0
+turns the map off.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+import settings
+
+_lock = threading.Lock()
+_identities = None
+
+
+def key(cls, profile, kind, value):
+    """Returns the key an object is mapped under.
+
+    Arguments:
+        cls (type) - the object's class, i.e. User
+        profile (str) - the object's field profile, None for the default one
+        kind (str) - 'id', 'login' or 'nameWithOwner'
+        value (str) - the id, login or nameWithOwner
+
+    Returns:
+        tuple - the key; logins and nameWithOwners are compared case-insensitively
+    """
+    value = str(value)
+    return (cls.__name__, profile, kind, value if kind == 'id' else value.lower())
+
+
+class IdentityMap(object):
+    """A bounded, expiring map from keys to shared GithubObjects.
+
+    Attributes:
+        hits (int) - lookups answered from the map
+        misses (int) - lookups that were not
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0, clock=time.monotonic):
+        """
+        Keyword Arguments:
+            max_size (int) - the most keys held; the least recently used are
+                    dropped beyond it.  0 keeps nothing
+            ttl (float) - seconds an object stays mapped; None or 0 for no limit
+            clock (callable) - returns the current time in seconds; replaceable in tests
+        """
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl) if ttl else None
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'IdentityMap(size={!r}, max_size={!r}, ttl={!r})'.format(len(self), self.max_size,
+                                                                       self.ttl)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds an IdentityMap from the [Identity] section of collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            IdentityMap
+        """
+        if not config.has_section('Identity'):
+            return cls()
+        section = config['Identity']
+        return cls(max_size=section.getint('max_size', 10000),
+                   ttl=section.getfloat('ttl', 3600.0))
+
+    def get(self, *keys):
+        """Returns the object mapped under the first of keys that is mapped.
+
+        Arguments:
+            keys - keys made by key()
+
+        Returns:
+            GithubObject - the shared object, or None if none of keys is mapped
+        """
+        now = self.clock()
+        with self._lock:
+            for wanted in keys:
+                entry = self._entries.get(wanted)
+                if entry is None:
+                    continue
+                expires_at, obj = entry
+                if expires_at is not None and now >= expires_at:
+                    del self._entries[wanted]
+                    continue
+                self._entries.move_to_end(wanted)
+                self.hits += 1
+                return obj
+            self.misses += 1
+        return None
+
+    def add(self, obj, *keys):
+        """Maps obj under each of keys.  If the first key already maps a live
+        object, that object is mapped under the others instead.
+
+        Arguments:
+            obj (GithubObject) - the object to share
+            keys - keys made by key()
+
+        Returns:
+            GithubObject - the object now mapped under the first key: obj, or the
+                    one another thread mapped first
+        """
+        if not self.max_size:
+            return obj
+        now = self.clock()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            entry = self._entries.get(keys[0]) if keys else None
+            if entry is not None and (entry[0] is None or now < entry[0]):
+                obj = entry[1]
+            # an object mapped under more keys still expires when it was first due to
+            expires = [mapped[0] for mapped in (self._entries.get(wanted) for wanted in keys)
+                       if mapped is not None and mapped[1] is obj and mapped[0] is not None]
+            if expires:
+                expires_at = min(expires)
+            for wanted in keys:
+                self._entries[wanted] = (expires_at, obj)
+                self._entries.move_to_end(wanted)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return obj
+
+    def discard(self, obj):
+        """Forgets obj under every key it is mapped under, i.e. after it failed to
+        load, so the next request for it builds and queries a new object.
+
+        Arguments:
+            obj (GithubObject) - the object to forget
+
+        Returns:
+            int - the number of keys that mapped obj
+        """
+        with self._lock:
+            keys = [wanted for wanted, (_, mapped) in self._entries.items() if mapped is obj]
+            for wanted in keys:
+                del self._entries[wanted]
+        return len(keys)
+
+    def clear(self):
+        """Forgets every object"""
+        with self._lock:
+            self._entries.clear()
+
+
+def get_identity_map(config=None):
+    """Returns the process-wide identity map, creating it on first use.
+
+    Arguments:
+        config (ConfigParser) - optional parsed collectors.cfg used to build the
+                map the first time it is requested; the process-wide settings
+                are used if omitted
+
+    Returns:
+        IdentityMap - the shared map
+    """
+    global _identities
+    if _identities is None:
+        with _lock:
+            if _identities is None:
+                if config is None:
+                    config = settings.get_settings().config
+                _identities = IdentityMap.from_config(config)
+    return _identities
+
+
+def set_identity_map(identities):
+    """Replaces the process-wide identity map.
+
+    Arguments:
+        identities (IdentityMap) - the map to install; None resets the shared map
+                so it is rebuilt on next use
+
+    Returns:
+        the previously installed map (or None)
+    """
+    global _identities
+    with _lock:
+        previous = _identities
+        _identities = identities
+    return previous
+
+
+# rebuilt from the new settings on next use, see settings.reload_settings
+settings.on_reload(lambda new_settings: set_identity_map(None))
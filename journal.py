@@ -0,0 +1,110 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+journal.py - a write-ahead journal of fetched pages
+
+Pages written to Elasticsearch sit in the bulk sink's buffer until the next
+flush, and a connection's cursor is only checkpointed once its page has been
+flushed.  If the collector dies in between, those pages would be fetched again
+on the next run.  With a journal configured, every page is appended to it before
+it is handed to the sink; on the next run the collector replays the journal into
+the sink and resumes each connection after its last journaled page.  The
+journal is emptied whenever the sink has nothing left to flush.
+
+Each line is a json record; a torn last line left by a crash is ignored.
+"""
+import json
+import os
+import threading
+
+
+class Journal(object):
+    """An append-only file of pages that have been fetched but may not have been
+    stored yet."""
+
+    def __init__(self, path, fsync=False):
+        """
+        Arguments:
+            path (str) - the journal file, created if it does not exist
+
+        Keyword Arguments:
+            fsync (Boolean) - if True, each append is forced to disk before it
+                    returns, surviving a power loss rather than only a crash
+        """
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __repr__(self):
+        return 'Journal(path={!r})'.format(self.path)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a Journal from the [Crawl] section of collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            Journal - the configured journal, or None if no journal is configured
+        """
+        path = config.get('Crawl', 'journal', fallback='')
+        if not path:
+            return None
+        return cls(path, fsync=config.getboolean('Crawl', 'journal_fsync', fallback=False))
+
+    def append(self, login, connection, cursor, index, doc_type, document):
+        """Records a fetched page.
+
+        Arguments:
+            login (str) - the login the page belongs to
+            connection (str) - the connection the page belongs to, i.e. 'followers'
+            cursor (str) - the page's endCursor
+            index (str) - the index the page is stored in
+            doc_type (str) - the doc_type the page is stored as
+            document (dict) - the page itself
+        """
+        line = json.dumps({'login': login, 'connection': connection, 'cursor': cursor,
+                           'index': index, 'doc_type': doc_type, 'document': document})
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def replay(self):
+        """Returns every complete record in the journal, oldest first.
+
+        Returns:
+            list - one dict per record with login, connection, cursor, index,
+                    doc_type and document keys
+        """
+        records = []
+        with self._lock:
+            self._file.flush()
+            with open(self.path, 'r', encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # a torn write from a crash; nothing after it was acknowledged
+                        break
+        return records
+
+    def truncate(self):
+        """Empties the journal once every page in it has been stored"""
+        with self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        """Closes the journal file"""
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+loader.py - loads many lazy GithubObjects in a few requests
+
+Constructed with lazy=True, a User, Organization, Repository, Gist, Issue,
+Repositories or Issues only records who it is; nothing is queried until a
+property is read or load() is called.  That makes building many handles cheap,
+and handles that end up unused are never fetched.  A Loader collects lazy objects
+and loads them together: objects of the same class and field profile are
+queried batch_size at a time, each under its own alias in a single request (see
+GithubObject._batch_roots):
+
+    users = [User(login, lazy=True) for login in logins]
+    loaded = Loader(batch_size=50).add(*users).load()
+
+An object queried by trying a second template when the first fails, i.e. an
+Issues whose login is an organization rather than a user, is tried with the
+second template in a follow-up batch.  Objects already loaded are left alone.
+"""
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from templates import TEMPLATES
+
+
+class Loader(object):
+    """Collects lazy GithubObjects and loads them in as few requests as possible."""
+
+    def __init__(self, batch_size=50):
+        """
+        Keyword Arguments:
+            batch_size (int) - the most objects loaded in one request
+        """
+        self.batch_size = max(1, int(batch_size))
+        self._objects = []
+
+    def __repr__(self):
+        return 'Loader(batch_size={!r}, objects={!r})'.format(self.batch_size, len(self._objects))
+
+    def __len__(self):
+        return len(self._objects)
+
+    def add(self, *objects):
+        """Adds objects to the next load().
+
+        Arguments:
+            objects - GithubObjects, lazy or not
+
+        Returns:
+            Loader - this loader, so calls can be chained
+        """
+        self._objects.extend(objects)
+        return self
+
+    def load(self):
+        """Loads every object added since the last load().
+
+        Returns:
+            list - the objects that loaded without errors, in the order they were
+                    added; errors are logged by each object
+        """
+        objects, self._objects = self._objects, []
+        groups = OrderedDict()
+        for obj in objects:
+            if obj.pending and obj._LOAD_TEMPLATES:
+                groups.setdefault((obj.__class__, obj.profile), []).append(obj)
+            elif obj.pending:
+                obj.load()
+        for (cls, profile), group in groups.items():
+            for start in range(0, len(group), self.batch_size):
+                self._load_batch(cls, profile, group[start:start + self.batch_size])
+        return [obj for obj in objects if obj.load()]
+
+    @staticmethod
+    def _load_batch(cls, profile, batch):
+        """Internal function that loads objects of one class and profile in a
+        single request per template tried"""
+        with ExitStack() as locks:
+            # taken in a fixed order so two loaders sharing objects cannot deadlock
+            for obj in sorted(batch, key=id):
+                locks.enter_context(obj._load_lock)
+            batch = [obj for obj in batch if obj.pending and not obj._loading]
+            remaining = batch
+            for class_name, name in cls._LOAD_TEMPLATES:
+                if not remaining:
+                    break
+                template = TEMPLATES.get(class_name, name, profile)
+                arguments = [obj._load_arguments() for obj in remaining]
+                payloads = remaining[0]._batch_roots(template, arguments)
+                failed = []
+                for obj, args, payload in zip(remaining, arguments, payloads):
+                    obj.response = payload
+                    if obj._errors_exist(cls._LOAD_DOC_TYPE, str(args[0]), payload):
+                        failed.append(obj)
+                remaining = failed
+            failed = set(id(obj) for obj in remaining)
+            for obj in batch:
+                obj._loaded = id(obj) not in failed
+                obj._pending = None
+                if not obj._loaded:
+                    obj._forget()
+
+
+def load(objects, batch_size=50):
+    """Shortcut for Loader(batch_size).add(*objects).load()"""
+    return Loader(batch_size).add(*objects).load()
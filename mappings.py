@@ -0,0 +1,135 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+mappings.py - Elasticsearch index templates for the daily gh_* indices
+
+Left to dynamic mapping, every distinct path in a deeply nested GraphQL page
+becomes a mapped field, which makes ingest slow and eventually trips the
+cluster's field limit.  Each doc_type the collector writes instead gets an index
+template matching its daily indices (i.e. gh_followers-*) whose mapping
+
+    * spells out the page shape, data.user.<connection>.edges.node (or .nodes),
+      and the handful of node fields worth searching on,
+    * stores large text fields such as bodyHTML and descriptionHTML in _source
+      without analyzing or indexing them, and
+    * turns dynamic mapping off, so any other field is kept in _source but never
+      added to the mapping.
+
+GithubCollector.install_index_templates() puts every template.
+"""
+from collections import OrderedDict
+
+TEMPLATE_PREFIX = 'githubv4-'
+
+KEYWORD = {'type': 'keyword', 'ignore_above': 256}
+TEXT = {'type': 'text'}
+# kept in _source and returned with hits, but neither analyzed nor searchable
+STORED = {'type': 'text', 'index': False, 'norms': False}
+DATE = {'type': 'date'}
+BOOLEAN = {'type': 'boolean'}
+INTEGER = {'type': 'integer'}
+LONG = {'type': 'long'}
+LOGIN = {'properties': {'login': KEYWORD}}
+
+PAGE_INFO = {'properties': {'startCursor': KEYWORD, 'endCursor': KEYWORD,
+                            'hasNextPage': BOOLEAN, 'hasPreviousPage': BOOLEAN}}
+
+USER = {'id': KEYWORD, 'login': KEYWORD, 'name': TEXT, 'email': KEYWORD, 'company': TEXT,
+        'companyHTML': STORED, 'location': TEXT, 'bio': TEXT, 'bioHTML': STORED,
+        'databaseId': LONG, 'createdAt': DATE, 'updatedAt': DATE, 'isHireable': BOOLEAN,
+        'isSiteAdmin': BOOLEAN, 'url': KEYWORD, 'websiteUrl': KEYWORD}
+REPOSITORY = {'id': KEYWORD, 'name': KEYWORD, 'nameWithOwner': KEYWORD, 'owner': LOGIN,
+              'description': TEXT, 'descriptionHTML': STORED, 'createdAt': DATE,
+              'updatedAt': DATE, 'pushedAt': DATE, 'isFork': BOOLEAN, 'isPrivate': BOOLEAN,
+              'isArchived': BOOLEAN, 'forkCount': INTEGER, 'url': KEYWORD,
+              'primaryLanguage': {'properties': {'name': KEYWORD}},
+              'stargazers': {'properties': {'totalCount': INTEGER}}}
+ISSUE = {'id': KEYWORD, 'number': INTEGER, 'title': TEXT, 'state': KEYWORD, 'author': LOGIN,
+         'body': TEXT, 'bodyHTML': STORED, 'bodyText': STORED, 'closed': BOOLEAN,
+         'closedAt': DATE, 'createdAt': DATE, 'updatedAt': DATE, 'publishedAt': DATE,
+         'databaseId': LONG, 'url': KEYWORD,
+         'repository': {'properties': {'name': KEYWORD, 'owner': LOGIN}}}
+COMMENT = {'id': KEYWORD, 'author': LOGIN, 'authorAssociation': KEYWORD, 'body': TEXT,
+           'bodyHTML': STORED, 'bodyText': STORED, 'createdAt': DATE, 'updatedAt': DATE,
+           'publishedAt': DATE, 'databaseId': LONG, 'url': KEYWORD,
+           'repository': {'properties': {'name': KEYWORD, 'owner': LOGIN, 'url': KEYWORD}}}
+GIST = {'id': KEYWORD, 'name': KEYWORD, 'description': TEXT, 'owner': LOGIN,
+        'isPublic': BOOLEAN, 'createdAt': DATE, 'updatedAt': DATE, 'pushedAt': DATE,
+        'url': KEYWORD}
+ORGANIZATION = {'id': KEYWORD, 'login': KEYWORD, 'name': TEXT, 'description': TEXT,
+                'descriptionHTML': STORED, 'email': KEYWORD, 'location': TEXT,
+                'databaseId': LONG, 'isVerified': BOOLEAN, 'url': KEYWORD,
+                'websiteUrl': KEYWORD}
+PUBLIC_KEY = {'id': KEYWORD, 'key': STORED}
+
+# doc_type -> (index prefix, connection under data.user or None for the user itself,
+#              node fields)
+DOC_TYPES = OrderedDict([
+    ('GithubUser', ('gh_user', None, USER)),
+    ('GithubCommitComments', ('gh_commit_comments', 'commitComments', COMMENT)),
+    ('GithubFollowers', ('gh_followers', 'followers', USER)),
+    ('GithubFollowing', ('gh_following', 'following', USER)),
+    ('GithubGistComments', ('gh_gist_comments', 'gistComments', COMMENT)),
+    ('GithubGists', ('gh_gists', 'gists', GIST)),
+    ('GithubIssueComments', ('gh_issue_comments', 'issueComments', COMMENT)),
+    ('GithubIssues', ('gh_issues', 'issues', ISSUE)),
+    ('GithubOrganizations', ('gh_organizations', 'organizations', ORGANIZATION)),
+    ('GithubPinnedRepositories', ('gh_pinned_repositories', 'pinnedRepositories', REPOSITORY)),
+    ('GithubPublicKeys', ('gh_public_keys', 'publicKeys', PUBLIC_KEY)),
+    ('GithubPullRequests', ('gh_pull_requests', 'pullRequests', ISSUE)),
+    ('GithubRepositories', ('gh_repositories', 'repositories', REPOSITORY)),
+    ('GithubRepositoriesContributedTo', ('gh_repositories_contributed_to',
+                                         'repositoriesContributedTo', REPOSITORY)),
+    ('GithubStarredRepositories', ('gh_starred_repositories', 'starredRepositories', REPOSITORY)),
+    ('GithubWatching', ('gh_watching', 'watching', REPOSITORY)),
+])
+
+
+def index_name(doc_type, date):
+    """Returns the daily index a doc_type is written to, i.e. gh_followers-2019-05-01
+
+    Arguments:
+        doc_type (str) - a key of DOC_TYPES, i.e. GithubFollowers
+        date (str) - the ISO-8601 date of the crawl
+    """
+    return '-'.join([DOC_TYPES[doc_type][0], date])
+
+
+def mapping(doc_type):
+    """Builds the explicit mapping for a doc_type.
+
+    Arguments:
+        doc_type (str) - a key of DOC_TYPES, i.e. GithubFollowers
+
+    Returns:
+        dict - the mapping of the doc_type, without dynamic fields
+    """
+    _, connection, fields = DOC_TYPES[doc_type]
+    node = {'dynamic': False, 'properties': fields}
+    if connection is None:
+        user = node
+    else:
+        page = {'dynamic': False,
+                'properties': {'totalCount': INTEGER,
+                               'totalDiskUsage': LONG,
+                               'pageInfo': PAGE_INFO,
+                               'edges': {'properties': {'cursor': KEYWORD, 'node': node}},
+                               'nodes': node}}
+        user = {'dynamic': False, 'properties': {'login': KEYWORD, connection: page}}
+    return {'dynamic': False,
+            'properties': {'data': {'dynamic': False, 'properties': {'user': user}}}}
+
+
+def index_template(doc_type):
+    """Builds the index template applied to every daily index of a doc_type.
+
+    Arguments:
+        doc_type (str) - a key of DOC_TYPES, i.e. GithubFollowers
+
+    Returns:
+        tuple - (the template name, the template body for indices.put_template)
+    """
+    prefix = DOC_TYPES[doc_type][0]
+    body = {'index_patterns': ['{}-*'.format(prefix)],
+            'mappings': {doc_type: mapping(doc_type)}}
+    return TEMPLATE_PREFIX + prefix, body
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+node.py - compact, immutable records for the nodes of a connection page
+
+A page of issueComments or gistComments can hold thousands of nodes.  Wrapping
+each one in a full GithubObject meant a configuration, headers and a logger per
+node, and every attribute access re-walked the json.  Node records instead copy
+the fields of a node into __slots__ once, never touch disk, logging or the
+network when built, and compare and hash on their GraphQL id so they can be
+deduplicated in sets and dicts.  Build them one at a time from an edge or node,
+or all at once from a connection page with from_page().
+"""
+from GithubObject import GithubObject
+
+
+def _rebuild(cls, fields):
+    """Internal function used to unpickle a Node"""
+    record = cls.__new__(cls)
+    record._fill(fields)
+    return record
+
+
+class _Client(GithubObject):
+    """The GithubObject that node records send their connection queries through"""
+
+    def __repr__(self):
+        return '_Client()'
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+    def update(self):
+        pass
+
+
+class Node(object):
+    """Base class for an immutable record of a single node from a connection.
+    Subclasses list the node's fields in __slots__; fields missing from the
+    node are None."""
+
+    __slots__ = ()
+
+    def __init__(self, data, **extra):
+        """
+        Arguments:
+            data (dict) - an edge, i.e. {"cursor": ..., "node": {...}}, or the node itself
+
+        Keyword Arguments:
+            extra - values for slots that are not part of the node, i.e. owner='octocat'
+        """
+        node = data['node'] if 'node' in data else data
+        unknown = set(extra).difference(self.__slots__)
+        if unknown:
+            raise TypeError('{} has no fields {}'.format(self.__class__.__name__, sorted(unknown)))
+        fields = dict((name, node.get(name)) for name in self.__slots__)
+        fields.update(extra)
+        self._fill(fields)
+
+    def _fill(self, fields):
+        """Internal function that sets every slot from a dict of field values"""
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+
+    @classmethod
+    def from_page(cls, payload, *path, **extra):
+        """Builds a record for every node in one page of a connection.
+
+        Arguments:
+            payload (dict) - the decoded json response of a connection query, or
+                    False when the query failed
+            path (str) - the keys leading from "data" to the connection,
+                    i.e. 'user', 'issueComments'
+
+        Keyword Arguments:
+            extra - values for slots that are not part of the nodes, i.e. owner='octocat'
+
+        Returns:
+            list - one record per edge (or node) in the page, in order
+        """
+        connection = (payload or {}).get('data') or {}
+        for key in path:
+            connection = (connection or {}).get(key)
+        if not connection:
+            return []
+        records = []
+        for item in connection.get('edges') or connection.get('nodes') or []:
+            if item:
+                # bypasses the subclass constructor, whose signature may differ
+                record = cls.__new__(cls)
+                Node.__init__(record, item, **extra)
+                records.append(record)
+        return records
+
+    def _asdict(self):
+        """Returns the record's fields as a dict"""
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def _query_connection(self, class_name, name, doc_type, root_args, kwargs):
+        """Internal function that queries a page of one of this node's connections,
+        see GithubObject._query_connection"""
+        return _Client()._query_connection(class_name, name, doc_type, root_args, kwargs)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(self.__class__.__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} is immutable'.format(self.__class__.__name__))
+
+    def __reduce__(self):
+        return _rebuild, (self.__class__, self._asdict())
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.id == other.id
+
+    def __ne__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.id != other.id
+
+    def __hash__(self):
+        return hash((self.__class__.__name__, self.id))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+pagesize.py - learns how many nodes each connection can fetch per page
+
+Asking for first: 100 issues or pull requests, each with its body in three
+formats and its reactionGroups, regularly makes Github time out server-side or
+send back an enormous response.  A PageSizeController picks the page size of
+each connection from how its recent pages went:
+
+    * a page that failed after a long wait (a timeout) or took longer than
+      slow_seconds shrinks the size by shrink_factor; a failed page is then
+      fetched again at the smaller size
+    * a page that came back within fast_seconds grows the size by grow_factor,
+      up to the maximum
+
+Sizes are learned per connection, i.e. 'issues', and saved to a small json file
+so the next run starts from what this one learned.  The controller is tuned in
+the [PageSize] section of collectors.cfg.
+"""
+import json
+import logging
+import math
+import os
+import threading
+
+
+class PageSizeController(object):
+    """Adapts the page size of each connection to how fast its pages come back."""
+
+    def __init__(self, initial=100, minimum=10, maximum=100, slow_seconds=8.0, fast_seconds=2.0,
+                 shrink_factor=0.5, grow_factor=1.25, path=None, logger=None):
+        """
+        Keyword Arguments:
+            initial (int) - the page size of a connection nothing is known about
+            minimum (int) - the smallest page size; a page that fails at this size
+                    is not fetched again
+            maximum (int) - the largest page size; Github allows at most 100
+            slow_seconds (float) - a page taking longer shrinks the size
+            fast_seconds (float) - a page taking less grows the size
+            shrink_factor (float) - the size is multiplied by this when shrinking
+            grow_factor (float) - the size is multiplied by this when growing
+            path (str) - the json file learned sizes are kept in between runs;
+                    None keeps them in memory only
+            logger (logging.Logger) - where size changes are reported
+        """
+        self.minimum = int(minimum)
+        self.maximum = int(maximum)
+        self.initial = max(self.minimum, min(self.maximum, int(initial)))
+        self.slow_seconds = float(slow_seconds)
+        self.fast_seconds = float(fast_seconds)
+        self.shrink_factor = float(shrink_factor)
+        self.grow_factor = float(grow_factor)
+        self.path = path
+        self.logger = logger or logging.getLogger('GithubCollector')
+        self._lock = threading.Lock()
+        self._sizes = self._load()
+
+    def __repr__(self):
+        return 'PageSizeController(sizes={!r})'.format(self._sizes)
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        """Builds a PageSizeController from the [PageSize] section of collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Keyword Arguments:
+            logger (logging.Logger) - where size changes are reported
+
+        Returns:
+            PageSizeController
+        """
+        if not config.has_section('PageSize'):
+            return cls(logger=logger)
+        section = config['PageSize']
+        return cls(initial=section.getint('initial', 100),
+                   minimum=section.getint('minimum', 10),
+                   maximum=section.getint('maximum', 100),
+                   slow_seconds=section.getfloat('slow_seconds', 8.0),
+                   fast_seconds=section.getfloat('fast_seconds', 2.0),
+                   shrink_factor=section.getfloat('shrink_factor', 0.5),
+                   grow_factor=section.getfloat('grow_factor', 1.25),
+                   path=section.get('path') or None,
+                   logger=logger)
+
+    def size(self, connection):
+        """Returns the page size to request for a connection, i.e. 'issues'"""
+        with self._lock:
+            return self._sizes.get(connection, self.initial)
+
+    def observe(self, connection, seconds, failed=False):
+        """Adjusts a connection's page size after a page was fetched.
+
+        Arguments:
+            connection (str) - the connection the page belongs to, i.e. 'issues'
+            seconds (float) - how long the page took
+
+        Keyword Arguments:
+            failed (Boolean) - True if the page came back with errors or not at all
+
+        Returns:
+            boolean - True if a failed page should be fetched again at the new,
+                    smaller size; False otherwise
+        """
+        with self._lock:
+            size = self._sizes.get(connection, self.initial)
+            if seconds >= self.slow_seconds:
+                learned = max(self.minimum, int(size * self.shrink_factor))
+            elif failed:
+                # a quick failure is not about the page size, i.e. an unknown login
+                return False
+            elif seconds <= self.fast_seconds:
+                learned = min(self.maximum, int(math.ceil(size * self.grow_factor)))
+            else:
+                learned = size
+            if learned == size:
+                return False
+            self._sizes[connection] = learned
+            self._save()
+        self.logger.info('%s: page size %d -> %d after a %.1f second page', connection, size,
+                         learned, seconds)
+        return failed
+
+    def _load(self):
+        """Internal function that reads the sizes learned by previous runs"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as sizes:
+                learned = json.load(sizes)
+        except (OSError, ValueError) as error_msg:
+            self.logger.error('%s: could not read learned page sizes: %s', self.path, error_msg)
+            return {}
+        return dict((connection, max(self.minimum, min(self.maximum, int(size))))
+                    for connection, size in learned.items())
+
+    def _save(self):
+        """Internal function that writes the learned sizes, replacing the file
+        atomically so a crash never leaves it half written"""
+        if not self.path:
+            return
+        partial = self.path + '.tmp'
+        try:
+            with open(partial, 'w') as sizes:
+                json.dump(self._sizes, sizes, sort_keys=True)
+            os.replace(partial, self.path)
+        except OSError as error_msg:
+            self.logger.error('%s: could not save learned page sizes: %s', self.path, error_msg)
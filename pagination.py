@@ -0,0 +1,243 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+pagination.py - one paginated crawl engine for every connection
+
+Each connection the collector saves is described declaratively by a
+ConnectionDescriptor: the method that queries it, the path from "data" to the
+connection in the response, the doc_type and index prefix its pages are stored
+under, and any fixed arguments such as orderBy.  A Paginator then walks any
+descriptor the same way, following pageInfo.endCursor until hasNextPage is
+false, so cursor quoting, error handling and any later optimization live in
+one place instead of in a copy of the loop per connection:
+
+    paginator = Paginator(CONNECTIONS['followers'], user.followers)
+    for page in paginator:
+        store(page.payload)
+    paginator.complete   # False if a page failed
+"""
+from collections import OrderedDict, namedtuple
+import time
+
+import mappings
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class ConnectionDescriptor(namedtuple('ConnectionDescriptor',
+                                      ['name', 'path', 'doc_type', 'index_prefix', 'arguments'])):
+    """Describes how a connection is queried and stored.
+
+    Attributes:
+        name (str) - the connection, and the name of the method querying it, i.e. 'followers'
+        path (tuple) - the keys leading from "data" to the connection, i.e. ('user', 'followers')
+        doc_type (str) - the doc_type pages are stored as, i.e. 'GithubFollowers'
+        index_prefix (str) - the prefix of the daily index pages are stored in, i.e. 'gh_followers'
+        arguments (dict) - fixed connection arguments sent with every page, i.e. orderBy
+    """
+    __slots__ = ()
+
+    def index(self, date):
+        """Returns the daily index pages are stored in, i.e. gh_followers-2019-05-01"""
+        return '-'.join([self.index_prefix, date])
+
+
+def user_connection(name, doc_type, **arguments):
+    """Describes a connection of a User, taking the index prefix from mappings.py
+
+    Arguments:
+        name (str) - the connection, i.e. 'followers'
+        doc_type (str) - a key of mappings.DOC_TYPES, i.e. 'GithubFollowers'
+
+    Keyword Arguments:
+        arguments - fixed connection arguments, i.e. orderBy='{direction: DESC, field: CREATED_AT}'
+
+    Returns:
+        ConnectionDescriptor
+    """
+    return ConnectionDescriptor(name, ('user', name), doc_type,
+                                mappings.DOC_TYPES[doc_type][0], arguments)
+
+
+NEWEST_FIRST = '{direction: DESC, field: CREATED_AT}'
+
+# every User connection GithubCollector saves, keyed by connection name
+CONNECTIONS = OrderedDict((descriptor.name, descriptor) for descriptor in [
+    user_connection('commitComments', 'GithubCommitComments'),
+    user_connection('followers', 'GithubFollowers'),
+    user_connection('following', 'GithubFollowing'),
+    user_connection('gistComments', 'GithubGistComments'),
+    user_connection('gists', 'GithubGists', orderBy=NEWEST_FIRST, privacy='ALL'),
+    user_connection('issueComments', 'GithubIssueComments'),
+    user_connection('issues', 'GithubIssues', orderBy=NEWEST_FIRST),
+    user_connection('organizations', 'GithubOrganizations'),
+    user_connection('pinnedRepositories', 'GithubPinnedRepositories', orderBy=NEWEST_FIRST),
+    user_connection('publicKeys', 'GithubPublicKeys'),
+    user_connection('pullRequests', 'GithubPullRequests', orderBy=NEWEST_FIRST),
+    user_connection('repositories', 'GithubRepositories', orderBy=NEWEST_FIRST),
+    user_connection('repositoriesContributedTo', 'GithubRepositoriesContributedTo',
+                    orderBy=NEWEST_FIRST),
+    user_connection('starredRepositories', 'GithubStarredRepositories',
+                    orderBy='{direction: DESC, field: STARRED_AT}'),
+    user_connection('watching', 'GithubWatching', orderBy=NEWEST_FIRST),
+])
+
+
+class Page(namedtuple('Page', ['payload', 'connection', 'end_cursor', 'has_next_page'])):
+    """One page of a connection.
+
+    Attributes:
+        payload (dict) - the decoded json response, as it is stored
+        connection (dict) - the connection within the payload
+        end_cursor (str) - pageInfo.endCursor, unquoted
+        has_next_page (Boolean) - pageInfo.hasNextPage
+    """
+    __slots__ = ()
+
+    @property
+    def empty(self):
+        """True if the page has no edges or nodes"""
+        return not (self.connection.get('edges') or self.connection.get('nodes'))
+
+
+def quote_cursor(cursor):
+    """Quotes a cursor for use as an after: argument, i.e. abc= -> "abc=".
+    Cursors that are already quoted are returned unchanged."""
+    if cursor.startswith('"') and cursor.endswith('"') and len(cursor) > 1:
+        return cursor
+    return '"%s"' % cursor
+
+
+class Paginator(object):
+    """Iterates over the pages of a connection, from an optional cursor onwards,
+    until hasNextPage is false, a page comes back empty, a query fails or its
+    deadline passes.
+
+    Attributes:
+        descriptor (ConnectionDescriptor) - the connection being walked
+        pages (int) - the pages fetched so far
+        end_cursor (str) - the endCursor of the last page fetched, or the cursor
+                the walk started after
+        complete (Boolean) - True once the last page has been fetched
+        error (str) - why the walk stopped early, None unless a page failed or
+                the deadline passed
+        timed_out (Boolean) - True if the walk stopped because its deadline passed
+    """
+
+    def __init__(self, descriptor, fetch, after=None, page_size=DEFAULT_PAGE_SIZE, deadline=None,
+                 sizer=None, clock=time.monotonic):
+        """
+        Arguments:
+            descriptor (ConnectionDescriptor) - the connection to walk
+            fetch (callable) - queries one page given the connection arguments as
+                    keyword arguments, i.e. user.followers; returns the decoded json
+                    response or False when errors occurred
+
+        Keyword Arguments:
+            after (str) - an unquoted cursor to resume after, i.e. from a previous crawl
+            page_size (int) - the number of nodes requested per page
+            deadline (Deadline) - no page is fetched once it has passed
+            sizer (PageSizeController) - picks the page size of each page instead
+                    of page_size, and learns from how long each page took; a page
+                    that timed out is fetched again at a smaller size
+            clock (callable) - returns the current time in seconds; replaceable in tests
+        """
+        self.descriptor = descriptor
+        self.fetch = fetch
+        self.page_size = page_size
+        self.deadline = deadline
+        self.sizer = sizer
+        self.clock = clock
+        self.end_cursor = after
+        self.pages = 0
+        self.complete = False
+        self.error = None
+        self.timed_out = False
+
+    def __repr__(self):
+        return 'Paginator(connection={!r}, pages={}, complete={})'.format(
+            self.descriptor.name, self.pages, self.complete)
+
+    def arguments(self):
+        """Returns the connection arguments for the next page"""
+        arguments = dict(self.descriptor.arguments, first=self.page_size)
+        if self.end_cursor:
+            arguments['after'] = quote_cursor(self.end_cursor)
+        return arguments
+
+    def __iter__(self):
+        while not self.complete and self.error is None:
+            if self.deadline is not None and self.deadline.expired:
+                # pages already yielded are stored; the next crawl resumes after them
+                self.timed_out = True
+                self.error = 'deadline passed after {} pages'.format(self.pages)
+                return
+            if self.sizer is not None:
+                self.page_size = self.sizer.size(self.descriptor.name)
+            started = self.clock()
+            payload = self.fetch(**self.arguments())
+            if self.sizer is not None and self.sizer.observe(self.descriptor.name,
+                                                             self.clock() - started,
+                                                             failed=not payload):
+                continue
+            if not payload:
+                self.error = 'query failed (see the log for the errors returned)'
+                return
+            connection = payload.get('data')
+            for key in self.descriptor.path:
+                connection = connection.get(key) if isinstance(connection, dict) else None
+            if not isinstance(connection, dict):
+                self.error = '{} missing from response'.format('.'.join(self.descriptor.path))
+                return
+            page_info = connection.get('pageInfo') or {}
+            page = Page(payload, connection, page_info.get('endCursor'),
+                        bool(page_info.get('hasNextPage')))
+            self.pages += 1
+            if page.empty:
+                # nothing new since the stored cursor; keep it
+                self.complete = True
+                return
+            if page.end_cursor:
+                self.end_cursor = page.end_cursor
+            self.complete = not page.has_next_page or not page.end_cursor
+            yield page
+
+
+class Checkpoint(object):
+    """Advances a connection's stored cursor as its pages are stored.  Pages are
+    reported in the order they were fetched; once one fails to store, the cursor
+    stays at the last page before it so the next crawl fetches it again.
+
+    Attributes:
+        cursor (str) - the cursor of the last page stored
+        failed (Boolean) - True once a page failed to store
+    """
+
+    def __init__(self, store):
+        """
+        Arguments:
+            store (callable) - persists a cursor, i.e. writes it to redis
+        """
+        self.store = store
+        self.cursor = None
+        self.failed = False
+
+    def __repr__(self):
+        return 'Checkpoint(cursor={!r}, failed={})'.format(self.cursor, self.failed)
+
+    def page(self, cursor):
+        """Returns the callback to run once the page ending at cursor is stored
+
+        Arguments:
+            cursor (str) - the page's endCursor
+
+        Returns:
+            callable - called with True if the page was stored, False otherwise
+        """
+        def stored(success):
+            if not success:
+                self.failed = True
+            elif not self.failed and cursor:
+                self.store(cursor)
+                self.cursor = cursor
+        return stored
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+planner.py - estimate what a crawl will cost before running it
+
+A CrawlPlanner counts every connection a crawl would page through for a list of
+logins (using the totalCount field each connection template already selects),
+then chooses a page size per connection and groups first pages into batched
+requests so the crawl spends as few rate limit points as possible:
+
+    planner = CrawlPlanner(['repositories', 'starredRepositories', 'issues'])
+    plan = planner.plan(logins)
+    print(plan.requests, plan.cost, plan.estimate_seconds(GithubObject.get_token_pool()))
+    for group in plan.groups:
+        payloads = User(group.login).batch(group.connections)
+
+Costs are estimated locally with Github's published formula: each connection
+costs one request, plus one per parent node for every connection nested in it;
+a query costs the total divided by 100, rounded, and at least 1 point.
+dry_run() replaces the estimates with the cost Github reports through
+rateLimit(dryRun: true), without executing the queries.
+
+Reference: https://developer.github.com/v4/guides/resource-limitations/
+"""
+import math
+import re
+import time
+
+from ratelimit import DEFAULT_WINDOW
+from templates import Template, TemplateError, TEMPLATES
+from User import User, CONNECTION_DOC_TYPES
+
+# The largest page Github serves for a connection
+MAX_PAGE_SIZE = 100
+# Github refuses queries that could return more nodes than this
+MAX_NODES = 500000
+
+_NESTED_CONNECTION = re.compile(r'\w+\s*\(\s*first\s*:\s*(\d+)')
+
+
+def query_cost(requests):
+    """Converts a number of connection requests into rate limit points"""
+    return max(1, int(requests / 100.0 + 0.5))
+
+
+class ConnectionPlan(object):
+    """How one connection of one login will be paged through.
+
+    Attributes:
+        login (str) - the Github login the connection belongs to
+        name (str) - the connection, i.e. 'repositories'
+        total_count (int) - the number of nodes in the connection
+        page_size (int) - the number of nodes requested per page
+        kwargs (dict) - the keyword arguments for the connection method
+        page_cost (int) - the estimated cost in points of each page after the first
+    """
+
+    def __init__(self, login, name, total_count, page_size, kwargs, page_cost):
+        self.login = login
+        self.name = name
+        self.total_count = total_count
+        self.page_size = page_size
+        self.kwargs = kwargs
+        self.page_cost = page_cost
+
+    def __repr__(self):
+        return 'ConnectionPlan(login={!r}, name={!r}, total_count={!r}, page_size={!r})'.format(
+            self.login, self.name, self.total_count, self.page_size)
+
+    @property
+    def pages(self):
+        """The number of pages needed to collect the whole connection"""
+        return int(math.ceil(self.total_count / float(self.page_size))) if self.total_count else 0
+
+    @property
+    def follow_up_cost(self):
+        """The estimated cost in points of every page after the first"""
+        return max(self.pages - 1, 0) * self.page_cost
+
+
+class PageGroup(object):
+    """A single request fetching the first page of several connections of a login.
+
+    Attributes:
+        login (str) - the Github login queried
+        connections (dict) - maps connection names to their keyword arguments, in
+                the form User.batch() accepts
+        requests (int) - the number of connection requests the query makes
+        nodes (int) - the most nodes the query can return
+        cost (int) - the estimated cost of the request in points
+    """
+
+    def __init__(self, login):
+        self.login = login
+        self.connections = {}
+        self.requests = 0
+        self.nodes = 0
+        self.cost = 0
+
+    def __repr__(self):
+        return 'PageGroup(login={!r}, connections={!r}, cost={!r})'.format(
+            self.login, sorted(self.connections), self.cost)
+
+    def add(self, plan, requests, nodes):
+        """Adds the first page of a connection to the request"""
+        self.connections[plan.name] = plan.kwargs
+        self.requests += requests
+        self.nodes += nodes
+        self.cost = query_cost(self.requests)
+
+
+class CrawlPlan(object):
+    """The requests and points a crawl of a list of logins will take.
+
+    Attributes:
+        connections (list) - a ConnectionPlan per login and non-empty connection
+        groups (list) - the batched first-page requests, as PageGroups
+        count_requests (int) - the requests spent counting the connections
+        count_cost (int) - the points spent counting the connections
+        failed (list) - the logins that could not be counted
+    """
+
+    def __init__(self, connections, groups, count_requests, count_cost, failed):
+        self.connections = connections
+        self.groups = groups
+        self.count_requests = count_requests
+        self.count_cost = count_cost
+        self.failed = failed
+
+    def __repr__(self):
+        return 'CrawlPlan(requests={!r}, cost={!r})'.format(self.requests, self.cost)
+
+    @property
+    def requests(self):
+        """The number of requests the crawl will make"""
+        return len(self.groups) + sum(max(plan.pages - 1, 0) for plan in self.connections)
+
+    @property
+    def cost(self):
+        """The estimated number of rate limit points the crawl will spend"""
+        return (sum(group.cost for group in self.groups) +
+                sum(plan.follow_up_cost for plan in self.connections))
+
+    def estimate_seconds(self, budget=None, latency=0.5, concurrency=1, now=None):
+        """Estimates how long the crawl will take.
+
+        Arguments:
+            budget (TokenPool) - the pool the crawl will run under, i.e.
+                    GithubObject.get_token_pool(); the remaining points and windows
+                    of every token decide how long the crawl waits for budget.  A
+                    single RateLimiter is accepted as well.  Without one the
+                    budget is assumed to be unlimited.
+
+        Keyword Arguments:
+            latency (float) - the average number of seconds a request takes
+            concurrency (int) - the number of requests in flight at once
+            now (float) - the current time in epoch seconds, for the tokens' windows
+
+        Returns:
+            float - the estimated wall-clock seconds
+        """
+        request_seconds = self.requests * latency / max(concurrency, 1)
+        if budget is None:
+            return request_seconds
+
+        now = time.time() if now is None else now
+        limiters = list(budget.limiters.values()) if hasattr(budget, 'limiters') else [budget]
+        available = per_window = rate = 0.0
+        until_reset = 0.0
+        paced = False
+        for limiter in limiters:
+            token_reset = max(limiter.reset_at - now, 0) if limiter.reset_at else DEFAULT_WINDOW
+            remaining = limiter.remaining if limiter.remaining is not None else limiter.limit
+            token_available = max(remaining - limiter.reserve, 0)
+            available += token_available
+            per_window += max(limiter.limit - limiter.reserve, 0)
+            rate += token_available / token_reset if token_reset else token_available
+            until_reset = max(until_reset, token_reset)
+            paced = paced or limiter.pace
+
+        if self.cost <= available:
+            # pacing limiters spread each token's points evenly over the rest of its window
+            budget_seconds = self.cost / rate if paced and rate else 0
+        else:
+            windows = int(math.ceil((self.cost - available) / max(per_window, 1.0)))
+            budget_seconds = until_reset + (windows - 1) * DEFAULT_WINDOW
+        return max(request_seconds, budget_seconds)
+
+    def summary(self):
+        """Returns the plan's totals as a dict, i.e. for logging"""
+        return {'logins': len(set(plan.login for plan in self.connections)),
+                'failed': len(self.failed),
+                'requests': self.requests + self.count_requests,
+                'cost': self.cost + self.count_cost,
+                'nodes': sum(plan.total_count for plan in self.connections)}
+
+
+class CrawlPlanner(object):
+    """Builds CrawlPlans for the connections a collector saves for each login."""
+
+    def __init__(self, connections=None, filters=None, batch_size=50, max_group_size=None):
+        """
+        Keyword Arguments:
+            connections (list) - the User connections to plan for, i.e.
+                    ['repositories', 'issues']; defaults to every connection
+            filters (dict) - maps connection names to extra keyword arguments the
+                    collector passes, i.e. {'gists': {'privacy': 'ALL'}}
+            batch_size (int) - the number of logins counted in each request
+            max_group_size (int) - the most connections batched into one request;
+                    by default only Github's node limit applies
+        """
+        self.connections = list(connections or sorted(CONNECTION_DOC_TYPES))
+        self.filters = filters or {}
+        self.batch_size = batch_size
+        self.max_group_size = max_group_size
+        self._nested = dict((name, self._nested_connections(name)) for name in self.connections)
+        self._client = User._from_response(None, _login=None)
+
+    def __repr__(self):
+        return 'CrawlPlanner(connections={!r})'.format(self.connections)
+
+    @staticmethod
+    def _nested_connections(name):
+        """Returns the page sizes of the connections nested in a connection template,
+        i.e. gists selects stargazers(first: 100) and comments(first: 100)
+
+        Raises:
+            TemplateError - if the template does not select totalCount
+        """
+        template = TEMPLATES.get('User', name)
+        if 'totalCount' not in template.selection:
+            raise TemplateError('{} does not select totalCount'.format(template.name))
+        return [int(first) for first in _NESTED_CONNECTION.findall(template.selection)]
+
+    def _page_requests(self, name, page_size):
+        """The number of connection requests one page of a connection makes"""
+        return 1 + page_size * len(self._nested[name])
+
+    def _page_nodes(self, name, page_size):
+        """The most nodes one page of a connection can return"""
+        return page_size * (1 + sum(self._nested[name]))
+
+    def _choose_page_size(self, name, total_count):
+        """Picks the page size that collects a connection for the fewest points,
+        preferring fewer requests when two sizes cost the same.  The first page is
+        batched with other connections, so it is charged its share of a point."""
+        best = None
+        for page_size in range(min(total_count, MAX_PAGE_SIZE), 0, -1):
+            pages = int(math.ceil(total_count / float(page_size)))
+            cost = (self._page_requests(name, page_size) / 100.0 +
+                    (pages - 1) * query_cost(self._page_requests(name, page_size)))
+            if best is None or (cost, pages) < best[0]:
+                best = ((cost, pages), page_size)
+        return best[1]
+
+    def count(self, logins):
+        """Queries the totalCount of every planned connection for each login,
+        batch_size logins per request.
+
+        Arguments:
+            logins (iterable) - the Github usernames to count
+
+        Returns:
+            tuple - ({login: {connection: totalCount}}, requests made, points spent);
+                    logins with errors are logged and left out
+        """
+        selection = ' '.join(['%s(%s) { totalCount }' % (
+            name, self._client._format_filters(dict(self.filters.get(name, {}), first=1)))
+                              for name in self.connections])
+        root = TEMPLATES.get('User', 'user').root
+        template = Template('user_counts', 'query { %s { login %s } }' % (root, selection))
+
+        logins = list(logins)
+        counts, requests, cost = {}, 0, 0
+        for start in range(0, len(logins), self.batch_size):
+            batch = logins[start:start + self.batch_size]
+            payloads = self._client._batch_roots(template, [(login,) for login in batch])
+            requests += 1
+            cost += query_cost(len(batch) * len(self.connections))
+            for login, payload in zip(batch, payloads):
+                if self._client._errors_exist('GithubUser', login, payload):
+                    continue
+                user = payload['data']['user']
+                counts[login] = dict((name, user[name]['totalCount']) for name in self.connections)
+        return counts, requests, cost
+
+    def plan(self, logins, counts=None):
+        """Builds the cheapest plan for crawling the connections of each login.
+
+        Arguments:
+            logins (iterable) - the Github usernames to crawl
+
+        Keyword Arguments:
+            counts (dict) - {login: {connection: totalCount}} from an earlier count();
+                    counted from the endpoint if omitted
+
+        Returns:
+            CrawlPlan - the plan; empty connections are left out entirely
+        """
+        logins = list(logins)
+        requests = cost = 0
+        if counts is None:
+            counts, requests, cost = self.count(logins)
+
+        connections, groups = [], []
+        for login in logins:
+            if login not in counts:
+                continue
+            group = PageGroup(login)
+            for name in self.connections:
+                total_count = counts[login].get(name, 0)
+                if not total_count:
+                    continue
+                page_size = self._choose_page_size(name, total_count)
+                kwargs = dict(self.filters.get(name, {}), first=page_size)
+                page_requests = self._page_requests(name, page_size)
+                plan = ConnectionPlan(login, name, total_count, page_size, kwargs,
+                                      query_cost(page_requests))
+                connections.append(plan)
+                nodes = self._page_nodes(name, page_size)
+                if group.connections and (group.nodes + nodes > MAX_NODES or
+                                          len(group.connections) == self.max_group_size):
+                    groups.append(group)
+                    group = PageGroup(login)
+                group.add(plan, page_requests, nodes)
+            if group.connections:
+                groups.append(group)
+        failed = [login for login in logins if login not in counts]
+        return CrawlPlan(connections, groups, requests, cost, failed)
+
+    def dry_run(self, plan):
+        """Replaces the plan's estimated costs with the costs Github reports for
+        each distinct query shape through rateLimit(dryRun: true).  The queries
+        are not executed.
+
+        Arguments:
+            plan (CrawlPlan) - a plan built by plan()
+
+        Returns:
+            CrawlPlan - the same plan, updated in place
+        """
+        costs = {}
+        for group in plan.groups:
+            group.cost = self._dry_run_cost(group.login, group.connections, costs)
+        for connection_plan in plan.connections:
+            if connection_plan.pages > 1:
+                connection_plan.page_cost = self._dry_run_cost(
+                    connection_plan.login, {connection_plan.name: connection_plan.kwargs}, costs)
+        return plan
+
+    def _dry_run_cost(self, login, connections, costs):
+        """Asks Github what a batched query would cost, once per query shape"""
+        shape = tuple(sorted((name, tuple(sorted(kwargs.items())))
+                             for name, kwargs in connections.items()))
+        if shape not in costs:
+            _, query = self._client._compose_connections('User', (login,), connections)
+            text = query['query']
+            end = text.rfind('}')
+            # aliased so the rate limiter leaves the dry-run cost in the payload
+            query = {"query": ''.join([text[:end], ' dryRun: rateLimit(dryRun: true) { cost } ',
+                                       text[end:]])}
+            payload = self._client._post(query)
+            if self._client._errors_exist('GithubRateLimit', login, payload):
+                return query_cost(sum(self._page_requests(name, kwargs['first'])
+                                      for name, kwargs in connections.items()))
+            costs[shape] = payload['data']['dryRun']['cost']
+        return costs[shape]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+profiles.py - named field projections applied to every query template
+
+The templates under graphql/ select everything Github offers, which is more
+than a bulk crawl uses: each issue and comment asks for its body three times
+over (body, bodyHTML and bodyText), and each repository asks for the full
+permissions and limitations of its license.  A profile names the fields to
+leave out, and the query actually sent is generated from the template with
+those fields cut out of it:
+
+    full        every field in the template, as written
+    standard    bodies as bodyText only; no license permission or limitation trees
+    minimal     standard, also without bodyText, reactionGroups and the long
+                license descriptions
+
+A field is named by its path, matched against the end of the path of each
+field in the template, so 'body' leaves out every body and
+'licenseInfo.permissions' leaves out only the permissions of a license.
+Profiles only cut nested fields or ones the objects read with a default, so the
+properties of User, Repository and Issue keep working under any of them.
+
+The default profile is set with profile = in the [Templates] section of
+collectors.cfg; User, Repository, Issue, Issues and GithubCollector also take a
+profile argument.
+"""
+import re
+
+PROFILES = {
+    'full': (),
+    'standard': ('body', 'bodyHTML',
+                 'licenseInfo.permissions', 'licenseInfo.limitations'),
+    'minimal': ('body', 'bodyHTML', 'bodyText', 'reactionGroups',
+                'licenseInfo.permissions', 'licenseInfo.limitations',
+                'licenseInfo.description', 'licenseInfo.implementation'),
+}
+
+DEFAULT_PROFILE = 'full'
+
+_NAME = re.compile(r'[_A-Za-z][_0-9A-Za-z]*')
+_IGNORED = ' \t\r\n,'
+
+
+def check(profile):
+    """Returns a profile name unchanged if it is known.
+
+    Raises:
+        ValueError - if no such profile exists
+    """
+    if profile not in PROFILES:
+        raise ValueError('Unknown field profile {!r}; expected one of {}'
+                         .format(profile, ', '.join(sorted(PROFILES))))
+    return profile
+
+
+def excluded(profile):
+    """Returns the field paths a profile leaves out, each as a tuple of names,
+    i.e. ('licenseInfo', 'permissions')"""
+    return tuple(tuple(path.split('.')) for path in PROFILES[check(profile)])
+
+
+def fields(text):
+    """Lists every field selected in a GraphQL document.
+
+    Arguments:
+        text (str) - the document, i.e. a template
+
+    Returns:
+        list - (path, start, end) per field, where path is the tuple of field
+                names from the root field down and text[start:end] is the field
+                including its alias, arguments and selection
+    """
+    spans = []
+    start = text.find('{')
+    if start != -1:
+        _selection(text, start + 1, (), spans)
+    return spans
+
+
+def project(text, paths):
+    """Cuts the fields matching any of paths out of a GraphQL document.
+
+    Arguments:
+        text (str) - the document, i.e. a template
+        paths (iterable) - field paths as tuples of names, matched against the
+                end of each field's path
+
+    Returns:
+        str - the document without the matching fields
+    """
+    paths = [tuple(path) for path in paths]
+    cuts = [(start, end) for path, start, end in fields(text)
+            if any(path[-len(suffix):] == suffix for suffix in paths)]
+    projected = []
+    position = 0
+    for start, end in sorted(cuts):
+        if start < position:
+            # inside a field that was already cut
+            continue
+        while end < len(text) and text[end] in ' \t,':
+            end += 1
+        indent = start
+        while indent > position and text[indent - 1] in ' \t':
+            indent -= 1
+        if (indent == 0 or text[indent - 1] == '\n') and text[end:end + 1] == '\n':
+            # the field is on a line of its own; cut the whole line
+            start, end = indent, end + 1
+        projected.append(text[position:start])
+        position = end
+    projected.append(text[position:])
+    return ''.join(projected)
+
+
+def _skip(text, index, chars=_IGNORED):
+    """Internal function that returns the index of the next character not in chars"""
+    while index < len(text) and text[index] in chars:
+        index += 1
+    return index
+
+
+def _arguments(text, index):
+    """Internal function that returns the index just past the arguments opened at
+    text[index], skipping over quoted strings"""
+    depth = 0
+    in_string = False
+    while index < len(text):
+        char = text[index]
+        if char == '"':
+            in_string = not in_string
+        elif not in_string and char == '(':
+            depth += 1
+        elif not in_string and char == ')':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    raise ValueError('unbalanced parentheses')
+
+
+def _selection(text, index, path, spans):
+    """Internal function that records the fields of the selection starting at
+    text[index], just past its opening brace, and returns the index just past its
+    closing brace"""
+    while True:
+        index = _skip(text, index)
+        if index >= len(text):
+            raise ValueError('unbalanced braces')
+        if text[index] == '}':
+            return index + 1
+        if text.startswith('...', index):
+            # an inline fragment selects fields of the enclosing field
+            index = _selection(text, text.index('{', index) + 1, path, spans)
+            continue
+        start = index
+        match = _NAME.match(text, index)
+        if match is None:
+            raise ValueError('expected a field at {!r}'.format(text[index:index + 20]))
+        name, end = match.group(), match.end()
+        index = _skip(text, end, ' \t\r\n')
+        if text[index:index + 1] == ':':
+            match = _NAME.match(text, _skip(text, index + 1, ' \t\r\n'))
+            name, end = match.group(), match.end()
+            index = _skip(text, end, ' \t\r\n')
+        if text[index:index + 1] == '(':
+            end = _arguments(text, index)
+            index = _skip(text, end, ' \t\r\n')
+        if text[index:index + 1] == '{':
+            end = _selection(text, index + 1, path + (name,), spans)
+        spans.append((path + (name,), start, end))
+        index = end
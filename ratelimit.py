@@ -0,0 +1,388 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+ratelimit.py - a rate-limit-aware scheduler for GraphQL queries
+
+Every query a GithubObject sends passes through a RateLimiter first.  The
+limiter appends the rateLimit block from graphql/gh_rate_limit.graphql to the
+query, so each response reports what the query cost, how many points remain and
+when the window resets.  From that it
+
+    * paces requests so the remaining points are spread evenly across the rest
+      of the window rather than spent in a burst, and
+    * pauses until the window resets once the budget is exhausted (or Github
+      reports RATE_LIMITED) instead of sending queries that are bound to fail.
+
+Each personal access token has its own RateLimiter, and a process-wide
+TokenPool sends every query with the token that has the most budget left, so
+throughput grows with the number of tokens configured.  Collectors running as
+threads share the pool; limiters are tuned in the [RateLimit] section of
+collectors.cfg and tokens listed under [Github] personal_access_tokens.
+"""
+from datetime import datetime, timezone
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+import settings
+from templates import TEMPLATES
+
+# Points Github grants per window, and the window length in seconds
+DEFAULT_LIMIT = 5000
+DEFAULT_WINDOW = 3600
+# Seconds to wait when Github refuses a query without saying when to retry
+DEFAULT_BACKOFF = 60
+
+_lock = threading.Lock()
+_pool = None
+
+
+def _parse_reset(value):
+    """Converts a resetAt timestamp, i.e. '2019-05-01T12:00:00Z', to epoch seconds"""
+    if value is None:
+        return None
+    reset = datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    return reset.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RateLimiter(object):
+    """Tracks the rateLimit block returned with each query and schedules queries
+    so they never exceed it.
+
+    Attributes:
+        limit (int) - the points available per window
+        remaining (int) - the points left in the current window, None until the
+                first response is seen
+        reset_at (float) - when the current window resets in epoch seconds, None
+                until the first response is seen
+        cost (int) - the cost of the most recent query
+    """
+
+    def __init__(self, reserve=0, pace=True, inject=True, backoff=DEFAULT_BACKOFF,
+                 clock=time.time, sleep=time.sleep):
+        """
+        Keyword Arguments:
+            reserve (int) - points held back, i.e. for interactive use of the token
+            pace (Boolean) - if True, spread the remaining points evenly across the
+                    window; if False, only pause once the budget is exhausted
+            inject (Boolean) - if True, append the rateLimit block to each query
+            backoff (int) - seconds to pause when Github refuses a query without
+                    reporting when the window resets
+            clock (callable) - returns the current time in epoch seconds
+            sleep (callable) - blocks for the given number of seconds
+        """
+        self.reserve = int(reserve)
+        self.pace = pace
+        self.inject_block = inject
+        self.backoff = backoff
+        self.limit = DEFAULT_LIMIT
+        self.remaining = None
+        self.reset_at = None
+        self.cost = 1
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('GithubCollector')
+
+    def __repr__(self):
+        return 'RateLimiter(remaining={!r}, limit={!r}, reset_at={!r})'.format(
+            self.remaining, self.limit, self.reset_at)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a RateLimiter from the [RateLimit] section of collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            RateLimiter - a limiter using the configured reserve and pacing
+        """
+        if not config.has_section('RateLimit'):
+            return cls()
+        section = config['RateLimit']
+        return cls(reserve=section.getint('reserve', 0),
+                   pace=section.getboolean('pace', True),
+                   inject=section.getboolean('inject', True),
+                   backoff=section.getint('backoff', DEFAULT_BACKOFF))
+
+    @staticmethod
+    def block():
+        """Returns the rateLimit selection from graphql/gh_rate_limit.graphql,
+        i.e. 'rateLimit(dryRun: false) { cost limit ... }'"""
+        template = TEMPLATES.get(None, 'gh_rate_limit')
+        return '%s { %s }' % (template.root, ' '.join(template.selection.split()))
+
+    def inject(self, query):
+        """Appends the rateLimit block to a query so its response reports the
+        budget.  Queries that already select rateLimit are returned unchanged.
+
+        Arguments:
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Returns:
+            dict - the json payload to post
+        """
+        text = query.get('query', '')
+        if not self.inject_block or 'rateLimit' in text:
+            return query
+        end = text.rfind('}')
+        if end < 0:
+            return query
+        injected = dict(query)
+        injected['query'] = ''.join([text[:end], ' ', self.block(), ' ', text[end:]])
+        return injected
+
+    def wait_time(self):
+        """Reserves a slot for the next query and returns how long to wait for it.
+
+        Returns:
+            float - the number of seconds to wait before sending the query
+        """
+        with self._lock:
+            now = self._clock()
+            if self.reset_at is not None and now >= self.reset_at:
+                # the window rolled over; the next response reports the new one
+                self.remaining, self.reset_at, self._next_slot = self.limit, None, now
+            if self.remaining is None or self.reset_at is None:
+                # nothing is known about the window beyond a pause already scheduled
+                return max(self._next_slot - now, 0.0)
+
+            cost = max(self.cost, 1)
+            available = self.remaining - self.reserve
+            if available < cost:
+                delay = self.reset_at - now
+                self.logger.warning('Rate limit exhausted, pausing %.0f seconds until reset', delay)
+                self.remaining, self.reset_at = self.limit, None
+                self._next_slot = now + delay
+                return delay
+
+            start = max(now, self._next_slot)
+            if self.pace:
+                self._next_slot = start + (self.reset_at - now) * cost / available
+            # claim the points now so concurrent callers see the reduced budget
+            self.remaining -= cost
+            return start - now
+
+    def headroom(self):
+        """Reports how soon this limiter could send a query and with how many
+        points, without reserving anything.
+
+        Returns:
+            tuple - (seconds until a query could be sent, points available)
+        """
+        with self._lock:
+            now = self._clock()
+            wait = max(self._next_slot - now, 0.0)
+            if self.remaining is None or self.reset_at is None or now >= self.reset_at:
+                return wait, self.limit - self.reserve
+            available = self.remaining - self.reserve
+            if available < max(self.cost, 1):
+                wait = max(wait, self.reset_at - now)
+            return wait, available
+
+    def acquire(self):
+        """Blocks until the next query may be sent"""
+        delay = self.wait_time()
+        if delay > 0:
+            self._sleep(delay)
+
+    def observe(self, payload, headers=None):
+        """Updates the budget from a response and strips the injected rateLimit
+        block so the payload is shaped exactly as its template describes.
+
+        Arguments:
+            payload (dict) - the decoded json response
+
+        Keyword Arguments:
+            headers (dict) - the response headers, consulted for Retry-After and
+                    X-RateLimit-* when the body carries no rateLimit block
+
+        Returns:
+            float - the number of seconds to wait before retrying the query if
+                    Github refused it for exceeding a rate limit, 0 otherwise
+        """
+        headers = headers or {}
+        data = payload.get('data') if isinstance(payload, dict) else None
+        rate = data.pop('rateLimit', None) if isinstance(data, dict) else None
+        with self._lock:
+            if rate:
+                self.cost = rate.get('cost') or self.cost
+                self.limit = rate.get('limit') or self.limit
+                self.remaining = rate.get('remaining')
+                self.reset_at = _parse_reset(rate.get('resetAt'))
+            elif 'X-RateLimit-Remaining' in headers:
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+                self.reset_at = float(headers.get('X-RateLimit-Reset', self._clock() + DEFAULT_WINDOW))
+
+            if not self._refused(payload, headers):
+                return 0
+            now = self._clock()
+            if 'Retry-After' in headers:
+                delay = float(headers['Retry-After'])
+            elif self.reset_at is not None and self.reset_at > now:
+                delay = self.reset_at - now
+            else:
+                delay = self.backoff
+            self.remaining, self.reset_at = None, None
+            self._next_slot = now + delay
+        self.logger.warning('Rate limited by Github, retrying in %.0f seconds', delay)
+        return delay
+
+    @staticmethod
+    def _refused(payload, headers):
+        """Checks whether Github refused a query for exceeding a rate limit"""
+        if not isinstance(payload, dict):
+            return False
+        for error in payload.get('errors') or []:
+            if isinstance(error, dict) and error.get('type') == 'RATE_LIMITED':
+                return True
+        return 'rate limit' in str(payload.get('message', '')).lower() or 'Retry-After' in headers
+
+    def post(self, send, query):
+        """Sends a query once the budget allows, pausing and retrying while Github
+        refuses it for exceeding a rate limit.
+
+        Arguments:
+            send (callable) - posts a json payload and returns (payload, headers)
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Returns:
+            dict - the decoded json response
+        """
+        query = self.inject(query)
+        while True:
+            self.acquire()
+            payload, headers = send(query)
+            delay = self.observe(payload, headers)
+            if not delay:
+                return payload
+            self._sleep(delay)
+
+
+class TokenPool(object):
+    """Spreads queries across several personal access tokens, each tracked by its
+    own RateLimiter.  Every query goes to the token with the most budget left;
+    a token that is exhausted (or was refused by Github) is skipped until its
+    window resets, and queries only wait once every token is exhausted."""
+
+    def __init__(self, tokens, limiter_factory=RateLimiter):
+        """
+        Arguments:
+            tokens (list) - the personal access tokens to spread queries across
+
+        Keyword Arguments:
+            limiter_factory (callable) - builds the RateLimiter for each token
+
+        Raises:
+            ValueError - if no tokens are given
+        """
+        if not tokens:
+            raise ValueError('A token pool needs at least one token')
+        self.limiters = OrderedDict((token, limiter_factory()) for token in tokens)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TokenPool(tokens={!r})'.format(len(self.limiters))
+
+    def __len__(self):
+        return len(self.limiters)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a TokenPool from the [Github] section of collectors.cfg, using the
+        comma separated personal_access_tokens if set and personal_access_token
+        otherwise.  Each token's limiter is built from the [RateLimit] section.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            TokenPool - a pool of every configured token
+        """
+        section = config['Github'] if config.has_section('Github') else {}
+        tokens = [token.strip() for token in section.get('personal_access_tokens', '').split(',')]
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            tokens = [section.get('personal_access_token', '').strip()]
+        return cls(tokens, lambda: RateLimiter.from_config(config))
+
+    def checkout(self):
+        """Picks the token to send the next query with: the one that can send
+        soonest, and of those the one with the most points left.
+
+        Returns:
+            tuple - (token, RateLimiter)
+        """
+        with self._lock:
+            return min(self.limiters.items(), key=lambda item: self._rank(item[1].headroom()))
+
+    @staticmethod
+    def _rank(headroom):
+        """Orders limiters by how soon they can send, then by the most points left"""
+        wait, available = headroom
+        return wait, -available
+
+    def post(self, send, query):
+        """Sends a query with the token that has the most budget left, moving on
+        to another token whenever Github refuses one for exceeding a rate limit.
+
+        Arguments:
+            send (callable) - posts a json payload with a token, i.e.
+                    send(query, token), and returns (payload, headers)
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Returns:
+            dict - the decoded json response
+        """
+        while True:
+            token, limiter = self.checkout()
+            # only blocks when every token in the pool is exhausted
+            limiter.acquire()
+            payload, headers = send(limiter.inject(query), token)
+            if not limiter.observe(payload, headers):
+                return payload
+
+
+def get_token_pool(config=None):
+    """Returns the process-wide token pool, creating it on first use.
+
+    Arguments:
+        config (ConfigParser) - optional parsed collectors.cfg used to build the
+                pool the first time it is requested; the process-wide settings
+                are used if omitted
+
+    Returns:
+        TokenPool - the shared pool
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                if config is None:
+                    config = settings.get_settings().config
+                _pool = TokenPool.from_config(config)
+    return _pool
+
+
+def set_token_pool(pool):
+    """Replaces the process-wide token pool.
+
+    Arguments:
+        pool (TokenPool) - the pool to install; None resets the shared pool so it
+                is rebuilt on next use
+
+    Returns:
+        the previously installed pool (or None)
+    """
+    global _pool
+    with _lock:
+        previous = _pool
+        _pool = pool
+    return previous
+
+
+# rebuilt from the new settings on next use, see settings.reload_settings
+settings.on_reload(lambda new_settings: set_token_pool(None))
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+retry.py - retries with backoff, and a circuit breaker, for every GraphQL call
+
+A 502 from Github, a secondary rate limit 403 or a read timeout used to reach
+json.loads() as an html error page (raising ValueError) or end a connection's
+pagination with the method returning False.  Every query now goes through a
+RetryPolicy, which sorts failures into
+
+    retryable - timeouts, dropped connections, 5xx and a 200 whose body is not
+                json (a truncated response); retried after an exponential
+                backoff with full jitter, or after exactly Retry-After seconds
+                when Github says how long to wait
+    fatal     - any other 4xx, i.e. a bad token; not retried
+
+and a process-wide CircuitBreaker shared by every thread.  After
+failure_threshold consecutive retryable failures the breaker opens and no
+thread sends anything until reset_timeout has passed; then a single probe
+query is let through and its outcome closes or re-opens the breaker.  Threads
+waiting on an open breaker wait without sending, so an unhealthy endpoint is
+not buried under retries.
+
+A rate limit refusal, a 429 or a 403 carrying Retry-After, an exhausted
+X-RateLimit-Remaining or mentioning a secondary (abuse) rate limit, is neither:
+it decodes to a RATE_LIMITED error with its headers kept, so the token's
+RateLimiter waits out Retry-After and the TokenPool moves on to another token
+(see ratelimit.py) instead of the same token being retried here.
+
+When a query cannot be sent, GithubObject returns a payload carrying the
+failure in "errors", so callers log it and return False as they do for any
+other GraphQL error.  Both are tuned in the [Retry] section of collectors.cfg.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+
+import settings
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = frozenset([500, 502, 503, 504])
+# exceptions raised by requests that are worth retrying
+RETRYABLE_EXCEPTIONS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+# phrases Github uses when a 403 is a secondary rate limit rather than a denial
+SECONDARY_RATE_LIMIT = ('secondary rate limit', 'abuse')
+
+_lock = threading.Lock()
+_policy = None
+
+
+class RetryableError(Exception):
+    """A query failed in a way that may succeed if it is sent again.
+
+    Attributes:
+        retry_after (float) - the seconds Github asked to wait, None if it did not say
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FatalError(Exception):
+    """A query failed in a way that sending it again will not fix"""
+    pass
+
+
+def _retry_after(headers):
+    """Internal function that reads a Retry-After header given in seconds"""
+    try:
+        return float((headers or {}).get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limited(status, text, headers=None):
+    """Checks whether a response is Github refusing a query for exceeding a
+    primary or secondary rate limit.
+
+    Arguments:
+        status (int) - the HTTP status
+        text (str) - the body of the response
+
+    Keyword Arguments:
+        headers (dict) - the response headers
+
+    Returns:
+        boolean - True for a refusal, which is left to the RateLimiter
+    """
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    headers = headers or {}
+    return (_retry_after(headers) is not None or str(headers.get('X-RateLimit-Remaining')) == '0' or
+            any(phrase in (text or '').lower() for phrase in SECONDARY_RATE_LIMIT))
+
+
+def refusal(status, text):
+    """Returns the payload a rate limit refusal decodes to: a RATE_LIMITED error,
+    as Github reports a refused GraphQL query, which RateLimiter.observe acts on"""
+    return {'errors': [{'type': 'RATE_LIMITED',
+                        'message': 'HTTP {}: {}'.format(status, (text or '')[:200])}]}
+
+
+def classify(status, text, headers=None):
+    """Raises the error a failed HTTP response stands for; does nothing for a
+    successful one or a rate limit refusal (see rate_limited).
+
+    Arguments:
+        status (int) - the HTTP status
+        text (str) - the body of the response
+
+    Keyword Arguments:
+        headers (dict) - the response headers, consulted for Retry-After
+
+    Raises:
+        RetryableError - if the query should be sent again
+        FatalError - if it should not
+    """
+    if rate_limited(status, text, headers):
+        return
+    if status in RETRYABLE_STATUSES:
+        raise RetryableError('HTTP {}'.format(status), _retry_after(headers))
+    if status >= 400:
+        raise FatalError('HTTP {}: {}'.format(status, (text or '')[:200]))
+
+
+def decode(text, headers=None, status=200):
+    """Decodes the body of a response from the endpoint, classifying any failure.
+
+    Arguments:
+        text (str) - the body of the response
+
+    Keyword Arguments:
+        headers (dict) - the response headers
+        status (int) - the HTTP status
+
+    Returns:
+        dict - the decoded json payload; a rate limit refusal decodes to the
+                RATE_LIMITED error returned by refusal()
+
+    Raises:
+        RetryableError - if the query should be sent again, including when a
+                successful response is not json, i.e. it was cut short
+        FatalError - if it should not
+    """
+    if rate_limited(status, text, headers):
+        return refusal(status, text)
+    classify(status, text, headers)
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        raise RetryableError('HTTP {}: response is not json: {!r}'.format(status, (text or '')[:200]))
+
+
+class CircuitBreaker(object):
+    """Stops every thread from sending queries while the endpoint is failing.
+
+    Attributes:
+        state (str) - 'closed' (sending), 'open' (not sending) or 'half-open'
+                (one probe query in flight)
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic, logger=None):
+        """
+        Keyword Arguments:
+            failure_threshold (int) - consecutive failures that open the breaker
+            reset_timeout (float) - seconds the breaker stays open before a probe
+            clock (callable) - returns the current time in seconds; replaceable in tests
+            logger (logging.Logger) - where the breaker opening and closing is reported
+        """
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.clock = clock
+        self.logger = logger or logging.getLogger('GithubCollector')
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'CircuitBreaker(state={!r}, failures={})'.format(self.state, self.failures)
+
+    def wait_time(self):
+        """Returns how long the caller must wait before sending, 0 if it may send
+        now.  Once the breaker has been open for reset_timeout, the first caller
+        is let through as the probe and the rest keep waiting."""
+        with self._lock:
+            if self.state == 'closed':
+                return 0
+            remaining = self._opened_at + self.reset_timeout - self.clock()
+            if remaining <= 0:
+                # open long enough, or the last probe never reported back
+                self.state = 'half-open'
+                self._opened_at = self.clock()
+                return 0
+            if self.state == 'half-open':
+                # poll for the probe's outcome rather than waiting out the timeout
+                return min(remaining, 1.0)
+            return remaining
+
+    def record_success(self):
+        """Closes the breaker after a query succeeded"""
+        with self._lock:
+            if self.state != 'closed':
+                self.logger.info('Github endpoint recovered, circuit breaker closed')
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        """Counts a retryable failure, opening the breaker once there are too many"""
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or (self.state == 'closed' and
+                                             self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = self.clock()
+                self.logger.warning('Github endpoint failing, circuit breaker open for %.0f seconds',
+                                    self.reset_timeout)
+
+
+class RetryPolicy(object):
+    """Sends a query until it succeeds, fails fatally or runs out of attempts."""
+
+    def __init__(self, max_attempts=5, backoff_base=1.0, backoff_cap=60.0, max_wait=300.0,
+                 breaker=None, sleep=time.sleep, rand=random.random, logger=None):
+        """
+        Keyword Arguments:
+            max_attempts (int) - the most times a query is sent
+            backoff_base (float) - the backoff before the first retry is up to this
+                    many seconds, doubling for each retry after it
+            backoff_cap (float) - the most seconds a backoff may last
+            max_wait (float) - the most seconds one query waits on an open breaker
+                    before giving up
+            breaker (CircuitBreaker) - the breaker queries are sent through;
+                    defaults to a new one
+            sleep (callable) - waits a number of seconds; replaceable in tests
+            rand (callable) - returns a float in [0, 1); replaceable in tests
+            logger (logging.Logger) - where retries are reported
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = float(backoff_base)
+        self.backoff_cap = float(backoff_cap)
+        self.max_wait = float(max_wait)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.logger = logger or logging.getLogger('GithubCollector')
+        self._sleep = sleep
+        self._rand = rand
+
+    def __repr__(self):
+        return 'RetryPolicy(max_attempts={}, breaker={!r})'.format(self.max_attempts, self.breaker)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a RetryPolicy and its CircuitBreaker from the [Retry] section of
+        collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            RetryPolicy - a policy using the configured attempts, backoff and breaker
+        """
+        if not config.has_section('Retry'):
+            return cls()
+        section = config['Retry']
+        breaker = CircuitBreaker(failure_threshold=section.getint('breaker_failures', 5),
+                                 reset_timeout=section.getfloat('breaker_reset', 30.0))
+        return cls(max_attempts=section.getint('max_attempts', 5),
+                   backoff_base=section.getfloat('backoff_base', 1.0),
+                   backoff_cap=section.getfloat('backoff_cap', 60.0),
+                   max_wait=section.getfloat('max_wait', 300.0),
+                   breaker=breaker)
+
+    def backoff(self, attempt, retry_after=None):
+        """Returns the seconds to wait before retrying.
+
+        Arguments:
+            attempt (int) - the attempt that just failed, starting at 1
+
+        Keyword Arguments:
+            retry_after (float) - the seconds Github asked to wait, honored as given
+
+        Returns:
+            float - a random time up to backoff_base * 2 ** (attempt - 1), capped at
+                    backoff_cap ("full jitter", so retrying threads spread out)
+        """
+        if retry_after is not None:
+            return retry_after
+        return self._rand() * min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+
+    def call(self, send, retryable=()):
+        """Sends a query, retrying retryable failures.
+
+        Arguments:
+            send (callable) - sends the query and returns its result, raising
+                    RetryableError, FatalError or a requests exception on failure
+
+        Keyword Arguments:
+            retryable (tuple) - further exception types worth retrying
+
+        Returns:
+            whatever send returns
+
+        Raises:
+            RetryableError - if every attempt failed
+            FatalError - if a failure is not worth retrying
+        """
+        attempt, waited = 0, 0.0
+        while True:
+            wait = self._breaker_wait(waited)
+            if wait:
+                self._sleep(wait)
+                waited += wait
+                continue
+            attempt += 1
+            try:
+                result = send()
+            except (RetryableError, FatalError) + RETRYABLE_EXCEPTIONS + tuple(retryable) as error_msg:
+                self._sleep(self._failed(attempt, error_msg))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, send, retryable=()):
+        """Awaits a query, retrying retryable failures without blocking the event
+        loop.  See call().
+
+        Arguments:
+            send (callable) - returns an awaitable that sends the query
+
+        Keyword Arguments:
+            retryable (tuple) - further exception types worth retrying, i.e.
+                    aiohttp.ClientConnectionError; asyncio timeouts always are
+        """
+        attempt, waited = 0, 0.0
+        while True:
+            wait = self._breaker_wait(waited)
+            if wait:
+                await asyncio.sleep(wait)
+                waited += wait
+                continue
+            attempt += 1
+            try:
+                result = await send()
+            except ((RetryableError, FatalError, asyncio.TimeoutError) + RETRYABLE_EXCEPTIONS +
+                    tuple(retryable)) as error_msg:
+                await asyncio.sleep(self._failed(attempt, error_msg))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _breaker_wait(self, waited):
+        """Internal function that returns how long to wait on the breaker, 0 to send
+        now.  Waiting sends nothing, so it does not use up an attempt.
+
+        Raises:
+            RetryableError - once the query has waited max_wait seconds
+        """
+        wait = self.breaker.wait_time()
+        if wait <= 0:
+            return 0
+        if waited >= self.max_wait:
+            raise RetryableError('circuit breaker open for over {:.0f} seconds'.format(waited))
+        return min(wait, self.max_wait - waited)
+
+    def _failed(self, attempt, error_msg):
+        """Internal function that records a failed attempt and returns the backoff
+        before the next one.
+
+        Raises:
+            FatalError - if the failure is not worth retrying
+            RetryableError - if it was the last attempt
+        """
+        if isinstance(error_msg, FatalError):
+            # the endpoint answered; it is the query that is wrong
+            self.breaker.record_success()
+            raise error_msg
+        self.breaker.record_failure()
+        if attempt >= self.max_attempts:
+            if isinstance(error_msg, RetryableError):
+                raise error_msg
+            raise RetryableError('{}: {}'.format(error_msg.__class__.__name__, error_msg)) from error_msg
+        delay = self.backoff(attempt, getattr(error_msg, 'retry_after', None))
+        self.logger.warning('Query failed (%s), attempt %d of %d, retrying in %.1f seconds',
+                            error_msg, attempt, self.max_attempts, delay)
+        return delay
+
+
+def get_retry_policy(config=None):
+    """Returns the process-wide retry policy, creating it on first use.
+
+    Arguments:
+        config (ConfigParser) - optional parsed collectors.cfg used to build the
+                policy the first time it is requested; the process-wide settings
+                are used if omitted
+
+    Returns:
+        RetryPolicy - the shared policy
+    """
+    global _policy
+    if _policy is None:
+        with _lock:
+            if _policy is None:
+                if config is None:
+                    config = settings.get_settings().config
+                _policy = RetryPolicy.from_config(config)
+    return _policy
+
+
+def set_retry_policy(policy):
+    """Replaces the process-wide retry policy.
+
+    Arguments:
+        policy (RetryPolicy) - the policy to install; None resets the shared policy
+                so it is rebuilt on next use
+
+    Returns:
+        the previously installed policy (or None)
+    """
+    global _policy
+    with _lock:
+        previous = _policy
+        _policy = policy
+    return previous
+
+
+# rebuilt from the new settings on next use, see settings.reload_settings
+settings.on_reload(lambda new_settings: set_retry_policy(None))
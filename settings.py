@@ -0,0 +1,154 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+settings.py - the parsed collectors.cfg, loaded once per process
+
+Every GithubObject used to parse collectors.cfg and call logging.config.fileConfig
+from its constructor.  fileConfig tears down and rebuilds every handler, so
+materializing thousands of objects reopened the log file thousands of times.
+Instead the configuration is read, and logging configured, once by the
+process-wide Settings returned from get_settings(); objects only copy
+references out of it.  Call reload_settings() after editing collectors.cfg to
+pick up the changes: the process-wide transport, token pool, retry policy,
+identity map and default template profile are rebuilt from the new settings
+on next use, through the hooks registered with on_reload().  Objects built
+before the reload keep the ones they were built with.
+"""
+from configparser import ConfigParser
+import logging
+import logging.config
+import os
+import threading
+
+LOCAL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__)))
+CONFIG_FILE = os.path.join(LOCAL_DIR, 'collectors.cfg')
+ACCEPT = 'application/vnd.github.starfire-preview+json'
+LOGGER_NAME = 'GithubCollector'
+
+_lock = threading.Lock()
+_settings = None
+_reload_hooks = []
+
+
+class Settings(object):
+    """The parsed collectors.cfg and the values derived from it.
+
+    Attributes:
+        config (ConfigParser) - the parsed collectors.cfg
+        api_token (str) - [Github] personal_access_token
+        headers (dict) - the default request headers, authorized with api_token
+        logger (logging.Logger) - the GithubCollector logger
+    """
+
+    def __init__(self, config, path=None):
+        """
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Keyword Arguments:
+            path (str) - the file config was read from; logging is configured from
+                    it by configure_logging()
+        """
+        self.config = config
+        self.path = path
+        self.api_token = config.get('Github', 'personal_access_token', fallback='')
+        self.headers = {'Authorization': 'token %s' % self.api_token,
+                        'Accept' : ACCEPT}
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+    def __repr__(self):
+        return 'Settings(path={!r})'.format(self.path)
+
+    @classmethod
+    def from_file(cls, path=CONFIG_FILE):
+        """Reads collectors.cfg from disk.
+
+        Keyword Arguments:
+            path (str) - the configuration file to read
+
+        Returns:
+            Settings - the parsed settings; logging is not configured yet
+        """
+        config = ConfigParser()
+        config.read(path)
+        return cls(config, path=path)
+
+    def configure_logging(self):
+        """Applies the logging sections of the configuration file.  Skipped when the
+        settings were not read from a file or the file has no logging sections."""
+        if self.path is None or not self.config.has_section('loggers'):
+            return
+        log_file = self.config.get('Github', 'log_file', fallback='github.log')
+        logging.config.fileConfig(self.path,
+                                  defaults={LOGGER_NAME: log_file},
+                                  disable_existing_loggers=False)
+
+
+def get_settings():
+    """Returns the process-wide settings, reading collectors.cfg and configuring
+    logging on first use only.
+
+    Returns:
+        Settings - the shared settings
+    """
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                settings = Settings.from_file()
+                settings.configure_logging()
+                _settings = settings
+    return _settings
+
+
+def set_settings(settings):
+    """Replaces the process-wide settings, i.e. with ones built in a test.
+    Logging is left as it is.
+
+    Arguments:
+        settings (Settings) - the settings to install; None resets the shared
+                settings so collectors.cfg is read again on next use
+
+    Returns:
+        the previously installed settings (or None)
+    """
+    global _settings
+    with _lock:
+        previous = _settings
+        _settings = settings
+    return previous
+
+
+def on_reload(hook):
+    """Registers a callable run each time reload_settings() installs new settings,
+    i.e. to reset a process-wide object built from the old ones.
+
+    Arguments:
+        hook (callable) - called with the new Settings
+
+    Returns:
+        callable - hook, so this can be used as a decorator
+    """
+    with _lock:
+        _reload_hooks.append(hook)
+    return hook
+
+
+def reload_settings(path=CONFIG_FILE):
+    """Re-reads a configuration file, reconfigures logging from it, installs the
+    result as the process-wide settings and runs the on_reload() hooks.
+
+    Keyword Arguments:
+        path (str) - the configuration file to read
+
+    Returns:
+        Settings - the new settings
+    """
+    settings = Settings.from_file(path)
+    settings.configure_logging()
+    set_settings(settings)
+    with _lock:
+        hooks = list(_reload_hooks)
+    for hook in hooks:
+        hook(settings)
+    return settings
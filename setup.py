@@ -26,4 +26,7 @@ if __name__ == "__main__":
             "elasticsearch>=6.3.1",
             "requests>=2.14.0",
         ],
+        extras_require={
+            "async": ["aiohttp>=3.5"],
+        },
     )
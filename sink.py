@@ -0,0 +1,294 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+sink.py - buffered bulk indexing into Elasticsearch
+
+Indexing every page with its own index() call followed by indices.refresh()
+forces Elasticsearch to build a new segment per document.  A BulkSink instead
+buffers documents from every save_* method and sends them as a single NDJSON
+_bulk request once enough documents, bytes or seconds have accumulated; a
+background thread sends documents that have waited max_age even when no more
+arrive.  Requests are sent one at a time, in order, but without holding up
+threads adding documents meanwhile.  When indices are refreshed is chosen
+separately:
+
+    none  - never; Elasticsearch refreshes on its own refresh_interval
+    flush - every bulk request waits for a refresh (refresh=wait_for)
+    end   - every index written to is refreshed once, when the sink is closed
+
+Items Elasticsearch rejects are logged one by one, and a document can carry a
+callback that learns whether it was stored once its bulk request completes,
+which is how the collector checkpoints a cursor only after its page is durable.
+The sink is tuned in the [Elasticsearch] section of collectors.cfg.
+"""
+import json
+import logging
+import threading
+import time
+
+from elasticsearch.exceptions import TransportError
+
+REFRESH_POLICIES = ('none', 'flush', 'end')
+
+
+class BulkSink(object):
+    """Buffers documents and writes them to Elasticsearch with the _bulk api.
+
+    Attributes:
+        indexed (int) - the documents Elasticsearch accepted so far
+        failed (int) - the documents that were rejected or lost to a failed request
+        requests (int) - the _bulk requests sent so far
+    """
+
+    def __init__(self, client, max_docs=500, max_bytes=5 * 1024 * 1024, max_age=5.0,
+                 refresh='end', logger=None, clock=time.monotonic, callback_context=None,
+                 autoflush=True):
+        """
+        Arguments:
+            client (Elasticsearch) - the client bulk requests are sent with
+
+        Keyword Arguments:
+            max_docs (int) - flush once this many documents are buffered
+            max_bytes (int) - flush once the buffered NDJSON reaches this many bytes
+            max_age (float) - flush once the oldest buffered document has waited
+                    this many seconds
+            refresh (str) - the refresh policy, one of 'none', 'flush' or 'end'
+            logger (logging.Logger) - where rejected documents are reported
+            clock (callable) - returns the current time in seconds; replaceable in tests
+            callback_context (callable) - returns a context manager entered around the
+                    on_flush callbacks of each request, i.e. to batch the writes they make
+            autoflush (Boolean) - if True, a background thread flushes documents that
+                    have waited max_age, until the sink is closed
+
+        Raises:
+            ValueError - if refresh is not a known policy
+        """
+        if refresh not in REFRESH_POLICIES:
+            raise ValueError('refresh must be one of {}, not {!r}'.format(REFRESH_POLICIES, refresh))
+        self.client = client
+        self.max_docs = int(max_docs)
+        self.max_bytes = int(max_bytes)
+        self.max_age = float(max_age)
+        self.refresh = refresh
+        self.logger = logger or logging.getLogger('GithubCollector')
+        self.clock = clock
+        self.callback_context = callback_context
+        self.indexed = 0
+        self.failed = 0
+        self.requests = 0
+        self.autoflush = autoflush
+        # guards the buffer; _send_lock keeps requests, and so callbacks, in order
+        self._lock = threading.RLock()
+        self._send_lock = threading.RLock()
+        self._closed = threading.Event()
+        self._flusher = None
+        self._lines = []
+        self._sending = 0
+        self._callbacks = []
+        self._bytes = 0
+        self._oldest = None
+        self._touched = set()
+
+    def __repr__(self):
+        return 'BulkSink(max_docs={}, max_bytes={}, max_age={}, refresh={!r})'.format(
+            self.max_docs, self.max_bytes, self.max_age, self.refresh)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def from_config(cls, client, config, logger=None):
+        """Builds a BulkSink from the [Elasticsearch] section of collectors.cfg.
+
+        Arguments:
+            client (Elasticsearch) - the client bulk requests are sent with
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Keyword Arguments:
+            logger (logging.Logger) - where rejected documents are reported
+
+        Returns:
+            BulkSink - a sink using the configured thresholds and refresh policy
+        """
+        if not config.has_section('Elasticsearch'):
+            return cls(client, logger=logger)
+        section = config['Elasticsearch']
+        return cls(client,
+                   max_docs=section.getint('bulk_docs', 500),
+                   max_bytes=section.getint('bulk_bytes', 5 * 1024 * 1024),
+                   max_age=section.getfloat('bulk_age', 5.0),
+                   refresh=section.get('refresh', 'end'),
+                   logger=logger)
+
+    @property
+    def pending(self):
+        """The number of documents buffered but not yet sent"""
+        return len(self._lines) // 2
+
+    @property
+    def outstanding(self):
+        """The number of documents buffered or in a request that has not completed"""
+        with self._lock:
+            return len(self._lines) // 2 + self._sending
+
+    def add(self, index, doc_type, document, on_flush=None):
+        """Buffers a document, sending the buffer if it is full or too old.
+
+        Arguments:
+            index (str) - the index the document belongs in
+            doc_type (str) - the Elasticsearch doc_type, i.e. GithubFollowers
+            document (dict) - the json document
+
+        Keyword Arguments:
+            on_flush (callable) - called with True once the document has been
+                    indexed, or False if it was rejected or its request failed;
+                    callbacks run in the order their documents were added
+        """
+        action = json.dumps({'index': {'_index': index, '_type': doc_type}})
+        source = json.dumps(document)
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = self.clock()
+            self._callbacks.append(on_flush)
+            self._lines.append(action)
+            self._lines.append(source)
+            self._bytes += len(action) + len(source) + 2
+            self._touched.add(index)
+            full = (self.pending >= self.max_docs or self._bytes >= self.max_bytes
+                    or self.clock() - self._oldest >= self.max_age)
+            if self.autoflush and self._flusher is None and not self._closed.is_set():
+                self._flusher = threading.Thread(target=self._autoflush, name='bulk-autoflush',
+                                                 daemon=True)
+                self._flusher.start()
+        if full:
+            self.flush()
+
+    def flush_stale(self):
+        """Sends the buffered documents if the oldest has waited max_age seconds.
+
+        Returns:
+            boolean - True if nothing was sent or every document was indexed
+        """
+        with self._lock:
+            stale = self._oldest is not None and self.clock() - self._oldest >= self.max_age
+        return self.flush() if stale else True
+
+    def _autoflush(self):
+        """Internal function run by the background thread started by add()"""
+        while not self._closed.wait(max(self.max_age / 2.0, 0.1)):
+            try:
+                self.flush_stale()
+            except Exception as error_msg:
+                self.logger.error('background bulk flush failed: %s', error_msg)
+
+    def flush(self):
+        """Sends every buffered document in a single _bulk request.  Documents may
+        be added by other threads while it is sent.
+
+        Returns:
+            boolean - True if every document was indexed, False otherwise
+        """
+        with self._send_lock:
+            with self._lock:
+                if not self._lines:
+                    return True
+                lines, self._lines = self._lines, []
+                callbacks, self._callbacks = self._callbacks, []
+                self._bytes = 0
+                self._oldest = None
+                self.requests += 1
+                self._sending = len(lines) // 2
+            try:
+                return self._send(lines, callbacks)
+            finally:
+                with self._lock:
+                    self._sending = 0
+
+    def _send(self, lines, callbacks):
+        """Internal function that sends one _bulk request and reports its outcome"""
+        count = len(lines) // 2
+        try:
+            response = self.client.bulk(body='\n'.join(lines) + '\n',
+                                        refresh='wait_for' if self.refresh == 'flush' else 'false')
+        except TransportError as error_msg:
+            with self._lock:
+                self.failed += count
+            self.logger.error('%s triggered while bulk indexing %d documents',
+                              error_msg.error, count)
+            self._notify(callbacks, [False] * count)
+            return False
+        return self._report(response, lines, callbacks)
+
+    def _report(self, response, lines, callbacks):
+        """Internal function that counts and logs the outcome of each bulk item.
+        Documents the response has no item for count as failed."""
+        items = response.get('items', [])[:len(callbacks)]
+        rejected = 0
+        outcomes = [False] * len(callbacks)
+        for position, item in enumerate(items):
+            result = next(iter(item.values()))
+            if result.get('error') is None and result.get('status', 200) < 300:
+                outcomes[position] = True
+                continue
+            rejected += 1
+            self.logger.error('%s:%s:%s rejected with status %s: %s',
+                              result.get('_index'), result.get('_type'),
+                              lines[position * 2 + 1][:200], result.get('status'),
+                              result.get('error'))
+        missing = len(callbacks) - len(items)
+        if missing:
+            self.logger.error('Bulk response is missing %d of %d items', missing, len(callbacks))
+        with self._lock:
+            self.failed += rejected + missing
+            self.indexed += len(items) - rejected
+        self.logger.debug('Bulk request indexed %d documents, %d rejected',
+                          len(items) - rejected, rejected)
+        self._notify(callbacks, outcomes)
+        return rejected == 0 and missing == 0
+
+    def _notify(self, callbacks, outcomes):
+        """Internal function that tells each document's callback whether it was stored"""
+        if not any(callbacks):
+            return
+        if self.callback_context is None:
+            self._run_callbacks(callbacks, outcomes)
+            return
+        try:
+            with self.callback_context():
+                self._run_callbacks(callbacks, outcomes)
+        except Exception as error_msg:
+            self.logger.error('flush callbacks failed: %s', error_msg)
+
+    def _run_callbacks(self, callbacks, outcomes):
+        """Internal function that runs each callback, logging any that fail"""
+        for callback, stored in zip(callbacks, outcomes):
+            if callback is None:
+                continue
+            try:
+                callback(stored)
+            except Exception as error_msg:
+                self.logger.error('flush callback %r failed: %s', callback, error_msg)
+
+    def close(self):
+        """Sends any buffered documents, stops the background flush and, under the
+        'end' policy, refreshes every index written to.
+
+        Returns:
+            boolean - True if every document was indexed, False otherwise
+        """
+        self._closed.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        with self._send_lock:
+            succeeded = self.flush()
+            if self.refresh == 'end' and self._touched:
+                try:
+                    self.client.indices.refresh(index=','.join(sorted(self._touched)))
+                except TransportError as error_msg:
+                    self.logger.error('%s triggered while refreshing %s',
+                                      error_msg.error, sorted(self._touched))
+                self._touched = set()
+            return succeeded
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+state.py - where crawl cursors are kept between runs
+
+The collector reads and writes cursors through a CursorStore.  The backend is
+chosen with [State] backend in collectors.cfg:
+
+    redis  - RedisCursorStore, shared by every collector pointed at the server
+    sqlite - SQLiteCursorStore, a local database file in WAL mode for single
+             node batch boxes that do not run redis
+    memory - MemoryCursorStore, kept for the life of the process only
+
+A RedisCursorStore keeps all of a login's cursors in a single hash, gh:<login>,
+with one <connection>:endCursor field per connection:
+
+    * the whole hash is read with one HGETALL and cached, and preload() reads
+      the hashes of a whole batch of logins in one pipelined round trip,
+    * writes made inside a pipeline() block, i.e. every checkpoint of one bulk
+      flush, are sent together as one pipelined round trip of HSETs.
+
+Cursors stored under the old per-connection keys are moved into the hash the
+first time a login is read; the old keys are read in the same pipelined round
+trip as the hash.  A SQLiteCursorStore batches its writes into one
+transaction per pipeline() block or per commit_every writes.
+"""
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+FIELD = '%s:endCursor'
+
+
+def _decode(value):
+    """Internal function that converts a redis reply to str"""
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class CursorStore(object, metaclass=ABCMeta):
+    """Base class for a store of the cursors each connection's crawl reached"""
+
+    @classmethod
+    def from_config(cls, config, connections=()):
+        """Builds the store selected in the [State] section of collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Keyword Arguments:
+            connections (iterable) - connection names whose cursors may still be
+                    stored under the old redis keys
+
+        Returns:
+            CursorStore - a RedisCursorStore, SQLiteCursorStore or MemoryCursorStore
+
+        Raises:
+            ValueError - if the backend is unknown
+            ImportError - if the redis backend is selected without redis installed
+        """
+        section = config['State'] if config.has_section('State') else {}
+        backend = section.get('backend', 'redis')
+        if backend == 'memory':
+            return MemoryCursorStore()
+        if backend == 'sqlite':
+            return SQLiteCursorStore(section.get('path', 'crawl_state.sqlite3'),
+                                     commit_every=int(section.get('commit_every', 100)),
+                                     commit_interval=float(section.get('commit_interval', 5)))
+        if backend == 'redis':
+            if redis is None:
+                raise ImportError('the redis backend requires the redis package')
+            client = redis.Redis(host=section.get('host', '127.0.0.1'),
+                                 port=int(section.get('port', 6379)),
+                                 db=int(section.get('db', 0)),
+                                 password=section.get('password') or None)
+            return RedisCursorStore(client, connections=connections)
+        raise ValueError('Unknown [State] backend {!r}'.format(backend))
+
+    def preload(self, logins):
+        """Reads the cursors of many logins at once, i.e. before crawling them.
+        Stores whose reads are cheap do nothing.
+
+        Arguments:
+            logins (iterable) - the logins about to be crawled
+        """
+        pass
+
+    @abstractmethod
+    def get(self, login, connection):
+        """Returns the cursor a connection's last crawl stored, or None.
+
+        Arguments:
+            login (str) - the login that was crawled
+            connection (str) - the connection that was crawled, i.e. 'followers'
+        """
+        pass
+
+    @abstractmethod
+    def set(self, login, connection, cursor):
+        """Stores the cursor a connection's crawl reached.
+
+        Arguments:
+            login (str) - the login being crawled
+            connection (str) - the connection being crawled, i.e. 'followers'
+            cursor (str) - the endCursor of the last page stored
+        """
+        pass
+
+    @contextmanager
+    def pipeline(self):
+        """Groups the writes made inside the block so they are stored together"""
+        yield
+
+    def forget(self, login):
+        """Drops anything cached for a login, i.e. once it has been crawled"""
+        pass
+
+    def close(self):
+        """Stores any pending writes and releases the store's resources"""
+        pass
+
+
+class MemoryCursorStore(CursorStore):
+    """Keeps cursors in a dict for the life of the process"""
+
+    def __init__(self):
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'MemoryCursorStore()'
+
+    def get(self, login, connection):
+        with self._lock:
+            return self._cursors.get((login, connection))
+
+    def set(self, login, connection, cursor):
+        with self._lock:
+            self._cursors[(login, connection)] = cursor
+
+
+class SQLiteCursorStore(CursorStore):
+    """Keeps cursors in a local SQLite database in WAL mode.  Writes are committed
+    in batches: at the end of each pipeline() block, or once commit_every writes
+    or commit_interval seconds have accumulated outside of one."""
+
+    def __init__(self, path, commit_every=100, commit_interval=5.0, clock=time.monotonic):
+        """
+        Arguments:
+            path (str) - the database file, created if it does not exist
+
+        Keyword Arguments:
+            commit_every (int) - commit after this many writes
+            commit_interval (float) - commit when a write is made this many seconds
+                    after the last commit
+            clock (callable) - returns the current time in seconds; replaceable in tests
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._uncommitted = 0
+        self._committed_at = clock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS cursors (login TEXT NOT NULL, '
+                         'connection TEXT NOT NULL, cursor TEXT NOT NULL, '
+                         'PRIMARY KEY (login, connection)) WITHOUT ROWID')
+        self._db.commit()
+
+    def __repr__(self):
+        return 'SQLiteCursorStore(path={!r})'.format(self.path)
+
+    def get(self, login, connection):
+        with self._lock:
+            row = self._db.execute('SELECT cursor FROM cursors WHERE login = ? AND connection = ?',
+                                   (login, connection)).fetchone()
+        return row[0] if row else None
+
+    def set(self, login, connection, cursor):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO cursors (login, connection, cursor) '
+                             'VALUES (?, ?, ?)', (login, connection, cursor))
+            self._uncommitted += 1
+            if self._depth == 0 and (self._uncommitted >= self.commit_every or
+                                     self.clock() - self._committed_at >= self.commit_interval):
+                self._commit()
+
+    @contextmanager
+    def pipeline(self):
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
+
+    def _commit(self):
+        """Internal function that commits the pending writes"""
+        if self._uncommitted:
+            self._db.commit()
+            self._uncommitted = 0
+        self._committed_at = self.clock()
+
+
+class RedisCursorStore(CursorStore):
+    """Keeps every cursor of a login in one redis hash.
+
+    Attributes:
+        client (redis.Redis) - the redis connection
+        connections (tuple) - the connection names whose old per-connection keys
+                are migrated into the hash
+    """
+
+    def __init__(self, client, connections=(), max_cached=10000):
+        """
+        Arguments:
+            client (redis.Redis) - the redis connection
+
+        Keyword Arguments:
+            connections (iterable) - connection names whose cursors may still be
+                    stored under the old gh:<login>:<connection>:endCursor keys
+            max_cached (int) - the number of logins whose cursors are kept in memory
+        """
+        self.client = client
+        self.connections = tuple(connections)
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __repr__(self):
+        return 'RedisCursorStore(client={!r})'.format(self.client)
+
+    @staticmethod
+    def key(login):
+        """Returns the hash holding a login's cursors, i.e. gh:octocat"""
+        return 'gh:%s' % login
+
+    def preload(self, logins):
+        """Reads the cursors of many logins in a single pipelined round trip.
+
+        Arguments:
+            logins (iterable) - the logins about to be crawled
+        """
+        logins = [login for login in logins if not self._cached(login)]
+        if logins:
+            self._read(logins)
+
+    def get(self, login, connection):
+        """Returns the cursor a connection's last crawl stored, or None.
+
+        Arguments:
+            login (str) - the login that was crawled
+            connection (str) - the connection that was crawled, i.e. 'followers'
+        """
+        with self._lock:
+            cursors = self._cache.get(login)
+            if cursors is not None:
+                self._cache.move_to_end(login)
+        if cursors is None:
+            cursors = self._read([login])[0]
+        return cursors.get(connection)
+
+    def set(self, login, connection, cursor):
+        """Stores the cursor a connection's crawl reached.  Inside a pipeline()
+        block the write is sent when the block ends, otherwise immediately.
+
+        Arguments:
+            login (str) - the login being crawled
+            connection (str) - the connection being crawled, i.e. 'followers'
+            cursor (str) - the endCursor of the last page stored
+        """
+        with self._lock:
+            if login in self._cache:
+                self._cache[login][connection] = cursor
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append((login, connection, cursor))
+        else:
+            self.client.hset(self.key(login), FIELD % connection, cursor)
+
+    @contextmanager
+    def pipeline(self):
+        """Collects the writes made by this thread inside the block and sends
+        them in one pipelined round trip when it ends.  Blocks may be nested."""
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+        self._local.pending = []
+        try:
+            yield
+        finally:
+            pending, self._local.pending = self._local.pending, None
+            if pending:
+                pipeline = self.client.pipeline(transaction=False)
+                for login, connection, cursor in pending:
+                    pipeline.hset(self.key(login), FIELD % connection, cursor)
+                pipeline.execute()
+
+    def forget(self, login):
+        """Drops a login's cursors from memory, i.e. once it has been crawled"""
+        with self._lock:
+            self._cache.pop(login, None)
+
+    def _cached(self, login):
+        with self._lock:
+            return login in self._cache
+
+    def _read(self, logins):
+        """Internal function that reads and caches the hashes of logins, together
+        with their old per-connection keys, in one pipelined round trip.  Logins
+        whose hash is empty have their old keys migrated in a second one.
+
+        Returns:
+            list - the cursors of each login, in order
+        """
+        pipeline = self.client.pipeline(transaction=False)
+        for login in logins:
+            pipeline.hgetall(self.key(login))
+            if self.connections:
+                pipeline.mget(self._legacy(login))
+        replies = iter(pipeline.execute())
+        read = []
+        migrate = self.client.pipeline(transaction=False)
+        migrating = False
+        for login in logins:
+            cursors = {}
+            for field, value in (next(replies) or {}).items():
+                field = _decode(field)
+                if field.endswith(':endCursor'):
+                    cursors[field[:-len(':endCursor')]] = _decode(value)
+            legacy = next(replies) if self.connections else ()
+            if not cursors:
+                cursors = dict((connection, _decode(value))
+                               for connection, value in zip(self.connections, legacy) if value)
+                if cursors:
+                    migrating = True
+                    migrate.hmset(self.key(login), dict((FIELD % connection, cursor)
+                                                        for connection, cursor in cursors.items()))
+                    migrate.delete(*self._legacy(login))
+            read.append(self._remember(login, cursors))
+        if migrating:
+            migrate.execute()
+        return read
+
+    def _legacy(self, login):
+        """Internal function that returns the old per-connection keys of a login"""
+        return ['gh:%s:%s:endCursor' % (login, connection) for connection in self.connections]
+
+    def _remember(self, login, cursors):
+        """Internal function that caches a login's cursors"""
+        with self._lock:
+            self._cache[login] = cursors
+            self._cache.move_to_end(login)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return cursors
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+templates.py - a load-once registry of the GraphQL query templates
+
+Every file under graphql/ is read from disk at most once per process, checked
+for well-formed placeholders and balanced braces, and kept as a pre-parsed
+Template.  Templates are keyed by the class they belong to (the name of the
+sub-directory they live in, i.e. 'User') and by either their file name without
+the extension ('user_followers') or the connection they implement ('followers').
+
+Setting preload = True in the [Templates] section of collectors.cfg loads every
+template the first time one is requested, so later queries never wait on disk.
+
+Templates are also kept per field profile, see profiles.py: the template for a
+profile is generated from the one on disk the first time it is requested, with
+the fields the profile leaves out cut out of it.  The profile used when none is
+given is set with profile = in the [Templates] section.  Both are read from the
+process-wide settings (see settings.py) and read again by reload_settings().
+"""
+import os
+import re
+import threading
+
+import profiles
+import settings
+
+LOCAL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__)))
+GRAPHQL_DIR = os.path.join(LOCAL_DIR, 'graphql')
+
+_PLACEHOLDER = re.compile(r'%(.)')
+
+
+class TemplateError(ValueError):
+    """Raised when a template is missing, malformed or rendered with the wrong arguments"""
+    pass
+
+
+class Template(object):
+    """A pre-parsed GraphQL query template.
+
+    Attributes:
+        name (str) - the file name of the template without its extension
+        text (str) - the raw template text
+        placeholders (int) - the number of %s placeholders in the template
+        root (str) - the root field of the query including its arguments,
+                i.e. 'user(login: "%s")'
+        root_field (str) - the name of the root field, i.e. 'user'
+        selection (str) - everything selected under the root field
+    """
+
+    def __init__(self, name, text):
+        """
+        Arguments:
+            name (str) - the name of the template
+            text (str) - the template text, using %s for each placeholder
+
+        Raises:
+            TemplateError - if the placeholders or braces are malformed
+        """
+        self.name = name
+        self.text = text
+        self.placeholders = self._count_placeholders(name, text)
+        self.root, self.selection = self._split_root(name, text)
+        self.root_field = self.root.split('(', 1)[0].strip()
+
+    def __repr__(self):
+        return 'Template(name={!r}, placeholders={!r})'.format(self.name, self.placeholders)
+
+    @staticmethod
+    def _count_placeholders(name, text):
+        """Counts the %s placeholders in a template, rejecting any other % directive"""
+        count = 0
+        for match in _PLACEHOLDER.finditer(text):
+            if match.group(1) == 's':
+                count += 1
+            elif match.group(1) != '%':
+                raise TemplateError("{}: unsupported placeholder '%{}'".format(name, match.group(1)))
+        return count
+
+    @staticmethod
+    def _split_root(name, text):
+        """Splits a template into its root field and the selection beneath it.
+
+        Returns:
+            tuple - (root, selection); both are empty strings for templates that
+                    select more than one root field
+        """
+        depth = 0
+        in_string = False
+        operation_start = root_start = None
+        for index, char in enumerate(text):
+            if char == '"':
+                in_string = not in_string
+            elif in_string:
+                continue
+            elif char == '{':
+                depth += 1
+                if depth == 1:
+                    operation_start = index + 1
+                elif depth == 2:
+                    root_start = index + 1
+            elif char == '}':
+                depth -= 1
+                if depth < 0:
+                    break
+                if depth == 1 and root_start is not None:
+                    root = text[operation_start:root_start - 1].strip()
+                    return root, text[root_start:index]
+        if depth != 0 or in_string:
+            raise TemplateError('{}: unbalanced braces or quotes'.format(name))
+        return '', ''
+
+    def render(self, *args):
+        """Fills in the template's placeholders.
+
+        Arguments:
+            args - one value per placeholder, in order
+
+        Returns:
+            str - the GraphQL query
+
+        Raises:
+            TemplateError - if the wrong number of arguments is given
+        """
+        if len(args) != self.placeholders:
+            raise TemplateError('{} takes {} argument(s), {} given'
+                                .format(self.name, self.placeholders, len(args)))
+        return self.text % args
+
+    def query(self, *args):
+        """Renders the template as a json payload ready to post, i.e. {"query": "..."}"""
+        return {"query" : self.render(*args)}
+
+    def render_root(self, *args):
+        """Fills in the placeholders of the root field only, i.e. 'user(login: "octocat")'"""
+        return self.root % args
+
+    def render_selection(self, field, alias, *args):
+        """Fills in the placeholders of the selection under the root field and
+        aliases a field within it, so the selection can be merged with others
+        into a single document.
+
+        Arguments:
+            field (str) - the field to alias, i.e. 'followers'
+            alias (str) - the alias the field is returned under
+            args - one value per placeholder in the selection, in order
+
+        Returns:
+            str - the rendered selection
+
+        Raises:
+            TemplateError - if the field is not selected or the wrong number of
+                    arguments is given
+        """
+        expected = self.placeholders - self.root.count('%s')
+        if len(args) != expected:
+            raise TemplateError('{} selection takes {} argument(s), {} given'
+                                .format(self.name, expected, len(args)))
+        match = re.search(r'(?<![\w:])%s\s*\(' % re.escape(field), self.selection)
+        if match is None:
+            raise TemplateError('{} does not select {!r}'.format(self.name, field))
+        selection = ''.join([self.selection[:match.start()], alias, ': ',
+                             self.selection[match.start():]])
+        return selection % args
+
+
+class TemplateRegistry(object):
+    """Loads, validates and caches every GraphQL template under a directory."""
+
+    def __init__(self, directory=GRAPHQL_DIR, profile=None):
+        """
+        Arguments:
+            directory (str) - the directory holding one sub-directory of templates
+                    per class
+            profile (str) - the field profile used when none is requested, see
+                    profiles.py; None for the [Templates] profile of the
+                    process-wide settings, read on first use
+        """
+        self.directory = directory
+        self._profile = profiles.check(profile) if profile is not None else None
+        self._templates = {}
+        self._projections = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TemplateRegistry(directory={!r}, profile={!r})'.format(self.directory, self._profile)
+
+    @property
+    def profile(self):
+        """The field profile used when none is requested"""
+        if self._profile is None:
+            self.configure(settings.get_settings().config)
+        return self._profile
+
+    def configure(self, config):
+        """Applies the [Templates] section of collectors.cfg: sets the default
+        profile, and loads every template if preload is set.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Raises:
+            ValueError - if the profile is unknown
+        """
+        section = config['Templates'] if config.has_section('Templates') else None
+        profile = section.get('profile') if section is not None else None
+        if section is not None and section.getboolean('preload', False):
+            self.load()
+        self._profile = profiles.check(profile or profiles.DEFAULT_PROFILE)
+
+    def __len__(self):
+        return len(set(id(template) for template in self._templates.values()))
+
+    @staticmethod
+    def _connection_name(class_name, name):
+        """Derives the connection name a template implements from its file name,
+        i.e. ('User', 'user_commit_comments') -> 'commitComments'"""
+        prefix = ''.join([class_name.lower(), '_']) if class_name else ''
+        if not prefix or not name.startswith(prefix):
+            return name
+        head, *tail = name[len(prefix):].split('_')
+        return ''.join([head] + [part[:1].upper() + part[1:] for part in tail])
+
+    def _register(self, class_name, name, template):
+        """Indexes a template by its file name and by its connection name"""
+        self._templates[(class_name, name)] = template
+        self._templates.setdefault((class_name, self._connection_name(class_name, name)), template)
+
+    def _read(self, class_name, name):
+        """Reads and parses a single template file"""
+        parts = [self.directory, class_name, ''.join([name, '.graphql'])]
+        path = os.path.join(*[part for part in parts if part])
+        try:
+            with open(path, 'r') as template_file:
+                return Template(name, template_file.read())
+        except (IOError, OSError):
+            raise TemplateError('No template {!r} for {!r} at {}'.format(name, class_name, path))
+
+    def load(self):
+        """Eagerly loads and validates every template under the directory.
+
+        Returns:
+            int - the number of templates loaded
+        """
+        with self._lock:
+            for root, _, files in os.walk(self.directory):
+                class_name = os.path.relpath(root, self.directory)
+                class_name = None if class_name == os.curdir else class_name
+                for filename in sorted(files):
+                    name, extension = os.path.splitext(filename)
+                    if extension == '.graphql' and (class_name, name) not in self._templates:
+                        self._register(class_name, name, self._read(class_name, name))
+            self._loaded = True
+        return len(self)
+
+    def get(self, class_name, name, profile=None):
+        """Returns a template, loading it from disk the first time it is requested.
+
+        Arguments:
+            class_name (str) - the class the template belongs to, i.e. 'User';
+                    None for templates at the top of the directory
+            name (str) - the template's file name without its extension, or the
+                    name of the connection it implements
+
+        Keyword Arguments:
+            profile (str) - the field profile the template is projected to, see
+                    profiles.py; defaults to the registry's profile
+
+        Returns:
+            Template - the parsed template
+
+        Raises:
+            TemplateError - if no such template or profile exists, or the
+                    template is malformed
+        """
+        template = self._get(class_name, name)
+        profile = profile or self.profile
+        if profile == 'full':
+            return template
+        try:
+            return self._projections[(class_name, template.name, profile)]
+        except KeyError:
+            pass
+        try:
+            text = profiles.project(template.text, profiles.excluded(profile))
+        except ValueError as error_msg:
+            raise TemplateError('{} ({} profile): {}'.format(template.name, profile, error_msg))
+        if re.search(r'{\s*}', text):
+            raise TemplateError('{}: the {} profile leaves a selection empty'
+                                .format(template.name, profile))
+        return self._projections.setdefault((class_name, template.name, profile),
+                                            Template(template.name, text))
+
+    def _get(self, class_name, name):
+        """Internal function that returns a template as it is on disk"""
+        try:
+            return self._templates[(class_name, name)]
+        except KeyError:
+            pass
+        with self._lock:
+            if (class_name, name) not in self._templates:
+                try:
+                    self._register(class_name, name, self._read(class_name, name))
+                except TemplateError:
+                    if self._loaded:
+                        raise
+        if (class_name, name) not in self._templates:
+            # a connection name rather than a file name; index the whole directory
+            self.load()
+        try:
+            return self._templates[(class_name, name)]
+        except KeyError:
+            raise TemplateError('No template {!r} for {!r}'.format(name, class_name))
+
+    def render(self, class_name, name, *args, profile=None):
+        """Shortcut for get(class_name, name, profile).render(*args)"""
+        return self.get(class_name, name, profile).render(*args)
+
+
+TEMPLATES = TemplateRegistry()
+
+settings.on_reload(lambda new_settings: TEMPLATES.configure(new_settings.config))
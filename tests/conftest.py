@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures.  The modules import each other by their top-level names, so
+the package directory is put on sys.path the same way collector.py expects.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+import identity  # noqa: E402
+import ratelimit  # noqa: E402
+import retry  # noqa: E402
+import settings  # noqa: E402
+import transport  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_singletons():
+    """Gives every test its own process-wide settings, transport, token pool,
+    retry policy and identity map.  The settings come from collectors.cfg but leave logging
+    unconfigured so the suite never writes to the configured log_file, and the
+    retry policy retries without sleeping."""
+    previous_settings = settings.set_settings(settings.Settings.from_file())
+    previous_transport = transport.set_transport(None)
+    previous_pool = ratelimit.set_token_pool(
+        ratelimit.TokenPool(['test-token'], lambda: ratelimit.RateLimiter(inject=False)))
+    previous_policy = retry.set_retry_policy(retry.RetryPolicy(sleep=lambda seconds: None))
+    previous_identities = identity.set_identity_map(identity.IdentityMap())
+    yield
+    settings.set_settings(previous_settings)
+    transport.set_transport(previous_transport)
+    ratelimit.set_token_pool(previous_pool)
+    retry.set_retry_policy(previous_policy)
+    identity.set_identity_map(previous_identities)
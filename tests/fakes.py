@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-ins for the redis client, holding data in dicts and replying
+with bytes the way redis-py does.  Each command sent outside a pipeline, and
+each pipeline execute(), counts as one round trip.  transaction() watches keys
+like redis WATCH: a pipeline whose watched keys were written by anyone else
+before it executes is run again.  FakeEndpoint stands in for the GraphQL
+endpoint behind a transport.
+"""
+import json
+import re
+import threading
+
+
+def _encode(value):
+    return value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+
+# commands that write to the keys they are given, and how many of their leading
+# arguments are keys
+_WRITES = {'set': 1, 'delete': 1, 'hset': 1, 'hmset': 1, 'hdel': 1, 'hincrby': 1, 'sadd': 1,
+           'rpush': 1, 'lpush': 1, 'rpoplpush': 2, 'lrem': 1, 'zadd': 1, 'zrem': 1}
+
+
+class WatchError(Exception):
+    pass
+
+
+class FakePipeline(object):
+    def __init__(self, redis, watches=()):
+        self.redis = redis
+        self.commands = []
+        # while watching, commands run at once until multi() starts queuing them
+        self.watched = dict((key, redis.versions.get(key, 0)) for key in watches)
+        self.queuing = not watches
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            if not self.queuing:
+                return getattr(self.redis, name)(*args, **kwargs)
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def multi(self):
+        self.queuing = True
+
+    def execute(self):
+        with self.redis.lock:
+            self.redis.round_trips += 1
+            if any(self.redis.versions.get(key, 0) != version
+                   for key, version in self.watched.items()):
+                raise WatchError()
+            results = []
+            for name, args, kwargs in self.commands:
+                results.append(self.redis._run(name, *args, **kwargs))
+            self.commands = []
+            return results
+
+
+class FakeRedis(object):
+    def __init__(self):
+        self.strings = {}
+        self.hashes = {}
+        self.sets = {}
+        self.lists = {}
+        self.sorted_sets = {}
+        self.round_trips = 0
+        # writes per key, so a transaction can tell whether its watched keys changed
+        self.versions = {}
+        self.lock = threading.RLock()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        while True:
+            pipeline = FakePipeline(self, watches)
+            value = func(pipeline)
+            try:
+                results = pipeline.execute()
+            except WatchError:
+                continue
+            return value if value_from_callable else results
+
+    def __getattr__(self, name):
+        if not hasattr(self, '_' + name):
+            raise AttributeError(name)
+
+        def send(*args, **kwargs):
+            with self.lock:
+                self.round_trips += 1
+                return self._run(name, *args, **kwargs)
+        return send
+
+    def _run(self, name, *args, **kwargs):
+        for key in args[:_WRITES.get(name, 0)]:
+            self.versions[key] = self.versions.get(key, 0) + 1
+        return getattr(self, '_' + name)(*args, **kwargs)
+
+    def _get(self, key):
+        return self.strings.get(key)
+
+    def _set(self, key, value):
+        self.strings[key] = _encode(value)
+        return True
+
+    def _mget(self, keys):
+        return [self.strings.get(key) for key in keys]
+
+    def _delete(self, *keys):
+        return sum(1 for key in keys if self.strings.pop(key, None) is not None)
+
+    def _hgetall(self, key):
+        return dict((_encode(field), value) for field, value in self.hashes.get(key, {}).items())
+
+    def _hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = _encode(value)
+        return 1
+
+    def _hmset(self, key, mapping):
+        for field, value in mapping.items():
+            self._hset(key, field, value)
+        return True
+
+    def _hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def _hdel(self, key, *fields):
+        return sum(1 for field in fields if self.hashes.get(key, {}).pop(field, None) is not None)
+
+    def _hincrby(self, key, field, amount=1):
+        value = int(self.hashes.get(key, {}).get(field, 0)) + amount
+        self._hset(key, field, value)
+        return value
+
+    def _sadd(self, key, *members):
+        members = [_encode(member) for member in members]
+        found = self.sets.setdefault(key, set())
+        added = sum(1 for member in members if member not in found)
+        found.update(members)
+        return added
+
+    def _sismember(self, key, member):
+        return _encode(member) in self.sets.get(key, set())
+
+    def _scard(self, key):
+        return len(self.sets.get(key, set()))
+
+    def _rpush(self, key, *values):
+        found = self.lists.setdefault(key, [])
+        found.extend(_encode(value) for value in values)
+        return len(found)
+
+    def _lpush(self, key, *values):
+        found = self.lists.setdefault(key, [])
+        for value in values:
+            found.insert(0, _encode(value))
+        return len(found)
+
+    def _rpoplpush(self, source, destination):
+        if not self.lists.get(source):
+            return None
+        value = self.lists[source].pop()
+        self.lists.setdefault(destination, []).insert(0, value)
+        return value
+
+    def _lrange(self, key, start, end):
+        values = self.lists.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def _lrem(self, key, count, value):
+        values = self.lists.get(key, [])
+        kept = [item for item in values if item != _encode(value)]
+        self.lists[key] = kept
+        return len(values) - len(kept)
+
+    def _llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def _zadd(self, key, mapping, nx=False, xx=False):
+        scores = self.sorted_sets.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            member = _encode(member)
+            if (nx and member in scores) or (xx and member not in scores):
+                continue
+            added += member not in scores
+            scores[member] = float(score)
+        return added
+
+    def _zrem(self, key, *members):
+        scores = self.sorted_sets.get(key, {})
+        return sum(1 for member in members if scores.pop(_encode(member), None) is not None)
+
+    def _zscore(self, key, member):
+        return self.sorted_sets.get(key, {}).get(_encode(member))
+
+    def _zcard(self, key):
+        return len(self.sorted_sets.get(key, {}))
+
+    def _zrangebyscore(self, key, low, high):
+        low = float(low)
+        high = float(high)
+        members = sorted(self.sorted_sets.get(key, {}).items(), key=lambda item: item[1])
+        return [member for member, score in members if low <= score <= high]
+
+
+_ROOT = re.compile(r'(?:(r\d+): )?(user|organization|repository)\(([^)]*)\)')
+
+
+class FakeEndpoint(object):
+    """Answers each root field, aliased or not, unless its arguments name a
+    missing login; users have no issues so Issues falls back to organizations"""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def post(self, query, headers=None):
+        with self.lock:
+            self.queries.append(query['query'])
+        data, errors = {}, []
+        for alias, field, arguments in _ROOT.findall(query['query'].split('{', 1)[1]):
+            values = re.findall(r'"([^"]*)"', arguments)
+            key = alias or field
+            if key in data:
+                continue
+            if set(values) & self.missing or ('issues(' in query['query'] and field == 'user'):
+                data[key] = None
+                errors.append({'path': [key], 'message': 'Could not resolve'})
+            elif field == 'repository':
+                data[key] = {'name': values[1], 'owner': {'login': values[0]}}
+            else:
+                data[key] = {'login': values[0], 'url': 'https://github.com/' + values[0],
+                             'issues': {'totalCount': 1}}
+        return type('Response', (object,), {'text': json.dumps({'data': data, 'errors': errors}
+                                                               if errors else {'data': data}),
+                                            'headers': {}})()
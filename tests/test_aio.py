@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import re
+
+import pytest
+
+import aio
+
+
+def _login(query):
+    return re.search(r'login: "([^"]+)"', query['query']).group(1)
+
+
+class StubTransport(object):
+    """An async transport that answers every user query after a short delay and
+    records the most posts it ever had in flight at once."""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.posts = 0
+
+    async def post(self, query, headers=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        self.posts += 1
+        try:
+            await asyncio.sleep(self.delay)
+            return json.dumps({'data': {'user': {'login': _login(query)}}}), {}
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def stub_transport():
+    stub = StubTransport()
+    previous = aio.set_async_transport(stub)
+    yield stub
+    aio.set_async_transport(previous)
+
+
+def test_gather_bounded_limits_requests_in_flight(stub_transport):
+    logins = ['user%d' % index for index in range(20)]
+
+    users = asyncio.run(aio.gather_bounded([aio.AsyncUser.fetch(login) for login in logins], 5))
+
+    assert [user.login for user in users] == logins
+    assert stub_transport.posts == 20
+    assert stub_transport.peak == 5
+
+
+def test_gather_bounded_returns_exceptions_in_place():
+    async def fail():
+        raise ValueError('boom')
+
+    async def succeed():
+        return 'ok'
+
+    results = asyncio.run(aio.gather_bounded([succeed(), fail(), succeed()], 2))
+
+    assert results[0] == results[2] == 'ok'
+    assert isinstance(results[1], ValueError)
+
+
+def test_async_repositories_pages_with_async_for():
+    pages = {None: ('c1', True, ['one', 'two']), 'c1': ('c2', False, ['three'])}
+
+    class PagingTransport(object):
+        async def post(self, query, headers=None):
+            match = re.search(r'after: "([^"]+)"', query['query'])
+            end_cursor, has_next_page, names = pages[match.group(1) if match else None]
+            return json.dumps({'data': {'user': {'repositories': {
+                'totalCount': 3,
+                'nodes': [{'name': name} for name in names],
+                'pageInfo': {'startCursor': None, 'endCursor': end_cursor,
+                             'hasNextPage': has_next_page, 'hasPreviousPage': False}}}}}), {}
+
+    async def collect():
+        names = []
+        async for page in aio.AsyncRepositories('octocat'):
+            names.extend(node['name'] for node in page.nodes)
+        return names
+
+    previous = aio.set_async_transport(PagingTransport())
+    try:
+        assert asyncio.run(collect()) == ['one', 'two', 'three']
+    finally:
+        aio.set_async_transport(previous)
+
+
+def test_concurrency_against_a_local_graphql_server():
+    web = pytest.importorskip('aiohttp.web')
+    state = {'in_flight': 0, 'peak': 0}
+
+    async def graphql(request):
+        query = await request.json()
+        state['in_flight'] += 1
+        state['peak'] = max(state['peak'], state['in_flight'])
+        try:
+            await asyncio.sleep(0.01)
+            return web.json_response({'data': {'user': {'login': _login(query)}}})
+        finally:
+            state['in_flight'] -= 1
+
+    async def crawl(logins):
+        app = web.Application()
+        app.router.add_post('/graphql', graphql)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        transport = aio.AsyncTransport('http://127.0.0.1:%d/graphql' % port, pool_maxsize=10)
+        previous = aio.set_async_transport(transport)
+        try:
+            return await aio.gather_bounded([aio.AsyncUser.fetch(login) for login in logins], 8)
+        finally:
+            aio.set_async_transport(previous)
+            await transport.close()
+            await runner.cleanup()
+
+    logins = ['user%d' % index for index in range(40)]
+    users = asyncio.run(crawl(logins))
+
+    assert [user.login for user in users] == logins
+    assert 1 < state['peak'] <= 8
+
+
+def test_repositories_page_size_is_not_duplicated():
+    default = aio.AsyncRepositories('octocat')
+    custom = aio.AsyncRepositories('octocat', first=50)
+
+    assert default.filters == 'first: 100,'
+    assert custom.filters == 'first: 50,'
+    query = aio.TEMPLATES.render('Repositories', 'gh_repositories_by_user', 'octocat', custom.filters)
+    assert query.count('first') == 1
+
+
+def test_async_client_honours_retry_after_headers():
+    class RefusingTransport(object):
+        def __init__(self):
+            self.posts = 0
+
+        async def post(self, query, headers=None):
+            self.posts += 1
+            if self.posts == 1:
+                return json.dumps({'message': 'abuse detection'}), {'Retry-After': '0.01'}
+            return json.dumps({'data': {'user': {'login': _login(query)}}}), {}
+
+    refusing = RefusingTransport()
+    previous = aio.set_async_transport(refusing)
+    try:
+        user = asyncio.run(aio.AsyncUser.fetch('octocat'))
+    finally:
+        aio.set_async_transport(previous)
+
+    assert user.login == 'octocat'
+    assert refusing.posts == 2
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+from configparser import ConfigParser
+
+import pytest
+
+from elasticsearch.exceptions import ConnectionError
+
+import collector
+import mappings
+import transport
+from journal import Journal
+from fakes import FakeEndpoint, FakeRedis
+from pagesize import PageSizeController
+from pagination import CONNECTIONS
+from state import MemoryCursorStore, RedisCursorStore, SQLiteCursorStore
+from User import User
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+
+class FakeIndices(object):
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.calls = []
+        self.templates = {}
+
+    def exists(self, index):
+        self.calls.append(('exists', index))
+        return index in self.existing
+
+    def create(self, index):
+        self.calls.append(('create', index))
+        self.existing.add(index)
+
+    def put_template(self, name, body):
+        self.calls.append(('put_template', name))
+        self.templates[name] = body
+
+    def refresh(self, index):
+        self.calls.append(('refresh', index))
+
+
+class FakeElasticsearch(object):
+    def __init__(self, existing=()):
+        self.indices = FakeIndices(existing)
+        self.bodies = []
+        self.fail = False
+
+    def bulk(self, body, refresh='false'):
+        if self.fail:
+            raise ConnectionError('N/A', 'connection refused', None)
+        self.bodies.append(body)
+        return {'errors': False, 'items': [{'index': {'status': 201}}
+                                           for _ in range(body.count('\n') // 2)]}
+
+
+@pytest.fixture
+def github_collector(monkeypatch):
+    monkeypatch.chdir(PACKAGE_DIR)
+    instance = collector.GithubCollector()
+    instance.elasticsearch = FakeElasticsearch(existing=['gh_followers-2019-05-01'])
+    instance.sink.client = instance.elasticsearch
+    instance.state = RedisCursorStore(FakeRedis(), connections=CONNECTIONS)
+    instance.sink.callback_context = instance.state.pipeline
+    instance.page_sizes = PageSizeController()
+    return instance
+
+
+def test_each_index_is_checked_once(github_collector):
+    indices = github_collector.elasticsearch.indices
+    for _ in range(3):
+        assert github_collector._ensure_es_index('gh_followers-2019-05-01')
+        assert github_collector._ensure_es_index('gh_following-2019-05-01')
+
+    checks = [call for call in indices.calls if call[0] in ('exists', 'create')]
+    assert checks == [('exists', 'gh_followers-2019-05-01'),
+                      ('exists', 'gh_following-2019-05-01'),
+                      ('create', 'gh_following-2019-05-01')]
+
+
+def test_templates_are_installed_before_the_first_index(github_collector):
+    indices = github_collector.elasticsearch.indices
+    github_collector._ensure_es_index('gh_followers-2019-05-01')
+    github_collector._ensure_es_index('gh_following-2019-05-01')
+
+    puts = [call for call in indices.calls if call[0] == 'put_template']
+    assert len(puts) == len(mappings.DOC_TYPES)
+    assert indices.calls.index(puts[-1]) < indices.calls.index(('exists', 'gh_followers-2019-05-01'))
+
+
+def test_documents_are_buffered_until_close(github_collector):
+    for number in range(3):
+        github_collector._save_elasticsearch({'id': number}, 'gh_followers-2019-05-01',
+                                             'GithubFollowers')
+    assert github_collector.elasticsearch.bodies == []
+
+    assert github_collector.close() is True
+    assert len(github_collector.elasticsearch.bodies) == 1
+    assert ('refresh', 'gh_followers-2019-05-01') in github_collector.elasticsearch.indices.calls
+
+
+class PagedUser(object):
+    login = 'octocat'
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    def followers(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.pages.pop(0)
+
+
+def followers_page(cursor, has_next):
+    return {'data': {'user': {'followers': {
+        'edges': [{'cursor': cursor, 'node': {'login': cursor}}],
+        'pageInfo': {'endCursor': cursor, 'hasNextPage': has_next}}}}}
+
+
+def test_save_connection_stores_pages_and_the_final_cursor(github_collector):
+    github_collector.state.client.hset('gh:octocat', 'followers:endCursor', 'c0')
+    user = PagedUser(followers_page('c1', True), followers_page('c2', False))
+
+    assert github_collector.save_followers(user) is True
+    github_collector.close()
+
+    assert user.calls[0]['after'] == '"c0"' and user.calls[1]['after'] == '"c1"'
+    assert github_collector.state.client.hget('gh:octocat', 'followers:endCursor') == b'c2'
+    assert github_collector.elasticsearch.bodies[0].count('GithubFollowers') == 2
+
+
+def test_save_connection_reports_failed_pages(github_collector):
+    user = PagedUser(followers_page('c1', True), False)
+
+    assert github_collector.save_connection(user, 'followers') is False
+    assert github_collector.state.client.hget('gh:octocat', 'followers:endCursor') is None
+
+
+class Crash(Exception):
+    pass
+
+
+def crashing_user(*pages):
+    """A user whose followers pages run out with a crash instead of a last page"""
+    user = PagedUser(*pages)
+    fetch = user.followers
+
+    def followers(**kwargs):
+        if not user.pages:
+            raise Crash()
+        return fetch(**kwargs)
+    user.followers = followers
+    return user
+
+
+def test_cursor_is_checkpointed_after_each_flushed_page(github_collector):
+    github_collector.sink.max_docs = 1
+    user = crashing_user(followers_page('c1', True), followers_page('c2', True))
+
+    with pytest.raises(Crash):
+        github_collector.save_followers(user)
+
+    assert github_collector.state.client.hget('gh:octocat', 'followers:endCursor') == b'c2'
+
+
+def test_cursor_does_not_pass_a_page_that_failed_to_flush(github_collector):
+    github_collector.sink.max_docs = 1
+    user = PagedUser(followers_page('c1', True), followers_page('c2', True),
+                     followers_page('c3', False))
+    fetch = user.followers
+
+    def followers(**kwargs):
+        github_collector.elasticsearch.fail = kwargs.get('after') == '"c1"'
+        return fetch(**kwargs)
+    user.followers = followers
+
+    github_collector.save_followers(user)
+
+    assert github_collector.state.client.hget('gh:octocat', 'followers:endCursor') == b'c1'
+
+
+def test_journaled_pages_are_not_fetched_again(github_collector, tmp_path):
+    github_collector.journal = Journal(str(tmp_path / 'journal.log'))
+    user = crashing_user(followers_page('c1', True), followers_page('c2', True))
+    with pytest.raises(Crash):
+        github_collector.save_followers(user)
+    # the pages were still buffered when the collector died
+    assert github_collector.elasticsearch.bodies == []
+
+    restarted = collector.GithubCollector()
+    restarted.elasticsearch = restarted.sink.client = FakeElasticsearch()
+    restarted.state = github_collector.state
+    restarted.journal = Journal(str(tmp_path / 'journal.log'))
+    resumed = PagedUser(followers_page('c3', False))
+
+    assert restarted.save_followers(resumed) is True
+    assert resumed.calls[0]['after'] == '"c2"'
+    restarted.close()
+
+    assert restarted.elasticsearch.bodies[0].count('GithubFollowers') == 3
+    assert restarted.state.client.hget('gh:octocat', 'followers:endCursor') == b'c3'
+    assert restarted.journal._file.closed
+    assert Journal(str(tmp_path / 'journal.log')).replay() == []
+
+
+def test_bulk_writes_do_not_hold_the_journal_lock(github_collector, tmp_path):
+    github_collector.journal = Journal(str(tmp_path / 'journal.log'))
+    github_collector.sink.max_docs = 1
+    client = github_collector.elasticsearch
+    bulk = client.bulk
+    free = []
+
+    def probe():
+        if github_collector._journal_lock.acquire(timeout=1):
+            github_collector._journal_lock.release()
+            free.append(True)
+        else:
+            free.append(False)
+
+    def checking_bulk(body, refresh='false'):
+        other = threading.Thread(target=probe)
+        other.start()
+        other.join()
+        return bulk(body, refresh)
+    client.bulk = checking_bulk
+
+    user = PagedUser(followers_page('c1', True), followers_page('c2', False))
+    assert github_collector.save_followers(user) is True
+    github_collector.close()
+
+    assert free == [True, True]
+    assert github_collector.journal._file.closed
+    assert Journal(github_collector.journal.path).replay() == []
+
+
+@pytest.mark.parametrize('backend, store', [
+    ('memory', MemoryCursorStore),
+    ('sqlite', SQLiteCursorStore),
+    ('redis', RedisCursorStore),
+])
+def test_the_cursor_store_is_chosen_in_collectors_cfg(monkeypatch, tmp_path, backend, store):
+    config = ConfigParser()
+    config.read(os.path.join(PACKAGE_DIR, 'collectors.cfg'))
+    config['State']['backend'] = backend
+    config['State']['path'] = str(tmp_path / 'state.sqlite3')
+
+    def configured(self):
+        self.config = config
+    monkeypatch.setattr(collector.Collector, '__init__', configured)
+
+    github_collector = collector.GithubCollector()
+
+    assert isinstance(github_collector.state, store)
+    assert github_collector.sink.callback_context == github_collector.state.pipeline
+
+
+class SlowUser(object):
+    """Serves one page per connection after a delay, tracking peak concurrency"""
+    login = 'octocat'
+
+    def __init__(self, delay=0.05, broken=()):
+        import threading
+        self.delay = delay
+        self.broken = broken
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def __getattr__(self, name):
+        if name not in CONNECTIONS:
+            raise AttributeError(name)
+
+        def fetch(**kwargs):
+            import time
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            try:
+                time.sleep(self.delay)
+                if name in self.broken:
+                    raise TypeError("'NoneType' object is not subscriptable")
+                return {'data': {'user': {name: {
+                    'edges': [{'cursor': 'c', 'node': {'id': name}}],
+                    'pageInfo': {'endCursor': 'c', 'hasNextPage': False}}}}}
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        return fetch
+
+
+def test_save_all_crawls_connections_concurrently(github_collector):
+    user = SlowUser()
+
+    stats = github_collector.save_all(user, max_workers=4)
+
+    assert list(stats) == list(CONNECTIONS)
+    assert all(result.succeeded and result.pages == 1 for result in stats.values())
+    assert user.peak == 4
+
+
+def test_save_all_isolates_failing_connections(github_collector):
+    user = SlowUser(delay=0, broken=('gists',))
+
+    stats = github_collector.save_all(user, connections=['followers', 'gists', 'issues'],
+                                      max_workers=2)
+
+    assert [name for name, result in stats.items() if not result.succeeded] == ['gists']
+    assert stats['gists'].error.startswith('TypeError')
+    assert stats['issues'].succeeded and stats['issues'].pages == 1
+
+
+def test_a_deadline_cuts_a_connection_off_and_checkpoints_it(github_collector):
+    class Budget(object):
+        expired = False
+    budget = Budget()
+    user = PagedUser(followers_page('c1', True), followers_page('c2', True))
+    fetch = user.followers
+
+    def followers(**kwargs):
+        payload = fetch(**kwargs)
+        budget.expired = True
+        return payload
+    user.followers = followers
+
+    assert github_collector.save_connection(user, 'followers', deadline=budget) is False
+    github_collector.close()
+
+    assert len(user.calls) == 1
+    assert github_collector.state.client.hget('gh:octocat', 'followers:endCursor') == b'c1'
+
+
+def test_the_collector_profile_applies_to_the_users_it_crawls(github_collector):
+    user = PagedUser(followers_page('c1', False))
+    user.profile = None
+    assert github_collector.save_connection(user, 'followers') is True
+    assert user.profile is None
+
+    transport.set_transport(FakeEndpoint())
+    shared = User('octocat', lazy=True)
+    github_collector.profile = 'minimal'
+    profiled = github_collector._with_profile(shared)
+    assert profiled is not shared and shared.profile is None
+    assert profiled.profile == 'minimal' and profiled.pending
+    assert User('octocat', profile='minimal') is profiled
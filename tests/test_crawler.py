@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from configparser import ConfigParser
+
+import pytest
+
+import crawler
+from collector import ConnectionStats
+from crawler import CrawlDriver, CrawlStats
+from state import MemoryCursorStore
+
+
+class FakeUser(object):
+    def __init__(self, login):
+        self.login = login
+
+
+class FakeCollector(object):
+    def __init__(self, fail=(), crash=(), pool_maxsize=10):
+        self.config = ConfigParser()
+        self.config.read_dict({'Transport': {'pool_maxsize': str(pool_maxsize)},
+                               'Crawl': {'workers': '3', 'batch_size': '2', 'connection_workers': '1'}})
+        self.state = MemoryCursorStore()
+        self.fail = set(fail)
+        self.crash = set(crash)
+        self.preloaded = []
+        self.saved = []
+        self.deadlines = []
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+
+    def preload(self, logins):
+        self.preloaded.append(list(logins))
+
+    def save_user(self, user, path=None):
+        if user.login in self.crash:
+            raise TypeError("'NoneType' object is not subscriptable")
+        return True
+
+    def save_all(self, user, connections=None, max_workers=None, path=None, deadline=None):
+        self.deadlines.append(deadline)
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+            self.saved.append(user.login)
+        return {'followers': ConnectionStats('followers', user.login not in self.fail, 2, 0.01, None)}
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    requests = []
+
+    def fetch_many(logins, batch_size=50, profile=None):
+        requests.append(list(logins))
+        return [FakeUser(login) for login in logins if login != 'ghost']
+    monkeypatch.setattr(crawler.User, 'fetch_many', staticmethod(fetch_many))
+    return requests
+
+
+def test_read_logins_skips_blanks_and_comments(tmp_path):
+    path = tmp_path / 'logins.txt'
+    path.write_text('# staff\noctocat\n\n  hubot  \n')
+    assert list(CrawlDriver.read_logins(str(path))) == ['octocat', 'hubot']
+
+
+def test_logins_are_deduped_case_insensitively(fetched):
+    collector = FakeCollector()
+    stats = CrawlDriver(collector, workers=2, batch_size=10).crawl(['octocat', 'OctoCat', 'hubot', 'octocat'])
+    assert sorted(collector.saved) == ['hubot', 'octocat']
+    assert (stats.logins, stats.duplicates, stats.succeeded) == (2, 2, 2)
+
+
+def test_profiles_and_cursors_are_loaded_per_batch(fetched):
+    collector = FakeCollector()
+    CrawlDriver(collector, workers=2, batch_size=2).crawl(['a', 'b', 'c', 'd', 'e'])
+    assert fetched == [['a', 'b'], ['c', 'd'], ['e']]
+    assert collector.preloaded == fetched
+
+
+def test_failures_are_counted_and_the_crawl_continues(fetched):
+    collector = FakeCollector(fail=['b'], crash=['c'])
+    stats = CrawlDriver(collector, workers=2, batch_size=10).crawl(['a', 'b', 'c', 'ghost', 'd'])
+    assert (stats.succeeded, stats.failed) == (2, 3)
+    assert sorted(collector.saved) == ['a', 'b', 'd']
+    assert stats.pages == 6
+
+
+def test_a_failed_batch_load_is_counted(monkeypatch):
+    def fetch_many(logins, batch_size=50, profile=None):
+        raise ValueError('api down')
+    monkeypatch.setattr(crawler.User, 'fetch_many', staticmethod(fetch_many))
+    stats = CrawlDriver(FakeCollector(), batch_size=2).crawl(['a', 'b', 'c'])
+    assert (stats.succeeded, stats.failed) == (0, 3)
+
+
+def test_workers_and_queue_bound_the_logins_in_flight(fetched):
+    collector = FakeCollector()
+    driver = CrawlDriver(collector, workers=3, batch_size=4, queue_size=4)
+    ahead = []
+
+    def stream():
+        for number in range(40):
+            # logins read but not yet crawled: the queue plus the batch being read
+            ahead.append(number - len(collector.saved))
+            yield 'user%d' % number
+    stats = driver.crawl(stream())
+    assert stats.succeeded == 40
+    assert max(ahead) <= driver.queue_size + driver.batch_size
+    assert collector.most_running <= 3
+
+
+def test_from_config_and_throughput():
+    collector = FakeCollector(pool_maxsize=2)
+    driver = CrawlDriver.from_config(collector, batch_size=5)
+    assert (driver.workers, driver.batch_size) == (3, 5)
+    stats = CrawlStats()
+    stats.record(True, pages=10)
+    stats.record(False)
+    stats.seconds = 2.0
+    assert stats.logins_per_second == 1.0
+    assert stats.pages_per_second == 5.0
+    assert '1 succeeded, 1 failed' in stats.summary()
+
+
+def test_each_login_gets_its_own_budget_within_the_crawls(fetched):
+    collector = FakeCollector()
+    CrawlDriver(collector, crawl_deadline=3600, login_deadline=60).crawl(['a', 'b'])
+    assert len(collector.deadlines) == 2
+    assert all(0 < deadline.remaining() <= 60 for deadline in collector.deadlines)
+
+
+def test_no_logins_start_once_the_crawl_deadline_passes(fetched):
+    collector = FakeCollector()
+    driver = CrawlDriver(collector, batch_size=1, crawl_deadline=1e-9)
+    stats = driver.crawl(['a', 'b'])
+    assert collector.saved == [] and stats.succeeded == 0
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from deadline import Deadline
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_an_unbounded_deadline_never_passes():
+    deadline = Deadline()
+    assert deadline.remaining() is None and not deadline.expired
+    assert deadline.child().expires_at is None
+
+
+def test_deadline_passes_after_its_budget():
+    clock = Clock()
+    deadline = Deadline(10, clock=clock)
+    clock.now += 9
+    assert deadline.remaining() == 1 and not deadline.expired
+    clock.now += 1
+    assert deadline.remaining() == 0 and deadline.expired
+
+
+def test_a_child_never_outlives_its_parent():
+    clock = Clock()
+    crawl = Deadline(60, clock=clock)
+    assert crawl.child(10).expires_at == 110
+    assert crawl.child(600).expires_at == 160
+    assert crawl.child().expires_at == 160
+    assert Deadline().child(10).clock is Deadline().clock
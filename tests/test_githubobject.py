@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import json
+
+import transport
+from User import User
+
+
+class RecordingTransport(object):
+    def __init__(self):
+        self.headers = []
+
+    def post(self, query, headers=None):
+        self.headers.append(headers)
+        return type('Response', (object,), {'text': json.dumps({'data': {}}), 'headers': {}})()
+
+
+def test_send_keeps_the_configured_token_for_an_empty_pooled_token():
+    recording = RecordingTransport()
+    transport.set_transport(recording)
+    user = User._from_response(None)
+
+    user._send({'query': '{ viewer { login } }'}, '')
+    user._send({'query': '{ viewer { login } }'}, 'pooled')
+
+    assert recording.headers[0]['Authorization'] == user.headers['Authorization']
+    assert recording.headers[1]['Authorization'] == 'token pooled'
+
+
+def test_issue_and_repository_pages_take_their_page_size():
+    from templates import TEMPLATES
+    issues = TEMPLATES.render('Issues', 'gh_issues_by_user_next', 'octocat', 25, 'abc')
+    repositories = TEMPLATES.render('Repositories', 'gh_repositories_by_organization_next',
+                                    'github', 'first: 30,', 'abc')
+    assert 'issues(first:25, after: "abc")' in issues
+    assert 'repositories(first: 30, after: "abc")' in repositories
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from configparser import ConfigParser
+
+import pytest
+
+import identity
+import transport
+from aio import AsyncUser
+from fakes import FakeEndpoint
+from identity import IdentityMap
+from Repository import Repository
+from User import User
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def install(endpoint, identities=None):
+    transport.set_transport(endpoint)
+    if identities is not None:
+        identity.set_identity_map(identities)
+    return endpoint
+
+
+def test_the_same_login_is_one_shared_user():
+    endpoint = install(FakeEndpoint())
+    user = User('octocat')
+    assert User('Octocat') is user
+    assert User('octocat', lazy=True) is user
+    assert len(endpoint.queries) == 1
+    assert User('octocat', profile='minimal') is not user
+
+
+def test_repositories_are_shared_by_name_with_owner():
+    endpoint = install(FakeEndpoint())
+    lazy = Repository('hello-world', 'octocat', lazy=True)
+    assert endpoint.queries == []
+    repository = Repository('Hello-World', 'octocat')
+    assert repository is lazy and not repository.pending
+    assert len(endpoint.queries) == 1
+
+
+def test_connection_nodes_resolve_to_the_shared_objects():
+    endpoint = install(FakeEndpoint())
+    starred = {'node': {'name': 'hello-world', 'owner': {'login': 'octocat'}, 'url': 'x'}}
+    watched = {'nameWithOwner': 'octocat/hello-world', 'id': 'R_1'}
+    repository = Repository.from_node(starred)
+    assert repository.pending
+    assert Repository.from_node(watched) is repository
+    assert Repository.from_node({'nameWithOwner': 'renamed/hello-world', 'id': 'R_1'}) is repository
+    assert Repository('hello-world', 'octocat') is repository
+
+    follower = User.from_node({'login': 'hubot', 'id': 'U_1'})
+    assert User.from_node({'login': 'HUBOT'}) is follower
+    assert User('hubot') is follower
+    assert len(endpoint.queries) == 2
+
+
+def test_objects_expire_after_the_ttl():
+    clock = Clock()
+    endpoint = install(FakeEndpoint(), IdentityMap(ttl=60, clock=clock))
+    user = User('octocat')
+    clock.now += 59
+    assert User('octocat') is user
+    clock.now += 1
+    assert User('octocat') is not user
+    assert len(endpoint.queries) == 2
+
+
+def test_the_least_recently_used_are_dropped():
+    identities = IdentityMap(max_size=2)
+    install(FakeEndpoint(), identities)
+    first, second = User('a'), User('b')
+    assert User('a') is first
+    User('c')
+    assert len(identities) == 2
+    assert User('a') is first and User('b') is not second
+    assert identities.hits == 2
+
+
+def test_failed_loads_are_not_shared():
+    endpoint = install(FakeEndpoint(missing=['ghost']))
+    assert User('ghost') is not User('ghost')
+    assert len(endpoint.queries) == 2
+
+
+def test_a_map_without_room_shares_nothing():
+    install(FakeEndpoint(), IdentityMap(max_size=0))
+    assert User('octocat') is not User('octocat')
+
+
+def test_async_objects_are_not_shared():
+    install(FakeEndpoint())
+    assert AsyncUser('octocat') is not AsyncUser('octocat')
+
+
+def test_from_config():
+    config = ConfigParser()
+    config.read_dict({'Identity': {'max_size': '5', 'ttl': '0'}})
+    identities = IdentityMap.from_config(config)
+    assert (identities.max_size, identities.ttl) == (5, None)
+
+
+def test_a_lazy_object_that_fails_to_load_is_forgotten():
+    endpoint = install(FakeEndpoint(missing=['ghost']))
+    ghost = User('ghost', lazy=True)
+    assert ghost.load() is False
+    endpoint.missing = set()
+    user = User('ghost')
+    assert user is not ghost and user._loaded
+    assert len(endpoint.queries) == 2
+
+
+def test_a_batch_that_fails_to_load_is_forgotten():
+    endpoint = install(FakeEndpoint(missing=['ghost']))
+    assert [user.login for user in User.fetch_many(['a', 'ghost'])] == ['a']
+    endpoint.missing = set()
+    assert User('ghost').login == 'ghost' and len(endpoint.queries) == 2
+
+
+def test_lazy_is_keyword_only():
+    with pytest.raises(TypeError):
+        User('octocat', None, True)
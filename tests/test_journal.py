@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from configparser import ConfigParser
+
+from journal import Journal
+from pagination import Checkpoint
+
+
+def test_records_replay_in_order(tmp_path):
+    journal = Journal(str(tmp_path / 'crawl' / 'journal.log'))
+    journal.append('octocat', 'followers', 'c1', 'gh_followers-x', 'GithubFollowers', {'page': 1})
+    journal.append('octocat', 'followers', 'c2', 'gh_followers-x', 'GithubFollowers', {'page': 2})
+
+    records = Journal(journal.path).replay()
+
+    assert [record['cursor'] for record in records] == ['c1', 'c2']
+    assert records[1]['document'] == {'page': 2}
+
+
+def test_a_torn_last_line_is_ignored(tmp_path):
+    journal = Journal(str(tmp_path / 'journal.log'))
+    journal.append('octocat', 'followers', 'c1', 'index', 'Doc', {})
+    with open(journal.path, 'a') as torn:
+        torn.write('{"login": "octo')
+
+    assert [record['cursor'] for record in journal.replay()] == ['c1']
+
+
+def test_truncate_empties_the_journal(tmp_path):
+    journal = Journal(str(tmp_path / 'journal.log'), fsync=True)
+    journal.append('octocat', 'followers', 'c1', 'index', 'Doc', {})
+
+    journal.truncate()
+    journal.append('octocat', 'followers', 'c2', 'index', 'Doc', {})
+
+    assert [record['cursor'] for record in journal.replay()] == ['c2']
+
+
+def test_from_config(tmp_path):
+    config = ConfigParser()
+    config.read_string('[Crawl]\njournal =\n')
+    assert Journal.from_config(config) is None
+
+    config['Crawl']['journal'] = str(tmp_path / 'journal.log')
+    config['Crawl']['journal_fsync'] = 'True'
+    assert Journal.from_config(config).fsync is True
+
+
+def test_checkpoint_stops_at_the_first_page_that_fails():
+    stored = []
+    checkpoint = Checkpoint(stored.append)
+    first, second, third = checkpoint.page('c1'), checkpoint.page('c2'), checkpoint.page('c3')
+
+    first(True)
+    second(False)
+    third(True)
+
+    assert stored == ['c1'] and checkpoint.cursor == 'c1' and checkpoint.failed
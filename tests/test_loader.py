@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+import transport
+from fakes import FakeEndpoint
+from Issue import Issue
+from Issues import Issues
+from loader import Loader, load
+from Repository import Repository
+from User import User
+
+
+def install(endpoint):
+    transport.set_transport(endpoint)
+    return endpoint
+
+
+def test_a_lazy_object_queries_on_first_use_only():
+    endpoint = install(FakeEndpoint())
+    user = User('octocat', lazy=True)
+    assert user.pending and endpoint.queries == []
+    assert repr(user) == "User(login='octocat', pending=True)"
+    assert user.login == 'octocat' and user.url == 'https://github.com/octocat'
+    assert not user.pending and len(endpoint.queries) == 1
+    assert user.load() is True and len(endpoint.queries) == 1
+
+
+def test_eager_construction_is_unchanged():
+    endpoint = install(FakeEndpoint())
+    repository = Repository('hello-world', 'octocat')
+    assert not repository.pending and len(endpoint.queries) == 1
+    assert 'repository(owner: "octocat", name: "hello-world")' in endpoint.queries[0]
+
+
+def test_pending_loads_are_batched_per_class():
+    endpoint = install(FakeEndpoint(missing=['ghost']))
+    users = [User(login, lazy=True) for login in ['a', 'ghost', 'c', 'd', 'e']]
+    repositories = [Repository('hello-world', owner, lazy=True) for owner in ['a', 'b']]
+    loader = Loader(batch_size=2).add(*(users + repositories))
+    assert len(loader) == 7
+
+    loaded = loader.load()
+
+    assert len(endpoint.queries) == 4
+    assert [user.login for user in loaded[:4]] == ['a', 'c', 'd', 'e']
+    assert [repository.owner['login'] for repository in loaded[4:]] == ['a', 'b']
+    assert not any(obj.pending for obj in users + repositories)
+    assert users[1].load() is False and len(endpoint.queries) == 4
+
+
+def test_a_failed_first_template_is_retried_with_the_next_in_one_batch():
+    endpoint = install(FakeEndpoint())
+    pages = [Issues(login, limit=10, lazy=True) for login in ['github', 'nodejs']]
+
+    assert load(pages) == pages
+
+    assert len(endpoint.queries) == 2
+    assert endpoint.queries[0].count('user(') == 2 and 'issues(first:10)' in endpoint.queries[0]
+    assert endpoint.queries[1].count('organization(') == 2
+    assert [page.totalCount for page in pages] == [1, 1]
+
+
+def test_loaded_objects_are_not_queried_again():
+    endpoint = install(FakeEndpoint())
+    users = User.fetch_many(['a', 'b'])
+    assert len(endpoint.queries) == 1
+    assert load(users) == users and len(endpoint.queries) == 1
+
+
+def test_concurrent_first_reads_load_once():
+    endpoint = install(FakeEndpoint())
+    user = User('octocat', lazy=True)
+    logins = []
+    threads = [threading.Thread(target=lambda: logins.append(user.login)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert logins == ['octocat'] * 8
+    assert len(endpoint.queries) == 1
+
+
+def test_load_arguments_default_to_the_update_arguments():
+    class Recorder(object):
+        queries = []
+
+        def post(self, query, headers=None):
+            self.queries.append(query['query'])
+            issue = {'repository': {'issue': {'title': 'Bug'}}}
+            return type('Response', (object,), {'text': json.dumps({'data': {'r0': issue, 'r1': issue}}),
+                                                'headers': {}})()
+    recorder = install(Recorder())
+    issues = [Issue('octocat', 'hello-world', number, lazy=True) for number in (1, 2)]
+    assert issues[0]._load_arguments() == ('octocat', 'hello-world', 1)
+
+    assert load(issues) == issues
+
+    assert len(recorder.queries) == 1
+    assert 'issue(number:1)' in recorder.queries[0] and 'issue(number:2)' in recorder.queries[0]
+    assert [issue.title for issue in issues] == ['Bug', 'Bug']
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import fnmatch
+
+import mappings
+
+
+def test_every_doc_type_has_a_template_matching_only_its_indices():
+    for doc_type in mappings.DOC_TYPES:
+        name, body = mappings.index_template(doc_type)
+        index = mappings.index_name(doc_type, '2019-05-01')
+        matching = [other for other in mappings.DOC_TYPES
+                    if fnmatch.fnmatch(index, mappings.index_template(other)[1]['index_patterns'][0])]
+        assert matching == [doc_type]
+        assert name.startswith(mappings.TEMPLATE_PREFIX)
+        assert list(body['mappings']) == [doc_type]
+
+
+def test_connection_pages_are_mapped_without_dynamic_fields():
+    mapping = mappings.mapping('GithubIssues')
+
+    user = mapping['properties']['data']['properties']['user']
+    page = user['properties']['issues']
+    node = page['properties']['edges']['properties']['node']
+    assert mapping['dynamic'] is False and user['dynamic'] is False and node['dynamic'] is False
+    assert node['properties']['bodyHTML'] == {'type': 'text', 'index': False, 'norms': False}
+    assert node['properties']['createdAt'] == {'type': 'date'}
+    assert page['properties']['nodes'] is node
+
+
+def test_user_documents_map_the_user_itself():
+    user = mappings.mapping('GithubUser')['properties']['data']['properties']['user']
+
+    assert user['properties']['login'] == mappings.KEYWORD
+    assert user['properties']['bioHTML']['index'] is False
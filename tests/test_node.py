@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import json
+import pickle
+
+import pytest
+
+import settings
+import transport
+from DeployKey import DeployKey
+from GistComment import GistComment
+from IssueComment import IssueComment
+from PublicKey import PublicKey
+
+
+def comments_page(count):
+    edges = [{'cursor': 'c%d' % index,
+              'node': {'id': 'IC_%d' % index, 'body': 'comment %d' % index,
+                       'createdAt': '2019-05-01T00:00:00Z'}}
+             for index in range(count)]
+    return {'data': {'user': {'issueComments': {'totalCount': count, 'edges': edges,
+                                                'pageInfo': {'hasNextPage': False}}}}}
+
+
+def test_records_are_built_from_a_page_without_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'get_settings', lambda: pytest.fail('settings were loaded'))
+
+    comments = IssueComment.from_page(comments_page(3), 'user', 'issueComments')
+
+    assert [comment.id for comment in comments] == ['IC_0', 'IC_1', 'IC_2']
+    assert comments[1].body == 'comment 1'
+    assert comments[1].url is None
+
+
+def test_records_use_slots_and_are_immutable():
+    comment = GistComment({'node': {'id': 'GC_1', 'body': 'hi'}})
+
+    assert not hasattr(comment, '__dict__')
+    with pytest.raises(AttributeError):
+        comment.body = 'changed'
+    with pytest.raises(AttributeError):
+        del comment.id
+
+
+def test_records_compare_and_hash_on_id():
+    first = IssueComment({'id': 'IC_1', 'body': 'old'})
+    second = IssueComment({'node': {'id': 'IC_1', 'body': 'new'}})
+
+    assert first == second
+    assert len({first, second, IssueComment({'id': 'IC_2'})}) == 2
+    assert first != GistComment({'id': 'IC_1'})
+
+
+def test_keys_record_their_owner():
+    keys = PublicKey.from_page({'data': {'user': {'publicKeys': {'edges': [
+        {'node': {'id': 'PK_1', 'key': 'ssh-rsa AAA'}}]}}}}, 'user', 'publicKeys', owner='octocat')
+
+    assert keys == [PublicKey('octocat', {'id': 'PK_1'})]
+    assert repr(keys[0]) == "PublicKey(id='PK_1', owner='octocat')"
+    assert DeployKey('octocat', {'id': 'DK_1', 'readOnly': True}).readOnly is True
+
+
+def test_failed_pages_build_nothing():
+    assert IssueComment.from_page(False, 'user', 'issueComments') == []
+    assert IssueComment.from_page({'data': {'user': None}}, 'user', 'issueComments') == []
+
+
+def test_records_pickle():
+    key = PublicKey('octocat', {'id': 'PK_1', 'key': 'ssh-rsa AAA'})
+
+    copy = pickle.loads(pickle.dumps(key))
+
+    assert copy == key and copy.owner == 'octocat' and copy.key == 'ssh-rsa AAA'
+
+
+def test_connections_query_through_the_shared_transport():
+    class Recording(object):
+        queries = []
+
+        def post(self, query, headers=None):
+            self.queries.append(query)
+            body = {'data': {'node': {'id': 'IC_1', 'reactions': {'edges': []}}}}
+            return type('Response', (object,), {'text': json.dumps(body), 'headers': {}})()
+
+    recording = Recording()
+    transport.set_transport(recording)
+
+    payload = IssueComment({'id': 'IC_1'}).reactions(first=10)
+
+    assert payload['data']['node']['id'] == 'IC_1'
+    assert 'IC_1' in recording.queries[0]['query']
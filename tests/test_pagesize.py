@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import json
+
+from pagesize import PageSizeController
+
+
+def test_slow_pages_shrink_and_fast_pages_grow_the_size():
+    sizes = PageSizeController(initial=100, minimum=10, maximum=100)
+    assert not sizes.observe('issues', 9.0)
+    assert sizes.size('issues') == 50
+    sizes.observe('issues', 5.0)
+    assert sizes.size('issues') == 50
+    sizes.observe('issues', 1.0)
+    assert sizes.size('issues') == 63
+    for _ in range(5):
+        sizes.observe('issues', 1.0)
+    assert sizes.size('issues') == 100
+    assert sizes.size('followers') == 100
+
+
+def test_a_timed_out_page_is_fetched_again_until_the_minimum():
+    sizes = PageSizeController(initial=40, minimum=10)
+    assert sizes.observe('pullRequests', 30.0, failed=True)
+    assert sizes.observe('pullRequests', 30.0, failed=True)
+    assert sizes.size('pullRequests') == 10
+    assert not sizes.observe('pullRequests', 30.0, failed=True)
+
+
+def test_a_quick_failure_leaves_the_size_alone():
+    sizes = PageSizeController()
+    assert not sizes.observe('issues', 0.1, failed=True)
+    assert sizes.size('issues') == 100
+
+
+def test_learned_sizes_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'page_sizes.json')
+    PageSizeController(path=path).observe('issues', 20.0)
+    assert json.load(open(path)) == {'issues': 50}
+    assert PageSizeController(path=path).size('issues') == 50
+    assert PageSizeController(path=path, minimum=60).size('issues') == 60
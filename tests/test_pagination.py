@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import pagination
+from pagination import CONNECTIONS, Paginator, quote_cursor
+
+
+def page(name, cursor, has_next, nodes=1):
+    return {'data': {'user': {name: {
+        'edges': [{'cursor': cursor, 'node': {'id': '%s-%d' % (cursor, n)}} for n in range(nodes)],
+        'pageInfo': {'endCursor': cursor, 'hasNextPage': has_next}}}}}
+
+
+class Fetch(object):
+    """Serves canned pages and records the arguments of each call"""
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.pages.pop(0)
+
+
+def test_walks_every_page_and_quotes_cursors():
+    fetch = Fetch(page('gists', 'c1', True), page('gists', 'c2', True), page('gists', 'c3', False))
+    paginator = Paginator(CONNECTIONS['gists'], fetch, page_size=50)
+
+    cursors = [page_.end_cursor for page_ in paginator]
+
+    assert cursors == ['c1', 'c2', 'c3']
+    assert paginator.complete and paginator.error is None and paginator.end_cursor == 'c3'
+    assert fetch.calls[0] == {'first': 50, 'orderBy': pagination.NEWEST_FIRST, 'privacy': 'ALL'}
+    assert fetch.calls[1]['after'] == '"c1"' and fetch.calls[2]['after'] == '"c2"'
+
+
+def test_resumes_after_a_stored_cursor():
+    fetch = Fetch(page('followers', 'c9', False))
+
+    list(Paginator(CONNECTIONS['followers'], fetch, after='c8'))
+
+    assert fetch.calls == [{'first': 100, 'after': '"c8"'}]
+
+
+def test_an_empty_page_keeps_the_stored_cursor():
+    fetch = Fetch(page('followers', None, False, nodes=0))
+    paginator = Paginator(CONNECTIONS['followers'], fetch, after='c8')
+
+    assert list(paginator) == []
+    assert paginator.complete and paginator.end_cursor == 'c8'
+
+
+def test_failed_and_malformed_pages_stop_the_walk():
+    failed = Paginator(CONNECTIONS['followers'], Fetch(page('followers', 'c1', True), False))
+    assert len(list(failed)) == 1
+    assert not failed.complete and failed.error and failed.end_cursor == 'c1'
+
+    missing = Paginator(CONNECTIONS['followers'], Fetch({'data': {'user': None}}))
+    assert list(missing) == []
+    assert missing.error == 'user.followers missing from response'
+
+
+def test_quote_cursor_is_idempotent():
+    assert quote_cursor('abc=') == '"abc="'
+    assert quote_cursor('"abc="') == '"abc="'
+
+
+def test_descriptors_cover_every_user_connection():
+    import User
+
+    assert set(CONNECTIONS) == set(User.CONNECTION_DOC_TYPES)
+    assert CONNECTIONS['followers'].index('2019-05-01') == 'gh_followers-2019-05-01'
+
+
+def test_a_passed_deadline_stops_the_walk_before_the_next_page():
+    class Budget(object):
+        expired = False
+    budget = Budget()
+    fetch = Fetch(page('followers', 'c1', True), page('followers', 'c2', True))
+    paginator = Paginator(CONNECTIONS['followers'], fetch, deadline=budget)
+
+    cursors = []
+    for page_ in paginator:
+        cursors.append(page_.end_cursor)
+        budget.expired = True
+
+    assert cursors == ['c1'] and len(fetch.calls) == 1
+    assert paginator.timed_out and not paginator.complete
+    assert paginator.end_cursor == 'c1'
+    assert 'deadline' in paginator.error
+
+
+def test_a_sizer_picks_the_page_size_and_refetches_a_timed_out_page():
+    from pagesize import PageSizeController
+    times = iter([0, 30, 30, 31, 31, 32])
+    sizes = PageSizeController(initial=100, slow_seconds=8, fast_seconds=2)
+    fetch = Fetch(False, page('issues', 'c1', False))
+    paginator = Paginator(CONNECTIONS['issues'], fetch, sizer=sizes, clock=lambda: next(times))
+
+    cursors = [page_.end_cursor for page_ in paginator]
+
+    assert cursors == ['c1'] and paginator.error is None
+    assert [call['first'] for call in fetch.calls] == [100, 50]
+    assert sizes.size('issues') == 63
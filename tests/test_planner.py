@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from planner import ConnectionPlan, CrawlPlan, PageGroup
+from ratelimit import RateLimiter, TokenPool
+
+RESET = '1970-01-01T01:16:40Z'  # 4600 seconds after the epoch
+
+
+def plan_costing(points):
+    group = PageGroup('octocat')
+    connection = ConnectionPlan('octocat', 'repositories', 100 * points, 100, {'first': 100}, 1)
+    group.add(connection, 1, 100)
+    return CrawlPlan([connection], [group], 0, 0, [])
+
+
+def pool_with(*remaining):
+    pool = TokenPool(['token%d' % index for index in range(len(remaining))])
+    for limiter, points in zip(pool.limiters.values(), remaining):
+        limiter.observe({'data': {'rateLimit': {'cost': 1, 'limit': 5000,
+                                                'remaining': points, 'resetAt': RESET}}})
+    return pool
+
+
+def test_estimate_scales_with_the_number_of_tokens():
+    plan = plan_costing(2000)
+
+    one = plan.estimate_seconds(pool_with(4000), latency=0, now=1000)
+    two = plan.estimate_seconds(pool_with(4000, 4000), latency=0, now=1000)
+
+    assert one == 1800
+    assert two == 900
+
+
+def test_estimate_waits_for_the_next_window_once_every_token_is_spent():
+    plan = plan_costing(3000)
+
+    assert plan.estimate_seconds(pool_with(1000, 1000), latency=0, now=1000) == 3600
+
+
+def test_estimate_accepts_a_single_limiter():
+    plan = plan_costing(100)
+    limiter = RateLimiter(pace=False)
+
+    assert plan.estimate_seconds(limiter, latency=0.5) == plan.requests * 0.5
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import profiles
+import transport
+from Issue import Issue
+from templates import TEMPLATES, Template, TemplateError, TemplateRegistry
+from User import User
+
+
+class QueryRecorder(object):
+    def __init__(self, data=None):
+        self.queries = []
+        self.data = data or {}
+
+    def post(self, query, headers=None):
+        self.queries.append(query['query'])
+        return type('Response', (object,), {'text': json.dumps({'data': self.data}),
+                                            'headers': {}})()
+
+
+def test_fields_are_listed_with_their_paths():
+    text = 'query { user(login: "%s") { login, issues(first: 1) { nodes { body, title } } } }'
+    paths = [path for path, _, _ in profiles.fields(text)]
+    assert paths == [('user', 'login'), ('user', 'issues', 'nodes', 'body'),
+                     ('user', 'issues', 'nodes', 'title'), ('user', 'issues', 'nodes'),
+                     ('user', 'issues'), ('user',)]
+
+
+def test_paths_match_the_end_of_a_field_path():
+    text = 'query {\n  a {\n    body\n    b { body }\n    c { body, id }\n  }\n}\n'
+    assert profiles.project(text, [('c', 'body')]) == \
+            'query {\n  a {\n    body\n    b { body }\n    c { id }\n  }\n}\n'
+    assert 'body' not in profiles.project(text, [('body',), ('b',)])
+
+
+def test_standard_issues_keep_only_the_plain_text_body():
+    query = TEMPLATES.render('Issues', 'gh_issues_by_organization', 'github', 50,
+                             profile='standard')
+    assert 'bodyText' in query and 'reactionGroups' in query
+    assert 'bodyHTML' not in query and not any(line.strip() == 'body' for line in query.split('\n'))
+
+
+def test_standard_repositories_skip_the_license_trees():
+    full = TEMPLATES.get('Repository', 'repository', 'full')
+    standard = TEMPLATES.get('Repository', 'repository', 'standard')
+    assert 'permissions' in full.text and 'limitations' in full.text
+    assert 'permissions' not in standard.text and 'limitations' not in standard.text
+    assert 'spdxId' in standard.text
+    assert len(standard.text) < len(full.text)
+
+
+def test_every_template_is_valid_under_every_profile():
+    registry = TemplateRegistry()
+    registry.load()
+    names = set((class_name, template.name)
+                for (class_name, _), template in registry._templates.items())
+    matched = set()
+    for class_name, name in names:
+        full = registry.get(class_name, name)
+        for profile in profiles.PROFILES:
+            projected = registry.get(class_name, name, profile)
+            assert isinstance(projected, Template)
+            assert projected.placeholders == full.placeholders
+            assert projected.root == full.root
+            for path, _, _ in profiles.fields(full.text):
+                if path not in [cut for cut, _, _ in profiles.fields(projected.text)]:
+                    matched.update(suffix for suffix in profiles.excluded(profile)
+                                   if path[-len(suffix):] == suffix)
+    # every field a profile names is selected by at least one template
+    assert matched == set(suffix for profile in profiles.PROFILES
+                          for suffix in profiles.excluded(profile))
+
+
+def test_projections_are_cached_and_full_is_the_template_on_disk():
+    registry = TemplateRegistry(profile='minimal')
+    assert registry.get('Issue', 'gh_issue_by_user') is registry.get('Issue', 'gh_issue_by_user')
+    assert registry.get('Issue', 'gh_issue_by_user', 'full') is \
+            registry._templates[('Issue', 'gh_issue_by_user')]
+    assert 'bodyText' not in registry.get('Issue', 'gh_issue_by_user').text
+
+
+def test_an_unknown_profile_is_refused():
+    with pytest.raises(ValueError):
+        TemplateRegistry(profile='tiny')
+    with pytest.raises(TemplateError):
+        TEMPLATES.get('Issue', 'gh_issue_by_user', 'tiny')
+
+
+def test_a_user_queries_its_connections_with_its_profile():
+    recorder = QueryRecorder({'user': {'login': 'octocat'}, 'r0': {'login': 'octocat'}})
+    transport.set_transport(recorder)
+    user = User('octocat', profile='minimal')
+    user.issues(first=10)
+    assert 'issues(first: 10,)' in recorder.queries[-1]
+    assert 'bodyText' not in recorder.queries[-1]
+    User.fetch_many(['octocat'], profile='standard')[0].issues(first=10)
+    assert 'bodyText' in recorder.queries[-1] and 'bodyHTML' not in recorder.queries[-1]
+
+
+def test_an_issue_without_its_body_reads_as_none():
+    recorder = QueryRecorder({'user': {'repository': {'issue': {'title': 'Bug', 'number': 1}}}})
+    transport.set_transport(recorder)
+    issue = Issue('octocat', 'hello-world', 1, profile='minimal')
+    assert 'body' not in recorder.queries[0]
+    assert (issue.title, issue.body, issue.bodyText, issue.reactionGroups) == ('Bug', None, None, None)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+from configparser import ConfigParser
+import os
+
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter, TokenPool
+from templates import LOCAL_DIR
+
+RESET = '1970-01-01T00:18:20Z'  # 1100 seconds after the epoch
+
+
+class FakeClock(object):
+    """A clock that only moves when the limiter sleeps"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def rate(remaining, cost=1, limit=5000, reset=RESET):
+    return {'cost': cost, 'limit': limit, 'remaining': remaining, 'resetAt': reset}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(clock=clock, sleep=clock.sleep)
+
+
+def test_inject_appends_the_rate_limit_block_once(limiter):
+    query = limiter.inject({'query': 'query { user(login: "octocat") { login } }'})
+
+    assert query['query'].endswith(
+        'rateLimit(dryRun: false) { cost limit nodeCount remaining resetAt } }')
+    assert limiter.inject(query) is query
+
+
+def test_inject_can_be_disabled(clock):
+    query = {'query': 'query { viewer { login } }'}
+
+    assert RateLimiter(inject=False, clock=clock).inject(query) is query
+
+
+def test_observe_strips_the_block_and_records_the_window(limiter):
+    payload = {'data': {'user': {'login': 'octocat'}, 'rateLimit': rate(4321, cost=2)}}
+
+    assert limiter.observe(payload) == 0
+    assert payload == {'data': {'user': {'login': 'octocat'}}}
+    assert (limiter.remaining, limiter.cost, limiter.reset_at) == (4321, 2, 1100.0)
+
+
+def test_unknown_window_never_waits(limiter):
+    assert limiter.wait_time() == 0
+
+
+def test_pacing_spreads_the_remaining_points_across_the_window(limiter):
+    limiter.observe({'data': {'rateLimit': rate(2)}})
+
+    # 2 points over the 100 seconds left in the window: one query every 50 seconds
+    assert limiter.wait_time() == 0
+    assert limiter.wait_time() == 50
+    assert limiter.remaining == 0
+
+
+def test_without_pacing_queries_go_out_immediately(clock):
+    limiter = RateLimiter(pace=False, clock=clock, sleep=clock.sleep)
+    limiter.observe({'data': {'rateLimit': rate(3)}})
+
+    assert [limiter.wait_time() for _ in range(3)] == [0, 0, 0]
+
+
+def test_exhaustion_pauses_until_the_window_resets(limiter, clock):
+    limiter.observe({'data': {'rateLimit': rate(0)}})
+
+    limiter.acquire()
+
+    assert clock.slept == [100]
+    assert clock.now == 1100
+
+
+def test_reserve_is_never_spent(clock):
+    limiter = RateLimiter(reserve=10, pace=False, clock=clock, sleep=clock.sleep)
+    limiter.observe({'data': {'rateLimit': rate(10)}})
+
+    assert limiter.wait_time() == 100
+
+
+def test_window_rollover_resets_the_budget(limiter, clock):
+    limiter.observe({'data': {'rateLimit': rate(0)}})
+    clock.now = 1200
+
+    assert limiter.wait_time() == 0
+    assert limiter.remaining == limiter.limit
+
+
+def test_rate_limited_error_waits_for_the_reset(limiter):
+    limiter.observe({'data': {'rateLimit': rate(5)}})
+
+    delay = limiter.observe({'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded'}]})
+
+    assert delay == 100
+    assert limiter.wait_time() == 100
+
+
+def test_rate_limited_error_without_a_window_backs_off(clock):
+    limiter = RateLimiter(backoff=30, clock=clock, sleep=clock.sleep)
+
+    assert limiter.observe({'errors': [{'type': 'RATE_LIMITED'}]}) == 30
+
+
+def test_retry_after_header_sets_the_pause(limiter):
+    delay = limiter.observe({'message': 'You have exceeded a secondary rate limit'},
+                            {'Retry-After': '7'})
+
+    assert delay == 7
+
+
+def test_rate_limit_headers_are_used_without_a_block(limiter):
+    limiter.observe({'data': {}}, {'X-RateLimit-Remaining': '12', 'X-RateLimit-Reset': '1500'})
+
+    assert (limiter.remaining, limiter.reset_at) == (12, 1500.0)
+
+
+def test_post_retries_after_a_refusal(limiter, clock):
+    responses = [({'errors': [{'type': 'RATE_LIMITED'}]}, {'Retry-After': '5'}),
+                 ({'data': {'viewer': {'login': 'octocat'}, 'rateLimit': rate(99)}}, {})]
+    sent = []
+
+    def send(query):
+        sent.append(query)
+        return responses.pop(0)
+
+    payload = limiter.post(send, {'query': 'query { viewer { login } }'})
+
+    assert payload == {'data': {'viewer': {'login': 'octocat'}}}
+    assert len(sent) == 2
+    assert 'rateLimit' in sent[0]['query']
+    assert sum(clock.slept) == 5
+
+
+def pool_of(clock, *tokens):
+    return TokenPool(list(tokens), lambda: RateLimiter(pace=False, clock=clock, sleep=clock.sleep))
+
+
+def test_pool_prefers_the_token_with_the_most_budget(clock):
+    pool = pool_of(clock, 'a', 'b', 'c')
+    pool.limiters['a'].observe({'data': {'rateLimit': rate(10)}})
+    pool.limiters['b'].observe({'data': {'rateLimit': rate(900)}})
+    pool.limiters['c'].observe({'data': {'rateLimit': rate(50)}})
+
+    assert pool.checkout()[0] == 'b'
+
+
+def test_pool_skips_an_exhausted_token(clock):
+    pool = pool_of(clock, 'a', 'b')
+    pool.limiters['a'].observe({'data': {'rateLimit': rate(0)}})
+    pool.limiters['b'].observe({'data': {'rateLimit': rate(1)}})
+
+    assert pool.checkout()[0] == 'b'
+
+
+def test_pool_moves_on_from_a_refused_token_without_waiting(clock):
+    pool = pool_of(clock, 'a', 'b')
+    used = []
+
+    def send(query, token):
+        used.append(token)
+        if token == 'a':
+            return {'errors': [{'type': 'RATE_LIMITED'}]}, {'Retry-After': '60'}
+        return {'data': {'viewer': {'login': 'octocat'}, 'rateLimit': rate(100)}}, {}
+
+    payloads = [pool.post(send, {'query': 'query { viewer { login } }'}) for _ in range(3)]
+
+    assert used == ['a', 'b', 'b', 'b']
+    assert payloads[-1] == {'data': {'viewer': {'login': 'octocat'}}}
+    assert clock.slept == []
+
+
+def test_pool_waits_only_once_every_token_is_exhausted(clock):
+    pool = pool_of(clock, 'a', 'b')
+    pool.limiters['a'].observe({'data': {'rateLimit': rate(0, reset='1970-01-01T00:20:00Z')}})
+    pool.limiters['b'].observe({'data': {'rateLimit': rate(0)}})
+
+    def send(query, token):
+        return {'data': {'rateLimit': rate(4999, reset='1970-01-01T01:18:20Z')}}, {}
+
+    pool.post(send, {'query': 'query { viewer { login } }'})
+
+    # b resets first, at 1100
+    assert clock.slept == [100]
+
+
+def test_pool_requires_a_token():
+    with pytest.raises(ValueError):
+        TokenPool([])
+
+
+def test_pool_from_config_prefers_the_token_list():
+    config = ConfigParser()
+    config.read_dict({'Github': {'personal_access_token': 'single',
+                                 'personal_access_tokens': 'one, two,,three'}})
+
+    assert list(TokenPool.from_config(config).limiters) == ['one', 'two', 'three']
+
+    config['Github']['personal_access_tokens'] = ''
+    assert list(TokenPool.from_config(config).limiters) == ['single']
+
+
+def test_default_pool_is_built_from_collectors_cfg():
+    ratelimit.set_token_pool(None)
+    config = ConfigParser()
+    config.read(os.path.join(LOCAL_DIR, 'collectors.cfg'))
+
+    pool = ratelimit.get_token_pool()
+
+    assert list(pool.limiters) == list(TokenPool.from_config(config).limiters)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+from configparser import ConfigParser
+
+import pytest
+import requests
+
+import ratelimit
+import retry
+import transport
+from retry import CircuitBreaker, FatalError, RetryableError, RetryPolicy
+from User import User
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def response(status=200, text=None, headers=None):
+    body = json.dumps({'data': {'viewer': {'login': 'octocat'}}}) if text is None else text
+    return type('Response', (object,), {'status_code': status, 'text': body,
+                                        'headers': headers or {}})()
+
+
+def decode(reply):
+    return retry.decode(reply.text, reply.headers, reply.status_code)
+
+
+class ScriptedTransport(object):
+    """Replies with each scripted response or exception in turn"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.posts = 0
+
+    def post(self, query, headers=None):
+        self.posts += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def policy(clock):
+    return RetryPolicy(max_attempts=4, backoff_base=1, backoff_cap=8,
+                       breaker=CircuitBreaker(failure_threshold=10, reset_timeout=30, clock=clock),
+                       sleep=clock.sleep, rand=lambda: 0.5)
+
+
+@pytest.mark.parametrize('reply', [
+    response(502, '<html>Bad Gateway</html>'),
+    response(200, '<html>truncated'),
+])
+def test_transient_failures_are_retryable(reply):
+    with pytest.raises(RetryableError):
+        decode(reply)
+
+
+@pytest.mark.parametrize('reply', [
+    response(403, '{"message": "You have exceeded a secondary rate limit"}'),
+    response(403, 'slow down', {'Retry-After': '7'}),
+    response(403, '{"message": "API rate limit exceeded"}', {'X-RateLimit-Remaining': '0'}),
+    response(429, '<html>Too Many Requests</html>'),
+])
+def test_rate_limit_refusals_are_left_to_the_rate_limiter(reply):
+    assert decode(reply)['errors'][0]['type'] == 'RATE_LIMITED'
+
+
+def test_other_client_errors_are_fatal():
+    with pytest.raises(FatalError):
+        decode(response(401, '{"message": "Bad credentials"}'))
+
+
+def test_backoff_is_exponential_with_jitter_and_capped(policy):
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [0.5, 1, 2, 4, 4]
+
+
+def test_retry_after_is_honored(policy, clock):
+    replies = [response(503, 'unavailable', {'Retry-After': '7'}), response()]
+    payload = policy.call(lambda: decode(replies.pop(0)))
+    assert payload['data']['viewer']['login'] == 'octocat'
+    assert clock.slept == [7.0]
+
+
+def test_timeouts_are_retried_until_attempts_run_out(policy, clock):
+    def send():
+        raise requests.exceptions.ReadTimeout('read timed out')
+    with pytest.raises(RetryableError):
+        policy.call(send)
+    assert clock.slept == [0.5, 1, 2]
+
+
+def test_async_calls_are_retried(policy):
+    replies = [asyncio.TimeoutError(), response()]
+
+    async def send():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return decode(reply)
+    policy._rand = lambda: 0
+    payload = asyncio.run(policy.call_async(send))
+    assert payload['data']['viewer']['login'] == 'octocat'
+    assert replies == []
+
+
+def test_fatal_errors_are_not_retried(policy, clock):
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise FatalError('HTTP 401')
+    with pytest.raises(FatalError):
+        policy.call(send)
+    assert len(calls) == 1 and clock.slept == []
+
+
+def test_breaker_opens_then_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.wait_time() == 0
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.wait_time() == 30
+    clock.now += 30
+    assert breaker.wait_time() == 0
+    assert breaker.state == 'half-open'
+    assert 0 < breaker.wait_time() <= 1
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 30
+    assert breaker.wait_time() == 0
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.wait_time() == 0
+
+
+def test_an_open_breaker_waits_without_sending(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    policy = RetryPolicy(max_attempts=2, breaker=breaker, sleep=clock.sleep, rand=lambda: 0)
+    breaker.record_failure()
+    sent = []
+    assert policy.call(lambda: sent.append(clock.now) or 'ok') == 'ok'
+    assert sent == [1030.0]
+
+
+def test_an_open_breaker_gives_up_after_max_wait(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=600, clock=clock)
+    policy = RetryPolicy(max_wait=60, breaker=breaker, sleep=clock.sleep)
+    breaker.record_failure()
+    with pytest.raises(RetryableError):
+        policy.call(lambda: 'never sent')
+    assert sum(clock.slept) == 60
+
+
+def test_send_retries_a_bad_gateway():
+    scripted = ScriptedTransport(response(502, '<html>Bad Gateway</html>'),
+                                 requests.exceptions.ConnectTimeout('connect timed out'),
+                                 response())
+    transport.set_transport(scripted)
+    payload, _ = User._from_response(None)._send({'query': '{ viewer { login } }'})
+    assert payload['data']['viewer']['login'] == 'octocat'
+    assert scripted.posts == 3
+
+
+def test_a_refused_token_is_left_for_another_without_retrying_it():
+    class Recording(ScriptedTransport):
+        def post(self, query, headers=None):
+            self.tokens = getattr(self, 'tokens', []) + [headers['Authorization']]
+            return super().post(query, headers)
+    scripted = Recording(response(403, 'secondary rate limit', {'Retry-After': '60'}), response())
+    transport.set_transport(scripted)
+    ratelimit.set_token_pool(ratelimit.TokenPool(
+        ['a', 'b'], lambda: ratelimit.RateLimiter(inject=False, sleep=lambda seconds: None)))
+    user = User._from_response(None)
+    payload = user._post({'query': '{ viewer { login } }'})
+    assert payload['data']['viewer']['login'] == 'octocat'
+    assert scripted.tokens == ['token a', 'token b']
+    assert user.token_pool.limiters['a'].wait_time() > 0
+
+
+def test_send_reports_a_failure_as_a_graphql_error():
+    transport.set_transport(ScriptedTransport(response(401, '{"message": "Bad credentials"}')))
+    payload, _ = User._from_response(None)._send({'query': '{ viewer { login } }'})
+    assert payload['errors'][0]['type'] == 'FatalError'
+
+
+def test_from_config():
+    config = ConfigParser()
+    config.read_dict({'Retry': {'max_attempts': '3', 'breaker_failures': '7', 'breaker_reset': '10'}})
+    policy = RetryPolicy.from_config(config)
+    assert policy.max_attempts == 3
+    assert (policy.breaker.failure_threshold, policy.breaker.reset_timeout) == (7, 10)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import logging.config
+
+import identity
+import ratelimit
+import retry
+import settings
+import transport
+from templates import TEMPLATES
+from User import User
+
+CONFIG = """
+[Github]
+personal_access_token = abc123
+log_file = {log_file}
+
+[loggers]
+keys=root
+
+[handlers]
+keys=console
+
+[formatters]
+keys=
+
+[logger_root]
+level=INFO
+handlers=console
+
+[handler_console]
+class=NullHandler
+args=()
+"""
+
+
+def test_settings_are_read_from_disk_once(monkeypatch):
+    settings.set_settings(None)
+    reads = []
+    from_file = settings.Settings.from_file.__func__
+    monkeypatch.setattr(settings.Settings, 'from_file',
+                        classmethod(lambda cls, *args: reads.append(args) or from_file(cls, *args)))
+    monkeypatch.setattr(settings.Settings, 'configure_logging', lambda self: None)
+
+    first = settings.get_settings()
+    second = settings.get_settings()
+
+    assert first is second
+    assert len(reads) == 1
+
+
+def test_objects_do_not_reconfigure_logging(monkeypatch):
+    calls = []
+    monkeypatch.setattr(logging.config, 'fileConfig', lambda *args, **kwargs: calls.append(args))
+
+    users = [User._from_response(None) for _ in range(50)]
+
+    assert calls == []
+    assert all(user.config is settings.get_settings().config for user in users)
+    assert users[0].logger is users[-1].logger
+
+
+def test_reload_settings_rereads_the_file(tmp_path):
+    path = tmp_path / 'collectors.cfg'
+    path.write_text(CONFIG.format(log_file=tmp_path / 'github.log'))
+
+    reloaded = settings.reload_settings(str(path))
+
+    assert settings.get_settings() is reloaded
+    assert reloaded.api_token == 'abc123'
+    assert reloaded.headers['Authorization'] == 'token abc123'
+    assert User._from_response(None).api_token == 'abc123'
+
+
+def test_reload_settings_rebuilds_the_shared_objects(tmp_path):
+    path = tmp_path / 'collectors.cfg'
+    path.write_text(CONFIG.format(log_file=tmp_path / 'github.log') +
+                    '\n[Retry]\nmax_attempts = 2\n\n[Identity]\nmax_size = 7\n'
+                    '\n[Templates]\nprofile = minimal\n')
+    previous = (transport.get_transport(), ratelimit.get_token_pool())
+
+    settings.reload_settings(str(path))
+
+    assert (transport.get_transport(), ratelimit.get_token_pool()) != previous
+    assert list(ratelimit.get_token_pool().limiters) == ['abc123']
+    assert retry.get_retry_policy().max_attempts == 2
+    assert identity.get_identity_map().max_size == 7
+    assert TEMPLATES.profile == 'minimal'
+    path.write_text(CONFIG.format(log_file=tmp_path / 'github.log'))
+    settings.reload_settings(str(path))
+    assert TEMPLATES.profile == 'full'
+
+
+def test_settings_tolerate_a_missing_github_section():
+    config = settings.Settings.from_file('/nonexistent/collectors.cfg')
+
+    assert config.api_token == ''
+    config.configure_logging()
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import threading
+import time
+from configparser import ConfigParser
+
+import pytest
+from elasticsearch.exceptions import ConnectionError as ESConnectionError
+
+from sink import BulkSink
+
+
+class FakeIndices(object):
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh(self, index):
+        self.refreshed.append(index)
+
+
+class FakeElasticsearch(object):
+    """Records bulk bodies and accepts every document unless told otherwise"""
+
+    def __init__(self, reject=(), fail=False):
+        self.bodies = []
+        self.refresh_args = []
+        self.reject = reject
+        self.fail = fail
+        self.indices = FakeIndices()
+
+    def bulk(self, body, refresh='false'):
+        if self.fail:
+            raise ESConnectionError('N/A', 'connection refused', None)
+        self.bodies.append(body)
+        self.refresh_args.append(refresh)
+        lines = body.strip().split('\n')
+        items = []
+        for position in range(0, len(lines), 2):
+            action = json.loads(lines[position])['index']
+            document = json.loads(lines[position + 1])
+            if document.get('id') in self.reject:
+                items.append({'index': dict(action, status=400, error={'type': 'mapper_parsing_exception'})})
+            else:
+                items.append({'index': dict(action, status=201)})
+        return {'errors': any('error' in item['index'] for item in items), 'items': items}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_documents_are_sent_in_one_bulk_request_per_batch():
+    client = FakeElasticsearch()
+    sink = BulkSink(client, max_docs=3, max_age=60)
+
+    for number in range(7):
+        sink.add('gh_followers-2019-05-01', 'GithubFollowers', {'id': number})
+
+    assert len(client.bodies) == 2
+    assert sink.pending == 1
+    lines = client.bodies[0].strip().split('\n')
+    assert json.loads(lines[0]) == {'index': {'_index': 'gh_followers-2019-05-01', '_type': 'GithubFollowers'}}
+    assert json.loads(lines[1]) == {'id': 0}
+    assert sink.close() is True
+    assert sink.indexed == 7 and sink.requests == 3
+
+
+def test_buffers_flush_by_size_and_age():
+    client = FakeElasticsearch()
+    clock = Clock()
+    sink = BulkSink(client, max_docs=100, max_bytes=10 ** 6, max_age=5, clock=clock,
+                    autoflush=False)
+
+    sink.add('index', 'Doc', {'id': 1})
+    clock.now = 4.9
+    sink.add('index', 'Doc', {'id': 2})
+    assert client.bodies == []
+    clock.now = 5.0
+    sink.add('index', 'Doc', {'id': 3})
+    assert len(client.bodies) == 1 and sink.pending == 0
+
+    small = BulkSink(client, max_docs=100, max_bytes=100, max_age=60)
+    small.add('index', 'Doc', {'id': 'x' * 100})
+    assert len(client.bodies) == 2
+
+
+@pytest.mark.parametrize('policy, per_flush, at_end', [
+    ('none', 'false', []),
+    ('flush', 'wait_for', []),
+    ('end', 'false', ['a,b']),
+])
+def test_refresh_policies(policy, per_flush, at_end):
+    client = FakeElasticsearch()
+    sink = BulkSink(client, refresh=policy)
+    sink.add('b', 'Doc', {'id': 1})
+    sink.add('a', 'Doc', {'id': 2})
+
+    sink.close()
+
+    assert client.refresh_args == [per_flush]
+    assert client.indices.refreshed == at_end
+
+
+def test_unknown_refresh_policy_is_refused():
+    with pytest.raises(ValueError):
+        BulkSink(FakeElasticsearch(), refresh='always')
+
+
+def test_rejected_items_are_logged(caplog):
+    client = FakeElasticsearch(reject=(2,))
+    sink = BulkSink(client, logger=logging.getLogger('test_sink'))
+    for number in range(3):
+        sink.add('index', 'Doc', {'id': number})
+
+    with caplog.at_level(logging.ERROR, logger='test_sink'):
+        assert sink.flush() is False
+
+    assert sink.indexed == 2 and sink.failed == 1
+    assert 'mapper_parsing_exception' in caplog.text
+    assert '{"id": 2}' in caplog.text
+
+
+def test_failed_requests_are_counted_and_logged(caplog):
+    sink = BulkSink(FakeElasticsearch(fail=True), logger=logging.getLogger('test_sink'))
+    sink.add('index', 'Doc', {'id': 1})
+
+    with caplog.at_level(logging.ERROR, logger='test_sink'):
+        assert sink.close() is False
+
+    assert sink.failed == 1 and sink.pending == 0
+    assert 'bulk indexing 1 documents' in caplog.text
+
+
+def test_from_config():
+    config = ConfigParser()
+    config.read_string('[Elasticsearch]\nbulk_docs = 50\nbulk_age = 1.5\nrefresh = none\n')
+
+    sink = BulkSink.from_config(FakeElasticsearch(), config)
+
+    assert (sink.max_docs, sink.max_age, sink.refresh) == (50, 1.5, 'none')
+    assert BulkSink.from_config(FakeElasticsearch(), ConfigParser()).refresh == 'end'
+
+
+def test_callbacks_of_a_request_run_inside_one_context():
+    from contextlib import contextmanager
+    events = []
+
+    @contextmanager
+    def batch():
+        events.append('enter')
+        yield
+        events.append('exit')
+
+    sink = BulkSink(FakeElasticsearch(), callback_context=batch)
+    sink.add('index', 'Doc', {'id': 1}, on_flush=lambda stored: events.append(('doc', 1, stored)))
+    sink.add('index', 'Doc', {'id': 2}, on_flush=lambda stored: events.append(('doc', 2, stored)))
+    sink.flush()
+
+    assert events == ['enter', ('doc', 1, True), ('doc', 2, True), 'exit']
+
+
+def test_old_documents_are_flushed_without_further_adds():
+    client = FakeElasticsearch()
+    sink = BulkSink(client, max_docs=100, max_age=0.05)
+    stored = threading.Event()
+
+    sink.add('index', 'Doc', {'id': 1}, on_flush=lambda ok: stored.set())
+
+    assert stored.wait(5)
+    assert len(client.bodies) == 1 and sink.pending == 0
+    sink.close()
+    assert not sink._flusher.is_alive()
+
+
+def test_items_missing_from_the_response_count_as_failed(caplog):
+    class ShortResponse(FakeElasticsearch):
+        def bulk(self, body, refresh='false'):
+            response = super(ShortResponse, self).bulk(body, refresh)
+            response['items'] = response['items'][:1]
+            return response
+
+    outcomes = []
+    sink = BulkSink(ShortResponse(), logger=logging.getLogger('test_sink'))
+    for number in range(3):
+        sink.add('index', 'Doc', {'id': number}, on_flush=outcomes.append)
+
+    with caplog.at_level(logging.ERROR, logger='test_sink'):
+        assert sink.flush() is False
+    assert (sink.indexed, sink.failed) == (1, 2)
+    assert outcomes == [True, False, False]
+    assert 'missing 2 of 3' in caplog.text
+
+
+def test_documents_can_be_added_while_a_request_is_sent():
+    class SlowElasticsearch(FakeElasticsearch):
+        def __init__(self):
+            super(SlowElasticsearch, self).__init__()
+            self.sending = threading.Event()
+            self.release = threading.Event()
+
+        def bulk(self, body, refresh='false'):
+            self.sending.set()
+            self.release.wait(5)
+            return super(SlowElasticsearch, self).bulk(body, refresh)
+
+    client = SlowElasticsearch()
+    outcomes = []
+    sink = BulkSink(client, max_docs=100, max_age=60, autoflush=False)
+    sink.add('index', 'Doc', {'id': 1}, on_flush=lambda ok: outcomes.append(1))
+    sender = threading.Thread(target=sink.flush)
+    sender.start()
+    assert client.sending.wait(5)
+
+    started = time.monotonic()
+    sink.add('index', 'Doc', {'id': 2}, on_flush=lambda ok: outcomes.append(2))
+    assert time.monotonic() - started < 1 and sink.pending == 1
+    assert sink.outstanding == 2
+    client.release.set()
+    sender.join(5)
+    sink.close()
+
+    assert outcomes == [1, 2] and sink.indexed == 2 and sink.outstanding == 0
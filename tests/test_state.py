@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+from configparser import ConfigParser
+
+import pytest
+
+from fakes import FakeRedis
+from state import CursorStore, MemoryCursorStore, RedisCursorStore, SQLiteCursorStore
+
+
+def test_a_login_is_read_with_one_round_trip():
+    redis = FakeRedis()
+    redis.hset('gh:octocat', 'followers:endCursor', 'c1')
+    redis.hset('gh:octocat', 'gists:endCursor', 'g1')
+    store = RedisCursorStore(redis)
+    redis.round_trips = 0
+
+    assert store.get('octocat', 'followers') == 'c1'
+    assert store.get('octocat', 'gists') == 'g1'
+    assert store.get('octocat', 'issues') is None
+    assert redis.round_trips == 1
+
+
+def test_preload_reads_a_batch_of_logins_in_one_round_trip():
+    redis = FakeRedis()
+    for number in range(20):
+        redis.hset('gh:user%d' % number, 'followers:endCursor', 'c%d' % number)
+    store = RedisCursorStore(redis)
+    redis.round_trips = 0
+
+    store.preload(['user%d' % number for number in range(20)])
+    cursors = [store.get('user%d' % number, 'followers') for number in range(20)]
+
+    assert cursors == ['c%d' % number for number in range(20)]
+    assert redis.round_trips == 1
+
+
+def test_writes_inside_a_pipeline_block_are_sent_together():
+    redis = FakeRedis()
+    store = RedisCursorStore(redis)
+
+    with store.pipeline():
+        for number in range(10):
+            store.set('octocat', 'followers', 'c%d' % number)
+            store.set('hubot', 'gists', 'g%d' % number)
+        assert redis.hashes == {}
+
+    assert redis.round_trips == 1
+    assert redis.hget('gh:octocat', 'followers:endCursor') == b'c9'
+    assert redis.hget('gh:hubot', 'gists:endCursor') == b'g9'
+
+
+def test_writes_outside_a_pipeline_block_are_sent_immediately():
+    redis = FakeRedis()
+    store = RedisCursorStore(redis)
+    store.get('octocat', 'followers')
+
+    store.set('octocat', 'followers', 'c1')
+
+    assert redis.hget('gh:octocat', 'followers:endCursor') == b'c1'
+    assert store.get('octocat', 'followers') == 'c1'
+
+
+def test_old_per_connection_keys_are_migrated():
+    redis = FakeRedis()
+    redis.set('gh:octocat:followers:endCursor', 'c1')
+    redis.set('gh:octocat:gists:endCursor', 'g1')
+    store = RedisCursorStore(redis, connections=['followers', 'gists', 'issues'])
+
+    assert store.get('octocat', 'followers') == 'c1'
+
+    assert redis.strings == {}
+    assert redis.hget('gh:octocat', 'gists:endCursor') == b'g1'
+
+
+def test_preload_of_logins_never_crawled_is_still_one_round_trip():
+    redis = FakeRedis()
+    redis.set('gh:user3:followers:endCursor', 'c3')
+    store = RedisCursorStore(redis, connections=['followers', 'gists'])
+    redis.round_trips = 0
+
+    store.preload(['user%d' % number for number in range(20)])
+
+    # one pipelined read, and one pipelined migration of the login with old keys
+    assert redis.round_trips == 2
+    assert store.get('user3', 'followers') == 'c3' and store.get('user4', 'followers') is None
+    assert redis.round_trips == 2
+
+
+def test_cached_logins_are_bounded():
+    store = RedisCursorStore(FakeRedis(), max_cached=2)
+    for login in ('a', 'b', 'c'):
+        store.get(login, 'followers')
+
+    assert list(store._cache) == ['b', 'c']
+    store.forget('b')
+    assert list(store._cache) == ['c']
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def committed(path, login, connection):
+    """Reads a cursor through a separate connection, which only sees commits"""
+    import sqlite3
+    row = sqlite3.connect(path).execute(
+        'SELECT cursor FROM cursors WHERE login = ? AND connection = ?', (login, connection)).fetchone()
+    return row[0] if row else None
+
+
+def test_sqlite_store_uses_wal_and_batches_commits(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+    clock = Clock()
+    store = SQLiteCursorStore(path, commit_every=3, commit_interval=60, clock=clock)
+
+    store.set('octocat', 'followers', 'c1')
+    store.set('octocat', 'followers', 'c2')
+    assert store.get('octocat', 'followers') == 'c2'
+    assert committed(path, 'octocat', 'followers') is None
+    store.set('octocat', 'gists', 'g1')
+    assert committed(path, 'octocat', 'followers') == 'c2'
+
+    store.set('octocat', 'issues', 'i1')
+    clock.now = 60
+    store.set('octocat', 'issues', 'i2')
+    assert committed(path, 'octocat', 'issues') == 'i2'
+
+    mode = store._db.execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal'
+
+
+def test_sqlite_pipeline_commits_once_at_the_end(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+    store = SQLiteCursorStore(path, commit_every=1)
+
+    with store.pipeline():
+        store.set('octocat', 'followers', 'c1')
+        store.set('hubot', 'followers', 'h1')
+        assert committed(path, 'octocat', 'followers') is None
+
+    assert committed(path, 'hubot', 'followers') == 'h1'
+    store.set('octocat', 'followers', 'c2')
+    store.close()
+    assert SQLiteCursorStore(path).get('octocat', 'followers') == 'c2'
+
+
+def test_memory_store():
+    store = MemoryCursorStore()
+    with store.pipeline():
+        store.set('octocat', 'followers', 'c1')
+
+    assert store.get('octocat', 'followers') == 'c1'
+    assert store.get('octocat', 'gists') is None
+
+
+def test_from_config(tmp_path):
+    config = ConfigParser()
+    config.read_string('[State]\nbackend = sqlite\npath = {}\ncommit_every = 7\n'
+                       .format(tmp_path / 'state.sqlite3'))
+    assert CursorStore.from_config(config).commit_every == 7
+
+    config['State']['backend'] = 'memory'
+    assert isinstance(CursorStore.from_config(config), MemoryCursorStore)
+
+    config['State']['backend'] = 'redis'
+    config['State']['port'] = '6380'
+    store = CursorStore.from_config(config, connections=['followers'])
+    assert isinstance(store, RedisCursorStore) and store.connections == ('followers',)
+    assert store.client.connection_pool.connection_kwargs['port'] == 6380
+
+    config['State']['backend'] = 'mongodb'
+    with pytest.raises(ValueError):
+        CursorStore.from_config(config)
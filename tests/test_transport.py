@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from configparser import ConfigParser
+
+from transport import Transport
+
+
+class RecordingSession(object):
+    def __init__(self):
+        self.posts = []
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, **kwargs):
+        self.posts.append(kwargs)
+
+
+def test_every_post_carries_the_configured_timeouts():
+    config = ConfigParser()
+    config.read_dict({'Transport': {'connect_timeout': '3', 'read_timeout': '20'}})
+    session = RecordingSession()
+    transport = Transport.from_config(config)
+    transport.session = session
+
+    transport.post({'query': '{ viewer { login } }'})
+
+    assert session.posts[0]['timeout'] == (3.0, 20.0)
+
+
+def test_timeouts_default_when_unconfigured():
+    assert Transport(session=RecordingSession()).timeout == (10.0, 60.0)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import threading
+from configparser import ConfigParser
+
+import pytest
+
+from fakes import FakeRedis
+from workqueue import PROFILE, Heartbeat, MemoryWorkQueue, QueueWorker, RedisWorkQueue, WorkQueue
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def queue(request):
+    clock = Clock()
+    if request.param == 'memory':
+        instance = MemoryWorkQueue(lease_seconds=60, max_attempts=3, clock=clock)
+    else:
+        instance = RedisWorkQueue(FakeRedis(), lease_seconds=60, max_attempts=3, clock=clock)
+    instance.clock_ = clock
+    return instance
+
+
+def test_jobs_are_queued_once_and_leased_in_order(queue):
+    assert queue.enqueue_logins(['octocat', 'hubot'], connections=['followers', 'gists']) == 4
+    assert queue.enqueue([('octocat', 'followers')]) == 0
+    leases = [queue.lease() for _ in range(5)]
+    assert [(lease.login, lease.connection) for lease in leases[:4]] == [
+        ('octocat', 'followers'), ('octocat', 'gists'), ('hubot', 'followers'), ('hubot', 'gists')]
+    assert leases[4] is None
+    assert queue.counts()['leased'] == 4
+
+
+def test_completion_is_exactly_once(queue):
+    queue.enqueue([('octocat', 'followers')])
+    lease = queue.lease()
+    assert queue.complete(lease)
+    assert not queue.complete(lease)
+    assert queue.enqueue([('octocat', 'followers')]) == 0
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'complete': 1, 'failed': 0}
+
+
+def test_expired_leases_are_queued_again(queue):
+    queue.enqueue([('octocat', 'followers')])
+    first = queue.lease()
+    queue.clock_.now += 30
+    assert queue.heartbeat(first)
+    queue.clock_.now += 59
+    assert queue.lease() is None
+    queue.clock_.now += 2
+    second = queue.lease()
+    assert (second.login, second.attempt) == ('octocat', 2)
+    assert second.token != first.token
+    assert not queue.heartbeat(first)
+    # the first worker finishing late still completes the job, but only once
+    assert queue.complete(first)
+    assert not queue.complete(second)
+
+
+def test_a_job_that_keeps_failing_is_set_aside(queue):
+    queue.enqueue([('octocat', 'followers')])
+    for attempt in range(1, 4):
+        lease = queue.lease()
+        assert lease.attempt == attempt
+        assert queue.fail(lease) == (attempt < 3)
+    assert queue.lease() is None
+    assert queue.counts()['failed'] == 1
+
+
+def test_a_job_taken_by_a_worker_that_died_before_leasing_is_recovered():
+    clock = Clock()
+    redis = FakeRedis()
+    queue = RedisWorkQueue(redis, lease_seconds=60, clock=clock)
+    queue.enqueue([('octocat', 'followers')])
+    redis.rpoplpush(queue.keys['pending'], queue.keys['active'])
+    assert queue.lease() is None
+    clock.now += 61
+    assert queue.lease().login == 'octocat'
+
+
+def test_orphans_are_looked_for_once_a_lease():
+    clock = Clock()
+    redis = FakeRedis()
+    queue = RedisWorkQueue(redis, lease_seconds=60, clock=clock)
+    scans = []
+    lrange = redis._lrange
+    redis._lrange = lambda *args: scans.append(args) or lrange(*args)
+    queue.enqueue_logins(['user%d' % number for number in range(5)], connections=['followers'])
+    while queue.lease() is not None:
+        clock.now += 1
+    assert len(scans) == 1
+    clock.now += 60
+    queue.lease()
+    assert len(scans) == 2
+
+
+def test_failing_a_lease_another_node_requeued_meanwhile_queues_it_once():
+    clock = Clock()
+    redis = FakeRedis()
+    queue = RedisWorkQueue(redis, lease_seconds=60, clock=clock)
+    other = RedisWorkQueue(redis, lease_seconds=60, clock=clock)
+    queue.enqueue([('octocat', 'followers')])
+    lease = queue.lease()
+    clock.now += 61
+    zscore = redis._zscore
+
+    def zscore_then_requeue(*args):
+        # the other node reaps the expired lease between this node's read and write
+        redis._zscore = zscore
+        score = zscore(*args)
+        other.requeue_expired()
+        return score
+    redis._zscore = zscore_then_requeue
+    assert queue.fail(lease) is False
+    assert redis.lrange(queue.keys['pending'], 0, -1) == [b'octocat:followers']
+    assert redis.lrange(queue.keys['active'], 0, -1) == []
+
+
+def test_concurrent_workers_lease_each_job_once():
+    queue = MemoryWorkQueue()
+    queue.enqueue(('user%d' % number, 'followers') for number in range(200))
+    leased = []
+
+    def take():
+        lease = queue.lease()
+        while lease is not None:
+            leased.append(lease.login)
+            queue.complete(lease)
+            lease = queue.lease()
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased) == sorted('user%d' % number for number in range(200))
+
+
+class FakeCollector(object):
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.saved = []
+        self.flushes = 0
+        self.forgotten = []
+
+    def save_connection(self, user, connection, path=None, deadline=None):
+        if (user, connection) in self.failing:
+            raise TypeError("'NoneType' object is not subscriptable")
+        self.saved.append((user, connection))
+        return True
+
+    def save_user(self, user, path=None):
+        self.saved.append((user, PROFILE))
+        return True
+
+    def flush(self):
+        self.flushes += 1
+        return True
+
+    def forget(self, login):
+        self.forgotten.append(login)
+
+
+def test_worker_crawls_until_the_queue_is_empty(queue):
+    queue.enqueue_logins(['octocat', 'hubot'], connections=['followers', 'gists'])
+    collector = FakeCollector(failing=[('hubot', 'gists')])
+    built = []
+
+    def user_factory(login):
+        built.append(login)
+        return login
+    done = QueueWorker(collector, queue, user_factory=user_factory).run()
+    assert done == {'completed': 3, 'failed': 3}
+    assert built == ['octocat', 'hubot']
+    assert queue.counts()['failed'] == 1
+
+
+def test_worker_saves_profiles_and_flushes_every_few_jobs(queue):
+    queue.enqueue_logins(['octocat'])
+    collector = FakeCollector()
+    worker = QueueWorker(collector, queue, user_factory=lambda login: login, flush_every=4)
+    done = worker.run()
+    jobs = queue.counts()['complete']
+    assert collector.saved[0] == ('octocat', PROFILE)
+    assert done == {'completed': jobs, 'failed': 0} and jobs == len(collector.saved)
+    assert collector.flushes == -(-jobs // 4)
+    assert collector.forgotten == ['octocat'] * jobs
+
+
+def test_worker_fails_the_jobs_of_a_failed_flush(queue):
+    queue.enqueue_logins(['octocat'], connections=['followers', 'gists'])
+    collector = FakeCollector()
+    collector.flush = lambda: False
+    assert QueueWorker(collector, queue, user_factory=lambda login: login).run(max_jobs=2) == \
+            {'completed': 0, 'failed': 2}
+    assert queue.counts()['pending'] == 2
+
+
+def test_heartbeat_renews_the_lease_while_a_job_runs():
+    queue = MemoryWorkQueue(lease_seconds=60)
+    queue.enqueue([('octocat', 'followers')])
+    lease = queue.lease()
+    renewed = threading.Event()
+    original = queue.heartbeat
+
+    def heartbeat(claim):
+        renewed.set()
+        return original(claim)
+    queue.heartbeat = heartbeat
+    with Heartbeat(queue, lease, interval=0.01) as beat:
+        assert renewed.wait(1)
+    assert not beat.lost
+
+
+def test_from_config_selects_the_backend():
+    config = ConfigParser()
+    config.read_dict({'Queue': {'backend': 'memory', 'lease_seconds': '30'}})
+    queue = WorkQueue.from_config(config)
+    assert isinstance(queue, MemoryWorkQueue)
+    assert queue.lease_seconds == 30
+    config['Queue']['backend'] = 'carrier pigeon'
+    with pytest.raises(ValueError):
+        WorkQueue.from_config(config)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+transport.py - the shared HTTP transport used by every GithubObject
+
+All GithubObjects send their GraphQL queries through a single, process-wide
+Transport instead of calling requests.post directly.  The Transport keeps a
+pool of keep-alive connections to the endpoint so consecutive queries (and
+consecutive pages of a connection) reuse an open TLS connection rather than
+paying for a fresh handshake on every call.  Every request carries a connect
+and a read timeout, so a connection that hangs raises requests.Timeout (which
+the retry policy retries) instead of freezing its thread.
+
+The transport is injectable: anything with a post(query, headers) method that
+returns an object with a .text attribute can be installed with set_transport(),
+which lets a test suite point every GithubObject at a local stand-in server.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import settings
+
+ENDPOINT = 'https://api.github.com/graphql'
+# Seconds to wait for a connection to open, and for each read from it
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 60.0
+
+_lock = threading.Lock()
+_transport = None
+
+
+class Transport(object):
+    """A pooled, keep-alive HTTP transport for the Github GraphQL endpoint."""
+
+    def __init__(self, endpoint=ENDPOINT, pool_connections=1, pool_maxsize=10,
+                 pool_block=False, session=None, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT):
+        """
+        Arguments:
+            endpoint (str) - the url GraphQL queries are posted to
+
+        Keyword Arguments:
+            pool_connections (int) - the number of distinct hosts to keep connection pools for
+            pool_maxsize (int) - the maximum number of keep-alive connections kept open to
+                    the endpoint; this should be at least the number of threads
+                    issuing queries concurrently
+            pool_block (Boolean) - if True, callers wait for a free connection when the pool is
+                    exhausted instead of opening a throwaway connection
+            session (requests.Session) - an existing session to mount the pool on
+            connect_timeout (float) - seconds to wait for a connection to open
+            read_timeout (float) - seconds to wait between bytes of the response;
+                    a server that goes quiet for longer raises requests.Timeout
+        """
+        self.endpoint = endpoint
+        self.timeout = (float(connect_timeout), float(read_timeout))
+        self.session = session if session is not None else requests.Session()
+        adapter = HTTPAdapter(pool_connections=int(pool_connections),
+                              pool_maxsize=int(pool_maxsize),
+                              pool_block=pool_block)
+        # http:// is mounted as well so a local stand-in server can be used
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __repr__(self):
+        return 'Transport(endpoint={!r})'.format(self.endpoint)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a Transport from the [Transport] section of collectors.cfg.
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            Transport - a transport using the configured endpoint, pool sizes and
+                    timeouts
+        """
+        if not config.has_section('Transport'):
+            return cls()
+        section = config['Transport']
+        return cls(endpoint=section.get('endpoint', ENDPOINT),
+                   pool_connections=section.getint('pool_connections', 1),
+                   pool_maxsize=section.getint('pool_maxsize', 10),
+                   pool_block=section.getboolean('pool_block', False),
+                   connect_timeout=section.getfloat('connect_timeout', CONNECT_TIMEOUT),
+                   read_timeout=section.getfloat('read_timeout', READ_TIMEOUT))
+
+    def post(self, query, headers=None):
+        """Posts a GraphQL query to the endpoint over a pooled connection.
+
+        Arguments:
+            query (dict) - the json payload, i.e. {"query": "..."}
+
+        Keyword Arguments:
+            headers (dict) - request headers such as the Authorization token
+
+        Returns:
+            requests.Response - the raw response from the endpoint
+
+        Raises:
+            requests.Timeout - if the connection does not open or the response
+                    stalls within the transport's timeouts
+        """
+        return self.session.post(url=self.endpoint, json=query, headers=headers,
+                                 timeout=self.timeout)
+
+    def close(self):
+        """Closes every pooled connection held by this transport"""
+        self.session.close()
+
+
+def get_transport(config=None):
+    """Returns the process-wide transport, creating it on first use.
+
+    Arguments:
+        config (ConfigParser) - optional parsed collectors.cfg used to build the
+                transport the first time it is requested
+
+    Returns:
+        Transport - the shared transport
+    """
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = Transport.from_config(config) if config is not None else Transport()
+    return _transport
+
+
+def set_transport(transport):
+    """Replaces the process-wide transport, i.e. with a stand-in for tests.
+
+    Arguments:
+        transport - any object with a post(query, headers) method; None resets the
+                shared transport so it is rebuilt on next use
+
+    Returns:
+        the previously installed transport (or None)
+    """
+    global _transport
+    with _lock:
+        previous = _transport
+        _transport = transport
+    return previous
+
+
+# rebuilt from the new settings on next use, see settings.reload_settings
+settings.on_reload(lambda new_settings: set_transport(None))
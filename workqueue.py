@@ -0,0 +1,677 @@
+#!/usr/bin/env python3.7
+# -*- coding: utf-8 -*-
+"""
+workqueue.py - a crawl queue shared by collectors on many machines
+
+Instead of splitting login lists by hand, every (login, connection) pair is
+pushed onto one shared queue and any number of collector processes take jobs
+from it.  A login's profile document is a job of its own, under the connection
+name PROFILE:
+
+    queue = WorkQueue.from_config(config)
+    queue.enqueue_logins(CrawlDriver.read_logins('logins.txt'))   # once, anywhere
+
+    with GithubCollector() as collector:                           # on every node
+        QueueWorker(collector, queue).run()
+
+A worker holds a time-limited lease on each job it takes and renews it with
+heartbeats while the connection is crawled.  A lease that is not renewed, i.e.
+because its worker died, expires and its job is put back on the queue for
+another worker; a job that keeps failing is set aside after max_attempts.  A
+job may therefore be crawled more than once, which is harmless since each
+connection resumes from its stored cursor, but it is marked complete exactly
+once: complete() returns True to a single caller only.  A worker marks the jobs
+it crawled complete once their documents are flushed, every flush_every jobs,
+so documents keep being indexed in bulk.
+
+The queue is chosen with [Queue] backend in collectors.cfg:
+
+    redis  - RedisWorkQueue, shared by every process pointed at the server
+    memory - MemoryWorkQueue, shared by the threads of one process only
+"""
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, deque, namedtuple
+import logging
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from deadline import Deadline
+from pagination import CONNECTIONS
+from User import User
+
+
+# the connection name of the job that saves a login's profile, see GithubCollector.save_user
+PROFILE = 'profile'
+
+
+def job_key(login, connection):
+    """Returns the queue's name for a job, i.e. octocat:followers"""
+    return '%s:%s' % (login, connection)
+
+
+def parse_job(key):
+    """Returns the (login, connection) a job name stands for"""
+    if isinstance(key, bytes):
+        key = key.decode('utf-8')
+    login, connection = key.rsplit(':', 1)
+    return login, connection
+
+
+class Lease(namedtuple('Lease', ['login', 'connection', 'token', 'attempt'])):
+    """A worker's claim on one job.
+
+    Attributes:
+        login (str) - the login to crawl
+        connection (str) - the connection to crawl, i.e. 'followers'
+        token (str) - identifies this claim; a job leased again gets a new token
+        attempt (int) - how many times the job has been leased, including this one
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return job_key(self.login, self.connection)
+
+
+class WorkQueue(object, metaclass=ABCMeta):
+    """Base class for a queue of (login, connection) jobs handed out under leases.
+
+    Attributes:
+        lease_seconds (float) - how long a lease lasts without a heartbeat
+        max_attempts (int) - the leases a job gets before it is set aside as failed
+    """
+
+    def __init__(self, lease_seconds=300.0, max_attempts=5, clock=time.time):
+        """
+        Keyword Arguments:
+            lease_seconds (float) - how long a lease lasts without a heartbeat
+            max_attempts (int) - the leases a job gets before it is set aside as failed
+            clock (callable) - returns the current time in seconds; every process
+                    sharing a queue must agree on it, so it is wall-clock time
+        """
+        self.lease_seconds = float(lease_seconds)
+        self.max_attempts = int(max_attempts)
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds the queue selected in the [Queue] section of collectors.cfg.  The
+        redis server defaults to the one configured in [State].
+
+        Arguments:
+            config (ConfigParser) - the parsed collectors.cfg
+
+        Returns:
+            WorkQueue - a RedisWorkQueue or MemoryWorkQueue
+
+        Raises:
+            ValueError - if the backend is unknown
+            ImportError - if the redis backend is selected without redis installed
+        """
+        def setting(key, default):
+            return config.get('Queue', key, fallback=config.get('State', key, fallback=default))
+
+        backend = config.get('Queue', 'backend', fallback='redis')
+        options = {'lease_seconds': config.getfloat('Queue', 'lease_seconds', fallback=300.0),
+                   'max_attempts': config.getint('Queue', 'max_attempts', fallback=5)}
+        if backend == 'memory':
+            return MemoryWorkQueue(**options)
+        if backend == 'redis':
+            if redis is None:
+                raise ImportError('the redis backend requires the redis package')
+            client = redis.Redis(host=setting('host', '127.0.0.1'),
+                                 port=int(setting('port', 6379)),
+                                 db=int(setting('db', 0)),
+                                 password=setting('password', '') or None)
+            return RedisWorkQueue(client, name=config.get('Queue', 'name', fallback='crawl'),
+                                  **options)
+        raise ValueError('Unknown [Queue] backend {!r}'.format(backend))
+
+    def enqueue_logins(self, logins, connections=None):
+        """Queues every connection of every login.
+
+        Arguments:
+            logins (iterable) - the logins to crawl
+
+        Keyword Arguments:
+            connections (iterable) - the connection names to crawl, PROFILE for the
+                    login's profile; defaults to the profile and every connection
+
+        Returns:
+            int - the number of jobs queued
+        """
+        connections = list(connections or [PROFILE] + list(CONNECTIONS))
+        return self.enqueue((login, connection) for login in logins for connection in connections)
+
+    @abstractmethod
+    def enqueue(self, jobs):
+        """Queues jobs that are not already queued, leased or complete.
+
+        Arguments:
+            jobs (iterable) - (login, connection) tuples
+
+        Returns:
+            int - the number of jobs queued
+        """
+        pass
+
+    @abstractmethod
+    def lease(self):
+        """Takes the next job, first putting back any whose lease has expired.
+
+        Returns:
+            Lease - the claim on the job, or None if the queue is empty
+        """
+        pass
+
+    @abstractmethod
+    def heartbeat(self, lease):
+        """Extends a lease by lease_seconds.
+
+        Arguments:
+            lease (Lease) - the claim to extend
+
+        Returns:
+            boolean - False if the lease has already expired or the job completed,
+                    in which case the worker should stop
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, lease):
+        """Marks a job done and releases its lease.
+
+        Arguments:
+            lease (Lease) - the claim on the job
+
+        Returns:
+            boolean - True to exactly one caller per job; False if it had already
+                    been marked complete
+        """
+        pass
+
+    @abstractmethod
+    def fail(self, lease):
+        """Releases a lease after the job failed, queuing the job again unless it
+        has used up max_attempts.
+
+        Arguments:
+            lease (Lease) - the claim on the job
+
+        Returns:
+            boolean - True if the job was queued again
+        """
+        pass
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Puts the jobs whose leases have expired back on the queue.
+
+        Returns:
+            int - the number of jobs put back
+        """
+        pass
+
+    @abstractmethod
+    def counts(self):
+        """Returns a dict with the number of pending, leased, complete and failed jobs"""
+        pass
+
+
+class MemoryWorkQueue(WorkQueue):
+    """Keeps the queue in memory for the threads of one process"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._leases = OrderedDict()        # key -> (token, expires)
+        self._attempts = {}
+        self._complete = set()
+        self._failed = set()
+
+    def __repr__(self):
+        return 'MemoryWorkQueue(lease_seconds={})'.format(self.lease_seconds)
+
+    def enqueue(self, jobs):
+        queued = 0
+        with self._lock:
+            known = set(self._pending) | set(self._leases) | self._complete | self._failed
+            for login, connection in jobs:
+                key = job_key(login, connection)
+                if key not in known:
+                    known.add(key)
+                    self._pending.append(key)
+                    queued += 1
+        return queued
+
+    def lease(self):
+        self.requeue_expired()
+        with self._lock:
+            if not self._pending:
+                return None
+            key = self._pending.popleft()
+            token = uuid.uuid4().hex
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+            self._leases[key] = (token, self.clock() + self.lease_seconds)
+        return Lease(*parse_job(key), token=token, attempt=attempt)
+
+    def heartbeat(self, lease):
+        with self._lock:
+            held = self._leases.get(lease.key)
+            if held is None or held[0] != lease.token:
+                return False
+            self._leases[lease.key] = (lease.token, self.clock() + self.lease_seconds)
+            return True
+
+    def complete(self, lease):
+        with self._lock:
+            if lease.key in self._complete:
+                return False
+            self._complete.add(lease.key)
+            self._leases.pop(lease.key, None)
+            if lease.key in self._pending:
+                self._pending.remove(lease.key)
+            return True
+
+    def fail(self, lease):
+        with self._lock:
+            held = self._leases.get(lease.key)
+            if held is None or held[0] != lease.token:
+                return False
+            del self._leases[lease.key]
+            return self._retry(lease.key)
+
+    def requeue_expired(self):
+        now = self.clock()
+        with self._lock:
+            expired = [key for key, (_, expires) in self._leases.items() if expires <= now]
+            for key in expired:
+                del self._leases[key]
+            return sum(1 for key in expired if self._retry(key))
+
+    def counts(self):
+        with self._lock:
+            return {'pending': len(self._pending), 'leased': len(self._leases),
+                    'complete': len(self._complete), 'failed': len(self._failed)}
+
+    def _retry(self, key):
+        """Internal function that queues a released job again, or sets it aside"""
+        if self._attempts.get(key, 0) >= self.max_attempts:
+            self._failed.add(key)
+            return False
+        self._pending.append(key)
+        return True
+
+
+class RedisWorkQueue(WorkQueue):
+    """Keeps the queue in redis, shared by every process pointed at the server.
+
+    Under the queue's name, i.e. gh:queue:crawl, it uses:
+
+        :pending   a list of job names waiting for a worker
+        :active    a list of job names taken by a worker; a job is moved here from
+                   :pending atomically, so a worker dying mid-lease never loses it
+        :expires   a sorted set of leased job names scored by lease expiry
+        :owners    a hash of leased job name -> lease token
+        :attempts  a hash of job name -> times leased
+        :known     a set of every job queued, so enqueue() skips duplicates
+        :complete  a set of completed jobs; adding to it is what makes
+                   completion exactly-once
+        :failed    a set of jobs set aside after max_attempts
+
+    A lease is ended, by fail() or when it expires, in one transaction watching
+    :expires, :owners and :complete, so no other process can adopt or end it
+    in between and queue the job a second time.
+    """
+
+    def __init__(self, client, name='crawl', **kwargs):
+        """
+        Arguments:
+            client (redis.Redis) - the redis connection
+
+        Keyword Arguments:
+            name (str) - the queue's name; queues with different names are separate
+            kwargs - lease_seconds, max_attempts and clock, see WorkQueue
+        """
+        super().__init__(**kwargs)
+        self.client = client
+        self.name = name
+        # when this process last looked for orphans, see _adopt_orphans
+        self._adopted_at = None
+        prefix = 'gh:queue:%s:' % name
+        self.keys = dict((part, prefix + part) for part in
+                         ('pending', 'active', 'expires', 'owners', 'attempts',
+                          'known', 'complete', 'failed'))
+
+    def __repr__(self):
+        return 'RedisWorkQueue(name={!r}, lease_seconds={})'.format(self.name, self.lease_seconds)
+
+    def enqueue(self, jobs):
+        keys = [job_key(login, connection) for login, connection in jobs]
+        if not keys:
+            return 0
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.sadd(self.keys['known'], key)
+        added = [key for key, new in zip(keys, pipeline.execute()) if new]
+        if added:
+            self.client.lpush(self.keys['pending'], *added)
+        return len(added)
+
+    def lease(self):
+        self.requeue_expired()
+        while True:
+            key = self.client.rpoplpush(self.keys['pending'], self.keys['active'])
+            if key is None:
+                return None
+            if isinstance(key, bytes):
+                key = key.decode('utf-8')
+            if self.client.sismember(self.keys['complete'], key):
+                # completed by a worker whose lease had expired; nothing left to do
+                self.client.lrem(self.keys['active'], 0, key)
+                continue
+            token = uuid.uuid4().hex
+            pipeline = self.client.pipeline(transaction=True)
+            pipeline.hset(self.keys['owners'], key, token)
+            pipeline.zadd(self.keys['expires'], {key: self.clock() + self.lease_seconds})
+            pipeline.hincrby(self.keys['attempts'], key, 1)
+            attempt = pipeline.execute()[-1]
+            return Lease(*parse_job(key), token=token, attempt=int(attempt))
+
+    def heartbeat(self, lease):
+        if not self._holds(lease):
+            return False
+        # XX: only extends a lease that has not been reaped in the meantime
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.zadd(self.keys['expires'], {lease.key: self.clock() + self.lease_seconds}, xx=True)
+        pipeline.zscore(self.keys['expires'], lease.key)
+        return pipeline.execute()[-1] is not None
+
+    def complete(self, lease):
+        if not self.client.sadd(self.keys['complete'], lease.key):
+            return False
+        self._release(lease.key)
+        return True
+
+    def fail(self, lease):
+        return bool(self._end_lease(lease.key, lease.token))
+
+    def requeue_expired(self):
+        now = self.clock()
+        # orphans are rare, so the whole of :active is only scanned once a lease
+        if self._adopted_at is None or now - self._adopted_at >= self.lease_seconds:
+            self._adopted_at = now
+            self._adopt_orphans()
+        expired = self.client.zrangebyscore(self.keys['expires'], '-inf', now)
+        requeued = 0
+        for key in expired:
+            requeued += bool(self._end_lease(key.decode('utf-8') if isinstance(key, bytes) else key))
+        return requeued
+
+    def counts(self):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.llen(self.keys['pending'])
+        pipeline.zcard(self.keys['expires'])
+        pipeline.scard(self.keys['complete'])
+        pipeline.scard(self.keys['failed'])
+        return dict(zip(('pending', 'leased', 'complete', 'failed'), pipeline.execute()))
+
+    def _holds(self, lease):
+        """Internal function that checks a lease's token is still the job's owner"""
+        owner = self.client.hget(self.keys['owners'], lease.key)
+        if isinstance(owner, bytes):
+            owner = owner.decode('utf-8')
+        return owner == lease.token
+
+    def _end_lease(self, key, token=None):
+        """Internal function that ends a job's lease and queues the job again, or
+        sets it aside.  Only the process whose transaction removes the lease from
+        :expires does so; a concurrent change to the lease makes it start over.
+
+        Arguments:
+            key (str) - the job's name
+
+        Keyword Arguments:
+            token (str) - the lease token that must still own the job; None for a
+                    lease that expired
+
+        Returns:
+            boolean - True if the job was queued again, False if it was set aside
+                    or already complete, None if the lease had already ended
+        """
+        def end(pipeline):
+            if token is not None:
+                owner = pipeline.hget(self.keys['owners'], key)
+                if (owner.decode('utf-8') if isinstance(owner, bytes) else owner) != token:
+                    return None
+            if pipeline.zscore(self.keys['expires'], key) is None:
+                return None
+            complete = pipeline.sismember(self.keys['complete'], key)
+            attempts = int(pipeline.hget(self.keys['attempts'], key) or 0)
+            pipeline.multi()
+            pipeline.zrem(self.keys['expires'], key)
+            if not complete and attempts >= self.max_attempts:
+                pipeline.sadd(self.keys['failed'], key)
+            elif not complete:
+                pipeline.lpush(self.keys['pending'], key)
+            pipeline.hdel(self.keys['owners'], key)
+            pipeline.lrem(self.keys['active'], 0, key)
+            return not complete and attempts < self.max_attempts
+        return self.client.transaction(end, self.keys['expires'], self.keys['owners'],
+                                       self.keys['complete'], value_from_callable=True)
+
+    def _release(self, key):
+        """Internal function that drops every trace of a job's lease"""
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.zrem(self.keys['expires'], key)
+        pipeline.hdel(self.keys['owners'], key)
+        pipeline.lrem(self.keys['active'], 0, key)
+        pipeline.execute()
+
+    def _adopt_orphans(self):
+        """Internal function that gives a lease to jobs a worker took off :pending
+        but died before leasing, so they expire and are queued again.  It watches
+        :expires so a lease ending meanwhile is not given a new one."""
+        def adopt(pipeline):
+            active = pipeline.lrange(self.keys['active'], 0, -1)
+            pipeline.multi()
+            for key in active:
+                pipeline.zadd(self.keys['expires'], {key: self.clock() + self.lease_seconds}, nx=True)
+        self.client.transaction(adopt, self.keys['expires'])
+
+
+class Heartbeat(object):
+    """Renews a lease on a background thread while a job runs:
+
+        with Heartbeat(queue, lease) as heartbeat:
+            crawl()
+        heartbeat.lost   # True if the lease expired before the job finished
+    """
+
+    def __init__(self, queue, lease, interval=None):
+        """
+        Arguments:
+            queue (WorkQueue) - the queue the lease came from
+            lease (Lease) - the claim to renew
+
+        Keyword Arguments:
+            interval (float) - seconds between renewals; defaults to a third of
+                    the queue's lease_seconds
+        """
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval if interval is not None else queue.lease_seconds / 3.0
+        self.lost = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name='heartbeat', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _beat(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.lease):
+                    self.lost = True
+                    return
+            except Exception as error_msg:
+                logging.getLogger('GithubCollector').error(
+                    '%s:heartbeat failed: %s', self.lease.key, error_msg)
+
+
+class QueueWorker(object):
+    """Takes jobs from a WorkQueue and crawls them with a GithubCollector until
+    the queue is empty."""
+
+    def __init__(self, collector, queue, user_factory=User, job_deadline=None, logger=None,
+                 flush_every=50):
+        """
+        Arguments:
+            collector (GithubCollector) - the collector jobs are saved with
+            queue (WorkQueue) - where jobs come from
+
+        Keyword Arguments:
+            user_factory (callable) - builds the User a job's connection is read from
+            job_deadline (float) - seconds a job may take before its connection is
+                    cut off after the current page and queued again; None for no limit
+            logger (logging.Logger) - where failed jobs are reported
+            flush_every (int) - the crawled jobs held before the collector is flushed
+                    and they are marked complete
+        """
+        self.collector = collector
+        self.queue = queue
+        self.user_factory = user_factory
+        self.job_deadline = job_deadline
+        self.logger = logger or getattr(collector, 'logger', None) or logging.getLogger('GithubCollector')
+        self.flush_every = max(1, int(flush_every))
+        self._user = None
+        # leases of jobs crawled but whose documents may not be flushed yet
+        self._crawled = []
+
+    def __repr__(self):
+        return 'QueueWorker(queue={!r})'.format(self.queue)
+
+    def run(self, max_jobs=None):
+        """Crawls jobs until the queue is empty or max_jobs have been taken.
+
+        Keyword Arguments:
+            max_jobs (int) - stop after this many jobs
+
+        Returns:
+            dict - the number of jobs 'completed' and 'failed' by this worker
+        """
+        done = {'completed': 0, 'failed': 0}
+        taken = 0
+        while max_jobs is None or taken < max_jobs:
+            lease = self.queue.lease()
+            if lease is None:
+                break
+            taken += 1
+            if not self.work(lease):
+                done['failed'] += 1
+            if len(self._crawled) >= self.flush_every:
+                self._count(done, self.flush())
+        self._count(done, self.flush())
+        return done
+
+    def work(self, lease):
+        """Crawls one leased job, or fails it.  A crawled job is marked complete by
+        the next flush().  Never raises.
+
+        Arguments:
+            lease (Lease) - the claim on the job
+
+        Returns:
+            boolean - True if the job was crawled
+        """
+        succeeded = False
+        heartbeat = Heartbeat(self.queue, lease)
+        try:
+            with heartbeat:
+                # another node may have stored newer cursors for the login since
+                self.collector.forget(lease.login)
+                user = self._load(lease.login)
+                if lease.connection == PROFILE:
+                    succeeded = self.collector.save_user(user)
+                else:
+                    succeeded = self.collector.save_connection(user, lease.connection,
+                                                               deadline=Deadline(self.job_deadline))
+        except Exception:
+            self.logger.exception('%s:crawl raised', lease.key)
+        if succeeded:
+            if heartbeat.lost:
+                self.logger.warning('%s:lease expired before the crawl finished', lease.key)
+            self._crawled.append(lease)
+            return True
+        self.logger.error('%s:attempt %d failed', lease.key, lease.attempt)
+        self.queue.fail(lease)
+        return False
+
+    def flush(self):
+        """Flushes the collector's buffered documents, then marks the jobs crawled
+        since the last flush complete, or fails them if the flush failed.
+
+        Returns:
+            dict - the number of those jobs 'completed' and 'failed'
+        """
+        crawled, self._crawled = self._crawled, []
+        done = {'completed': 0, 'failed': 0}
+        if not crawled:
+            return done
+        try:
+            flushed = self.collector.flush() is not False
+        except Exception:
+            self.logger.exception('flush raised')
+            flushed = False
+        for lease in crawled:
+            # the cursors are stored, so a job is done even if its lease expired
+            if flushed and self.queue.complete(lease):
+                done['completed'] += 1
+                continue
+            if not flushed:
+                self.logger.error('%s:attempt %d failed to flush', lease.key, lease.attempt)
+                self.queue.fail(lease)
+            done['failed'] += 1
+        return done
+
+    @staticmethod
+    def _count(done, flushed):
+        """Internal function that adds the outcome of a flush() to run()'s totals"""
+        for outcome, jobs in flushed.items():
+            done[outcome] += jobs
+
+    def _load(self, login):
+        """Internal function that reuses the User of the previous job when it was
+        for the same login, which it usually is"""
+        if self._user is None or self._user[0] != login:
+            self._user = (login, self.user_factory(login))
+        return self._user[1]
+
+
+if __name__ == "__main__":
+    # python workqueue.py [login_list] - queues the logins in login_list, if
+    # given, then crawls jobs until the queue is empty.  Start one on each node.
+    import sys
+
+    from collector import GithubCollector
+    from crawler import CrawlDriver
+
+    with GithubCollector() as GC:
+        QUEUE = WorkQueue.from_config(GC.config)
+        if len(sys.argv) > 1:
+            QUEUE.enqueue_logins(CrawlDriver.read_logins(sys.argv[1]))
+        DEADLINE = GC.config.getfloat('Crawl', 'login_deadline', fallback=0)
+        FLUSH_EVERY = GC.config.getint('Queue', 'flush_every', fallback=50)
+        print(QueueWorker(GC, QUEUE, job_deadline=DEADLINE or None, flush_every=FLUSH_EVERY).run())